@@ -1,13 +1,21 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import os
 
-import tensorflow as tf
 import numpy as np
-from PIL import Image
 
-from joblib import load
-import pandas as pd
+import metrics
+from compiled_model import compile_model
+from executors import (
+    BoundedExecutor, Overloaded,
+    CNN_WORKERS, CNN_QUEUE, CNN_TIMEOUT, CNN_ADMIT,
+    TABULAR_WORKERS, TABULAR_QUEUE, TABULAR_TIMEOUT,
+)
+from feature_schema import ENCODERS
+from micro_batcher import MicroBatcher, MAX_BATCH_SIZE
+from model_registry import ModelRegistry, MODEL_PRELOAD
+from preprocessing import TARGET_SIZE, load_xray, xray_upload, xray_uploads
+from xray_cache import XrayCache, XRAY_CACHE_DIR, model_version, upload_digest
 
 print("🔥 Aarogya AI Backend Started Successfully 🔥")
 
@@ -15,156 +23,333 @@ print("🔥 Aarogya AI Backend Started Successfully 🔥")
 app = Flask(__name__)
 CORS(app)
 
+# Per-route latency histograms and the opt-in slow-request profiler
+metrics.instrument(app)
+
 @app.route("/")
 def home():
     return jsonify({
         "status": "Aarogya AI Backend Running 🚀",
-        "message": "Flask + TensorFlow + ML models loaded successfully"
+        "message": "Flask backend ready, models load on first use"
     })
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Every model loads on first use (or at startup via MODEL_PRELOAD), and the
+# CNNs are evicted LRU-first under MODEL_MEMORY_BUDGET_MB
+registry = ModelRegistry()
+
+@app.route("/models")
+def models_status():
+    return jsonify(registry.stats())
+
+# X-ray and tabular work run in separate bounded pools so X-ray spikes
+# cannot starve the risk routes; full pools answer 429/503 + Retry-After
+cnn_pool = BoundedExecutor("cnn", CNN_WORKERS, CNN_QUEUE, CNN_TIMEOUT, max_admitted=CNN_ADMIT)
+tabular_pool = BoundedExecutor("tabular", TABULAR_WORKERS, TABULAR_QUEUE, TABULAR_TIMEOUT)
+
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    response = jsonify({"error": str(e), "pool": e.pool})
+    response.status_code = e.status
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+@app.route("/metrics/pools")
+def pool_metrics():
+    return jsonify({
+        "cnn": cnn_pool.stats(),
+        "tabular": tabular_pool.stats(),
+    })
+
 # ====================================================
 # =============== IMAGE MODELS (X-RAY) ================
 # ====================================================
-lung_xray_model = tf.keras.models.load_model(
-    os.path.join(BASE_DIR, "models", "best_lung_model.h5")
-)
-bones_model = tf.keras.models.load_model(
-    os.path.join(BASE_DIR, "models", "best_custom_cnn.h5")
-)
-kidney_model = tf.keras.models.load_model(
-    os.path.join(BASE_DIR, "models", "kidney_model.keras")
-)
+# Repeated uploads of the same film skip decode and the forward pass
+xray_cache = XrayCache(XRAY_CACHE_DIR or os.path.join(BASE_DIR, "cache", "xray"))
+xray_model_ids = {}
+
+@app.route("/cache")
+def cache_status():
+    return jsonify(xray_cache.stats())
+
+def register_xray_model(name, filename):
+    path = os.path.join(BASE_DIR, "models", filename)
+    xray_model_ids[name] = f"{name}-{model_version(path)}"
+
+    def load_model():
+        # TensorFlow is only imported once an image model is needed
+        from inference import load_xray_model
+        model = load_xray_model(name, path)
+
+        # Trace and run the model once before serving so the first real
+        # request does not pay for graph building
+        model.warmup(batch_sizes=(1, MAX_BATCH_SIZE))
+        return model
+
+    registry.register(name, load_model, path=path, heavy=True)
+
+    # Concurrent requests for the same CNN are stacked into one forward pass
+    return MicroBatcher(name, lambda batch: registry.get(name)(batch))
+
+lung_xray_batcher = register_xray_model("lung_xray", "best_lung_model.h5")
+bones_batcher = register_xray_model("bones", "best_custom_cnn.h5")
+kidney_batcher = register_xray_model("kidney", "kidney_model.keras")
+
+def run_xray(name, batcher, upload, timer):
+    timer.mark("queue")
+    digest = upload_digest(upload)
+    model_id = xray_model_ids[name]
+    timer.mark("hash")
+
+    output = xray_cache.get(model_id, digest)
+    timer.mark("cache")
+    if output is None:
+        img = xray_cache.get_tensor(digest)
+        if img is None:
+            img = load_xray(upload, timer=timer)
+            xray_cache.put_tensor(digest, img)
+        output = batcher.predict(img)
+        timer.mark("inference")
+        xray_cache.put(model_id, digest, output)
+        timer.mark("cache_store")
+    return output
+
+def lung_result(output):
+    prob = float(output[0])
+    return {
+        "label": "Pneumonia Detected" if prob >= 0.5 else "No Pneumonia Detected",
+        "confidence": prob
+    }
+
+def confidence_result(output):
+    return {"confidence": float(np.max(output))}
+
+# Public name -> (model name, batcher, response fields)
+XRAY_MODELS = {
+    "lung": ("lung_xray", lung_xray_batcher, lung_result),
+    "bones": ("bones", bones_batcher, confidence_result),
+    "kidney": ("kidney", kidney_batcher, confidence_result),
+}
+
+def xray_response(name):
+    model, batcher, result = XRAY_MODELS[name]
+    timer = metrics.stage_timer(model)
+    upload = xray_upload(request)
+    if upload is None:
+        return jsonify({"error": "No file uploaded"}), 400
+    timer.mark("upload")
 
-def preprocess_image(image):
-    image = image.resize((224, 224))
-    image = np.array(image) / 255.0
-    return np.expand_dims(image, axis=0)
+    response = jsonify(result(cnn_pool.run(run_xray, model, batcher, upload, timer)))
+    timer.mark("serialize")
+    return response
 
 # ---------- LUNG X-RAY ----------
 @app.route("/predict/xray/lung", methods=["POST"])
 def predict_lung_xray():
-    if "file" not in request.files:
-        return jsonify({"error": "No file uploaded"}), 400
-
-    image = Image.open(request.files["file"]).convert("RGB")
-    img = preprocess_image(image)
-    prob = float(lung_xray_model.predict(img)[0][0])
-
-    return jsonify({
-        "label": "Pneumonia Detected" if prob >= 0.5 else "No Pneumonia Detected",
-        "confidence": prob
-    })
+    return xray_response("lung")
 
 # ---------- BONE X-RAY ----------
 @app.route("/predict/xray/bones", methods=["POST"])
 def predict_bones_xray():
-    if "file" not in request.files:
-        return jsonify({"error": "No file uploaded"}), 400
-
-    image = Image.open(request.files["file"]).convert("RGB")
-    img = preprocess_image(image)
-    confidence = float(np.max(bones_model.predict(img)))
-
-    return jsonify({"confidence": confidence})
+    return xray_response("bones")
 
 # ---------- KIDNEY X-RAY ----------
 @app.route("/predict/xray/kidney", methods=["POST"])
 def predict_kidney_xray():
-    if "file" not in request.files:
+    return xray_response("kidney")
+
+# ---------- SEVERAL MODELS, ONE UPLOAD ----------
+# One request carries a study (one or more films). Each film is hashed and
+# decoded once, and the same tensor goes to every requested CNN's batcher
+# at once, so the models run concurrently instead of after three uploads
+XRAY_STUDY_MAX_FILES = int(os.environ.get("XRAY_STUDY_MAX_FILES", "16"))
+
+def xray_study_models():
+    names = request.args.get("models")
+    if not names:
+        return list(XRAY_MODELS)
+    names = [n.strip() for n in names.split(",") if n.strip()]
+    unknown = [n for n in names if n not in XRAY_MODELS]
+    if unknown:
+        raise LookupError(f"unknown models {unknown}; choose from {list(XRAY_MODELS)}")
+    return names
+
+def run_xray_study(names, uploads, timer):
+    """{name: output} per upload, plus per-upload decode errors."""
+    timer.mark("queue")
+    outputs = [{} for _ in uploads]
+    errors = []
+    pending = []
+    for i, (_, upload) in enumerate(uploads):
+        digest = upload_digest(upload)
+        missing = []
+        for name in names:
+            output = xray_cache.get(xray_model_ids[XRAY_MODELS[name][0]], digest)
+            if output is None:
+                missing.append(name)
+            else:
+                outputs[i][name] = output
+        timer.mark("cache")
+        if not missing:
+            continue
+
+        img = xray_cache.get_tensor(digest)
+        if img is None:
+            try:
+                # Its own buffer: the batchers may still be reading the
+                # previous film's tensor while this one decodes
+                img = load_xray(upload, out=np.empty(TARGET_SIZE[::-1] + (3,), dtype=np.float32),
+                                timer=timer)
+            except (OSError, ValueError):
+                errors.append({"index": i, "filename": uploads[i][0], "error": "could not read image"})
+                continue
+            xray_cache.put_tensor(digest, img)
+        for name in missing:
+            pending.append((i, name, digest, XRAY_MODELS[name][1].submit(img)))
+
+    for i, name, digest, future in pending:
+        outputs[i][name] = future.result()
+        xray_cache.put(xray_model_ids[XRAY_MODELS[name][0]], digest, outputs[i][name])
+    timer.mark("inference")
+    return outputs, errors
+
+@app.route("/predict/xray", methods=["POST"])
+def predict_xray_study():
+    timer = metrics.stage_timer("xray_study")
+    try:
+        names = xray_study_models()
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 400
+    uploads = xray_uploads(request)
+    if not uploads:
         return jsonify({"error": "No file uploaded"}), 400
+    if len(uploads) > XRAY_STUDY_MAX_FILES:
+        return jsonify({"error": f"{len(uploads)} files; the limit is {XRAY_STUDY_MAX_FILES}"}), 400
+    timer.mark("upload")
+
+    outputs, errors = cnn_pool.run(run_xray_study, names, uploads, timer)
+    failed = {e["index"] for e in errors}
+    response = jsonify({
+        "results": [
+            {
+                "index": i,
+                "filename": filename,
+                **{name: XRAY_MODELS[name][2](out[name]) for name in names},
+            }
+            for i, ((filename, _), out) in enumerate(zip(uploads, outputs)) if i not in failed
+        ],
+        "errors": errors,
+    })
+    timer.mark("serialize")
+    return response
 
-    image = Image.open(request.files["file"]).convert("RGB")
-    img = preprocess_image(image)
-    confidence = float(np.max(kidney_model.predict(img)))
-
-    return jsonify({"confidence": confidence})
+# ---------- BATCHING METRICS ----------
+@app.route("/metrics/batching")
+def batching_metrics():
+    return jsonify({
+        "lung_xray": lung_xray_batcher.stats(),
+        "bones": bones_batcher.stats(),
+        "kidney": kidney_batcher.stats(),
+    })
 
 # ====================================================
 # =============== RISK MODELS (SKLEARN) ===============
 # ====================================================
-heart_model = load(os.path.join(BASE_DIR, "models", "heart_model.pkl"))
-diabetes_model = load(os.path.join(BASE_DIR, "models", "diabetes_model.pkl"))
-lung_risk_model = load(os.path.join(BASE_DIR, "models", "lung_model.pkl"))
-
-gender_map = {"Male": 0, "Female": 1}
-yes_no_map = {"Yes": 1, "No": 0}
-smoking_map = {"Never": 0, "Former": 1, "Current": 2}
-alcohol_map = {"Never": 0, "Occasionally": 1, "Frequently": 2}
-
-def calculate_bmi(weight, height):
-    return round(weight / ((height / 100) ** 2), 2) if weight and height else 0
+# Public name -> (registry name, feature schema, model file). Requests are
+# encoded by feature_schema.py, the same schema backend/ serves and
+# train_models.py trains with.
+RISK_MODELS = {
+    "heart": ("heart", "heart", "heart_model.pkl"),
+    "diabetes": ("diabetes", "diabetes", "diabetes_model.pkl"),
+    "lung": ("lung_risk", "lung", "lung_model.pkl"),
+}
+
+def risk_loader(schema, path):
+    def load_model():
+        # joblib (and sklearn, by unpickling) are imported on first use only
+        from joblib import load
+
+        model = load(path)
+        # Refuse to serve a model trained on different columns than we encode
+        ENCODERS[schema].check_model(model)
+        return compile_model(model)
+    return load_model
+
+for model, schema, filename in RISK_MODELS.values():
+    path = os.path.join(BASE_DIR, "models", filename)
+    registry.register(model, risk_loader(schema, path), path=path)
+
+def run_risk(model, features, timer):
+    timer.mark("queue")
+    scorer = registry.get(model)
+    timer.mark("load")
+    prob = scorer.predict_one(features)
+    timer.mark("predict")
+    return prob
+
+def risk_response(name):
+    model, schema, _ = RISK_MODELS[name]
+    timer = metrics.stage_timer(model)
+    data = request.get_json(silent=True)
+    timer.mark("parse")
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected one JSON object with the patient's answers"}), 400
+    try:
+        features = ENCODERS[schema].encode(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    timer.mark("encode")
+
+    prob = tabular_pool.run(run_risk, model, features, timer)
+    response = jsonify({"risk_percentage": round(prob * 100, 2)})
+    timer.mark("serialize")
+    return response
 
 # ---------- HEART DISEASE ----------
 @app.route("/predict/risk/heart", methods=["POST"])
 def predict_heart_risk():
-    data = request.json
-    row = {}
-
-    for f in heart_model.feature_names_in_:
-        row[f] = 0
-
-    row["Sex"] = gender_map.get(data.get("gender"), 0)
-    row["Age_Category"] = min(int(data.get("age", 0)) // 10, 9)
-    row["BMI"] = calculate_bmi(
-        float(data.get("weight_kg", 0)),
-        float(data.get("height_cm", 0))
-    )
-    row["Exercise"] = yes_no_map.get(data.get("exercise"), 0)
-
-    X = pd.DataFrame([row])
-    prob = heart_model.predict_proba(X)[0][1]
-
-    return jsonify({"risk_percentage": round(prob * 100, 2)})
+    return risk_response("heart")
 
 # ---------- DIABETES ----------
 @app.route("/predict/risk/diabetes", methods=["POST"])
 def predict_diabetes_risk():
-    data = request.json
-
-    features = [
-        gender_map.get(data.get("gender"), 0),
-        int(data.get("age", 0)),
-        calculate_bmi(
-            float(data.get("weight_kg", 0)),
-            float(data.get("height_cm", 0))
-        ),
-        yes_no_map.get(data.get("exercise"), 0),
-        smoking_map.get(data.get("smoking_history"), 0),
-        alcohol_map.get(data.get("alcohol_consumption"), 0),
-        float(data.get("hba1c_level", 0)),
-        float(data.get("blood_glucose_level", 0)),
-    ]
-
-    prob = diabetes_model.predict_proba([features])[0][1]
-    return jsonify({"risk_percentage": round(prob * 100, 2)})
+    return risk_response("diabetes")
 
 # ---------- LUNG CANCER ----------
 @app.route("/predict/risk/lung", methods=["POST"])
 def predict_lung_cancer_risk():
-    data = request.json
-
-    features = [
-        gender_map.get(data.get("gender"), 0),
-        int(data.get("age", 0)),
-        smoking_map.get(data.get("smoking_history"), 0),
-        alcohol_map.get(data.get("alcohol_consumption"), 0),
-        yes_no_map.get(data.get("yellow_fingers"), 0),
-        yes_no_map.get(data.get("anxiety"), 0),
-        yes_no_map.get(data.get("chronic_disease"), 0),
-        yes_no_map.get(data.get("fatigue"), 0),
-        yes_no_map.get(data.get("wheezing"), 0),
-        yes_no_map.get(data.get("coughing"), 0),
-        yes_no_map.get(data.get("shortness_of_breath"), 0),
-        yes_no_map.get(data.get("swallowing_difficulty"), 0),
-        yes_no_map.get(data.get("chest_pain"), 0),
-        0, 0
-    ]
-
-    prob = lung_risk_model.predict_proba([features])[0][1]
-    return jsonify({"risk_percentage": round(prob * 100, 2)})
+    return risk_response("lung")
+
+registry.preload(MODEL_PRELOAD)
+
+# ===================== PROMETHEUS =====================
+metrics.add_collector("model", registry.model_stats, label="model")
+metrics.add_collector("pool", lambda: {"cnn": cnn_pool.stats(), "tabular": tabular_pool.stats()},
+                      label="pool")
+metrics.add_collector("batcher", lambda: {
+    "lung_xray": lung_xray_batcher.stats(),
+    "bones": bones_batcher.stats(),
+    "kidney": kidney_batcher.stats(),
+}, label="model")
+metrics.add_collector("xray_cache", lambda: {"xray": xray_cache.stats()})
+
+def tensorflow_stats():
+    # Only the CNNs loaded right now: a scrape must not load one
+    out = {}
+    for name, _, _ in XRAY_MODELS.values():
+        model = registry.peek(name)
+        if model is not None:
+            out[name] = model.stats()
+    return out
+
+metrics.add_collector("tensorflow", tensorflow_stats, label="model")
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 # ===================== RUN APP =====================
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # Development server only; use gunicorn (see wsgi.py) in production
+    app.run(host="0.0.0.0", port=5000, debug=os.environ.get("FLASK_DEBUG") == "1")
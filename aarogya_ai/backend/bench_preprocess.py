@@ -0,0 +1,128 @@
+# bench_preprocess.py
+#
+# Compares the original preprocess_image path with preprocessing.load_xray on
+# peak RSS and latency. Each (pipeline, image) pair runs in a fresh process so
+# one run's high-water mark does not hide the other's.
+#
+#   python bench_preprocess.py                 # synthetic test images
+#   python bench_preprocess.py scan1.png ...   # your own files
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from preprocessing import load_xray
+
+REPEAT = 20
+
+
+# ===================== Pipelines =====================
+def baseline_preprocess(path):
+    # The pre-streaming implementation from app.py, kept for comparison
+    image = Image.open(path).convert("RGB")
+    image = image.resize((224, 224))
+    image = np.array(image) / 255.0
+    return np.expand_dims(image, axis=0).astype(np.float32)
+
+
+def streaming_preprocess(path):
+    with open(path, "rb") as f:
+        return load_xray(f)[None]
+
+
+PIPELINES = {
+    "baseline": baseline_preprocess,
+    "streaming": streaming_preprocess,
+}
+
+
+# ===================== Test images =====================
+def make_images(folder):
+    rng = np.random.default_rng(0)
+    # Smooth gradients plus noise compress like real films instead of like
+    # pure noise
+    y, x = np.mgrid[0:3000, 0:2500]
+    base = ((x + y) % 256).astype(np.uint8)
+    noise = rng.integers(0, 32, size=base.shape, dtype=np.uint8)
+    gray = base // 2 + noise
+
+    images = {
+        "gray_3000x2500.png": Image.fromarray(gray, "L"),
+        "rgb_3000x2500.png": Image.fromarray(np.dstack([gray] * 3), "RGB"),
+        "rgb_3000x2500.jpg": Image.fromarray(np.dstack([gray] * 3), "RGB"),
+    }
+    paths = []
+    for name, image in images.items():
+        path = os.path.join(folder, name)
+        image.save(path, quality=92) if name.endswith(".jpg") else image.save(path)
+        paths.append(path)
+    return paths
+
+
+# ===================== Worker =====================
+def peak_rss_kb():
+    # ru_maxrss survives fork + exec, so a child started from a large parent
+    # would inherit its high-water mark; VmHWM is reset on exec
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(pipeline, path):
+    fn = PIPELINES[pipeline]
+    rss_before = peak_rss_kb()
+    timings = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        fn(path)
+        timings.append((time.perf_counter() - started) * 1000)
+    rss_after = peak_rss_kb()
+    return {
+        "pipeline": pipeline,
+        "image": os.path.basename(path),
+        "file_kb": os.path.getsize(path) // 1024,
+        "p50_ms": round(float(np.percentile(timings, 50)), 2),
+        "p95_ms": round(float(np.percentile(timings, 95)), 2),
+        "peak_rss_delta_mb": round((rss_after - rss_before) / 1024, 1),
+    }
+
+
+def main(paths):
+    cleanup = None
+    if not paths:
+        cleanup = tempfile.TemporaryDirectory()
+        paths = make_images(cleanup.name)
+
+    print(f"{'image':22s} {'pipeline':10s} {'file KB':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'peak RSS +MB':>13s} {'max |diff|':>11s}")
+    for path in paths:
+        diff = np.max(np.abs(baseline_preprocess(path) - streaming_preprocess(path)))
+        for pipeline in PIPELINES:
+            out = subprocess.run(
+                [sys.executable, __file__, "--worker", pipeline, path],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f"{r['image']:22s} {r['pipeline']:10s} {r['file_kb']:8d} {r['p50_ms']:8.2f} "
+                  f"{r['p95_ms']:8.2f} {r['peak_rss_delta_mb']:13.1f} {diff:11.4f}")
+
+    if cleanup:
+        cleanup.cleanup()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--worker"]:
+        print(json.dumps(measure(sys.argv[2], sys.argv[3])))
+    else:
+        main(sys.argv[1:])
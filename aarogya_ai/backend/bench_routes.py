@@ -0,0 +1,363 @@
+# bench_routes.py
+#
+# Latency / throughput benchmark for the prediction routes.
+#
+#   python bench_routes.py                              # in-process (Flask test client)
+#   python bench_routes.py --url http://127.0.0.1:5000 --concurrency 1,8,32
+#   python bench_routes.py --routes diabetes,xray       # only matching routes
+#   python bench_routes.py --save baseline              # write benchmarks/baseline.json
+#   python bench_routes.py --compare baseline           # diff against it, exit 1 on regressions
+#
+# Reports p50 / p95 / p99 latency and requests per second per route. The
+# in-process mode also traces Python allocations per request with tracemalloc
+# (TensorFlow's native allocations are not visible to it). Payloads vary per
+# request, so the prediction and X-ray caches miss and the numbers measure
+# the real scoring path.
+#
+# Kept identical in backend/ and aarogya_ai/backend/ (check_shared.py).
+# Routes the app does not have are skipped.
+
+import argparse
+import http.client
+import io
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from urllib.parse import urlsplit
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.path.join(BASE_DIR, "benchmarks")
+
+# A p99 or throughput change beyond this fraction counts as a regression
+BENCH_TOLERANCE = float(os.environ.get("BENCH_TOLERANCE", "0.2"))
+WARMUP_REQUESTS = 20
+ALLOC_SAMPLE = 50
+
+# ===================== Payloads =====================
+HEART = {"gender": "Male", "age": 54, "height_cm": 172, "weight_kg": 80,
+         "exercise": "Yes", "general_health": "Good", "diabetes": "No",
+         "smoking_history": "Former", "alcohol_consumption": "Occasionally",
+         "fruit_consumption": 30, "green_veg_consumption": 12}
+DIABETES = {"gender": "Female", "age": 54, "height_cm": 160, "weight_kg": 70,
+            "exercise": "Yes", "smoking_history": "Former", "hypertension": "No",
+            "heart_disease": "No", "hba1c_level": 6.1, "blood_glucose_level": 140}
+LUNG = {"gender": "Male", "age": 61, "smoking_history": "Current",
+        "alcohol_consumption": "Occasionally", "yellow_fingers": "Yes", "anxiety": "No",
+        "chronic_disease": "No", "fatigue": "Yes", "wheezing": "Yes", "coughing": "Yes",
+        "shortness_of_breath": "No", "swallowing_difficulty": "No", "chest_pain": "Yes"}
+SCREENING = {**HEART, **DIABETES, **LUNG}
+BATCH_SIZE = 100
+WHATIF_STEPS = 100
+
+
+def vary(record, i):
+    # Distinct age / weight per request so cached answers do not count
+    record = dict(record)
+    record["age"] = 20 + i % 60
+    record["weight_kg"] = 50 + (i // 60) % 50
+    record["height_cm"] = 150 + (i // 3000) % 40
+    return record
+
+
+def json_payload(record):
+    def make(i):
+        return json.dumps(vary(record, i)).encode(), "application/json"
+    return make
+
+
+def batch_payload(record):
+    def make(i):
+        rows = [vary(record, i * BATCH_SIZE + k) for k in range(BATCH_SIZE)]
+        return json.dumps(rows).encode(), "application/json"
+    return make
+
+
+def whatif_payload(record, field, start, stop):
+    # A 100-point sweep over one field of a distinct base patient
+    def make(i):
+        grid = {"field": field, "start": start, "stop": stop, "steps": WHATIF_STEPS}
+        return json.dumps({"patient": vary(record, i), "grid": grid}).encode(), "application/json"
+    return make
+
+
+class XrayPayload:
+    """Multipart PNG uploads, a distinct image per request index."""
+
+    def __init__(self, size=1024, seed=0):
+        self.size = size
+        self.seed = seed
+        self.bodies = []
+        self.boundary = "benchboundary7d1f"
+
+    def prepare(self, n):
+        from PIL import Image
+
+        rng = np.random.default_rng(self.seed)
+        base = rng.integers(0, 256, size=(self.size, self.size), dtype=np.uint8)
+        while len(self.bodies) < n:
+            pixels = base.copy()
+            pixels[0, :8] = np.frombuffer(len(self.bodies).to_bytes(8, "little"), np.uint8)
+            buf = io.BytesIO()
+            Image.fromarray(pixels, "L").save(buf, format="PNG", compress_level=1)
+            self.bodies.append(
+                (f"--{self.boundary}\r\n"
+                 'Content-Disposition: form-data; name="file"; filename="film.png"\r\n'
+                 "Content-Type: image/png\r\n\r\n").encode()
+                + buf.getvalue() + f"\r\n--{self.boundary}--\r\n".encode()
+            )
+
+    def __call__(self, i):
+        return self.bodies[i % len(self.bodies)], f"multipart/form-data; boundary={self.boundary}"
+
+
+ROUTES = {
+    "/predict/heart": json_payload(HEART),
+    "/predict/diabetes": json_payload(DIABETES),
+    "/predict/lung": json_payload(LUNG),
+    "/predict/heart/batch": batch_payload(HEART),
+    "/predict/diabetes/batch": batch_payload(DIABETES),
+    "/predict/lung/batch": batch_payload(LUNG),
+    "/predict/screening": json_payload(SCREENING),
+    "/predict/heart/whatif": whatif_payload(HEART, "weight_kg", 50, 149),
+    "/predict/diabetes/whatif": whatif_payload(DIABETES, "hba1c_level", 4, 9),
+    "/predict/risk/heart": json_payload(HEART),
+    "/predict/risk/diabetes": json_payload(DIABETES),
+    "/predict/risk/lung": json_payload(LUNG),
+    "/predict/xray/lung": XrayPayload(),
+    "/predict/xray/bones": XrayPayload(),
+    "/predict/xray/kidney": XrayPayload(),
+    # Its own films: the single routes above have already cached theirs
+    "/predict/xray": XrayPayload(seed=1),
+}
+
+
+def request_count(route, args):
+    return args.xray_requests if route.startswith("/predict/xray") else args.requests
+
+
+# ===================== Summaries =====================
+def summarize(latencies, elapsed, errors, rejected, alloc_kb=None):
+    lat = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rejected": rejected,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0,
+        "mean_ms": round(float(lat.mean()), 3),
+        "p50_ms": round(float(np.percentile(lat, 50)), 3),
+        "p95_ms": round(float(np.percentile(lat, 95)), 3),
+        "p99_ms": round(float(np.percentile(lat, 99)), 3),
+        "alloc_kb_per_req": alloc_kb,
+    }
+
+
+# ===================== In-process =====================
+def bench_in_process(routes, args):
+    sys.path.insert(0, BASE_DIR)
+    from app import app
+
+    client = app.test_client()
+    results = {}
+    for route, payload in routes.items():
+        n = request_count(route, args)
+        if isinstance(payload, XrayPayload):
+            payload.prepare(1)
+
+        def post(i):
+            body, content_type = payload(i)
+            return client.post(route, data=body, content_type=content_type).status_code
+
+        # Warm-up also loads the model, so lazy loading is not timed
+        status = post(0)
+        if status in (404, 405):
+            print(f"{route}: not served by this app, skipped")
+            continue
+        if isinstance(payload, XrayPayload):
+            payload.prepare(WARMUP_REQUESTS + n + ALLOC_SAMPLE)
+        for i in range(1, WARMUP_REQUESTS):
+            post(i)
+
+        # Every phase uses fresh payload indices so nothing is a cache hit
+        latencies, errors, rejected = [], 0, 0
+        started = time.perf_counter()
+        for i in range(WARMUP_REQUESTS, WARMUP_REQUESTS + n):
+            t = time.perf_counter()
+            status = post(i)
+            latencies.append(time.perf_counter() - t)
+            if status in (429, 503):
+                rejected += 1
+            elif status != 200:
+                errors += 1
+        elapsed = time.perf_counter() - started
+
+        # Allocations are traced in a separate pass; tracing slows every call
+        sample = min(ALLOC_SAMPLE, n)
+        tracemalloc.start()
+        peaks = []
+        for i in range(WARMUP_REQUESTS + n, WARMUP_REQUESTS + n + sample):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            post(i)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        tracemalloc.stop()
+
+        results[f"in-process {route}"] = summarize(
+            latencies, elapsed, errors, rejected, round(sum(peaks) / sample / 1024, 1)
+        )
+        print_row(f"in-process {route}", results[f"in-process {route}"])
+    return results
+
+
+# ===================== Live server =====================
+def bench_live(routes, args):
+    url = urlsplit(args.url)
+    results = {}
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    for route, payload in routes.items():
+        n = request_count(route, args)
+        if isinstance(payload, XrayPayload):
+            payload.prepare(1)
+
+        def post(conn, i):
+            body, content_type = payload(i)
+            conn.request("POST", route, body, {"Content-Type": content_type})
+            response = conn.getresponse()
+            response.read()
+            return response.status
+
+        conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+        status = post(conn, 0)
+        if status in (404, 405):
+            print(f"{route}: not served by {args.url}, skipped")
+            continue
+        if isinstance(payload, XrayPayload):
+            payload.prepare(WARMUP_REQUESTS + n * len(levels))
+        for i in range(1, WARMUP_REQUESTS):
+            post(conn, i)
+        conn.close()
+
+        for level, concurrency in enumerate(levels):
+            # Fresh payload indices per level so nothing is a cache hit
+            first = WARMUP_REQUESTS + level * n
+            latencies, counts = [], {"errors": 0, "rejected": 0}
+            lock = threading.Lock()
+
+            def worker(k):
+                conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+                local, errors, rejected = [], 0, 0
+                for i in range(first + k, first + n, concurrency):
+                    t = time.perf_counter()
+                    status = post(conn, i)
+                    local.append(time.perf_counter() - t)
+                    if status in (429, 503):
+                        rejected += 1
+                    elif status != 200:
+                        errors += 1
+                conn.close()
+                with lock:
+                    latencies.extend(local)
+                    counts["errors"] += errors
+                    counts["rejected"] += rejected
+
+            threads = [threading.Thread(target=worker, args=(k,)) for k in range(concurrency)]
+            started = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - started
+
+            key = f"c={concurrency} {route}"
+            results[key] = summarize(latencies, elapsed, counts["errors"], counts["rejected"])
+            print_row(key, results[key])
+    return results
+
+
+# ===================== Reporting =====================
+def print_header():
+    print(f"{'benchmark':<40}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'alloc KB':>10}{'err':>5}{'429':>5}")
+
+
+def print_row(key, r):
+    alloc = "-" if r["alloc_kb_per_req"] is None else f"{r['alloc_kb_per_req']:.1f}"
+    print(f"{key:<40}{r['rps']:>9.1f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+          f"{r['p99_ms']:>9.2f}{alloc:>10}{r['errors']:>5}{r['rejected']:>5}")
+
+
+def compare(results, baseline):
+    """Print deltas against a saved baseline; return the regressed keys."""
+    regressions = []
+    print(f"\n{'benchmark':<40}{'p50':>16}{'p99':>16}{'req/s':>18}")
+    for key, r in results.items():
+        old = baseline["results"].get(key)
+        if old is None:
+            print(f"{key:<40} (not in baseline)")
+            continue
+
+        def delta(field):
+            return (r[field] - old[field]) / old[field] if old[field] else 0.0
+
+        regressed = delta("p99_ms") > BENCH_TOLERANCE or delta("rps") < -BENCH_TOLERANCE
+        print(f"{key:<40}{old['p50_ms']:>7.2f}->{r['p50_ms']:<7.2f}"
+              f"{old['p99_ms']:>7.2f}->{r['p99_ms']:<7.2f}"
+              f"{old['rps']:>8.0f}->{r['rps']:<8.0f}{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the prediction routes.")
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--concurrency", default="1,8,32", help="live mode concurrency levels")
+    parser.add_argument("--requests", type=int, default=300, help="timed requests per route")
+    parser.add_argument("--xray-requests", type=int, default=40, help="timed requests per X-ray route")
+    parser.add_argument("--routes", default="", help="comma-separated substrings to filter routes")
+    parser.add_argument("--save", metavar="NAME", help="save results to benchmarks/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare with benchmarks/NAME.json")
+    args = parser.parse_args()
+
+    routes = ROUTES
+    if args.routes:
+        wanted = args.routes.split(",")
+        routes = {r: p for r, p in ROUTES.items() if any(w in r for w in wanted)}
+
+    print_header()
+    if args.url:
+        results = bench_live(routes, args)
+    else:
+        results = bench_in_process(routes, args)
+
+    report = {
+        "mode": "live" if args.url else "in-process",
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    if args.save:
+        os.makedirs(BENCH_DIR, exist_ok=True)
+        path = os.path.join(BENCH_DIR, f"{args.save}.json")
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nsaved {path}")
+
+    if args.compare:
+        with open(os.path.join(BENCH_DIR, f"{args.compare}.json")) as f:
+            regressions = compare(results, json.load(f))
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {BENCH_TOLERANCE:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,93 +1,213 @@
 # check_accuracy.py
-
-import pandas as pd
-from joblib import load
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, classification_report
+#
+# Evaluates every model this backend serves and writes one JSON report.
+#
+#   X-ray CNNs   scored over a folder of labelled images:
+#                  EVAL_IMAGE_DIR/<model>/<class>/*.png|jpg
+#                Class indices follow the sorted folder names, which is the
+#                order Keras' image_dataset_from_directory trains with.
+#                Single-output models are read as P(second class).
+#   Risk models  scored on the train_test_split hold-out of data/*.csv,
+#                encoded with feature_schema.py and scored with the
+#                compiled scorer, exactly as the /predict/risk/* routes do.
+#
+#   python check_accuracy.py                      # every model with data
+#   python check_accuracy.py lung_xray diabetes   # a subset
+#   EVAL_MIN_AUC=0.8 python check_accuracy.py     # exit 1 below the gate
+#
+# Each model runs in its own worker process. Metrics come from evaluation.py:
+# accuracy, ROC-AUC, F1, confusion matrix and calibration.
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+from evaluation import binary_report, gate, multiclass_report
+from preprocessing import TARGET_SIZE, load_xray
 
 # ===================== Configuration =====================
-CSV_PATH = "data/heart.csv"        # Change to your dataset
-MODEL_PATH = "models/heart_model.pkl"  # Path to trained model
-TARGET_COLUMN = "Heart_Disease"
-
-# ===================== Load dataset =====================
-df = pd.read_csv(CSV_PATH)
-
-# ===================== Normalize categorical text =====================
-text_columns = [
-    "Sex", "Exercise", "Checkup", "General_Health",
-    "Skin_Cancer", "Other_Cancer", "Depression",
-    "Diabetes", "Arthritis", "Smoking_History",
-    "Alcohol_Consumption", "Age_Category", TARGET_COLUMN
-]
-
-for col in text_columns:
-    if col in df.columns and df[col].dtype == 'object':
-        df[col] = df[col].str.strip().str.title()
-
-# ===================== Mapping dictionaries =====================
-gender_map = {"Male": 0, "Female": 1}
-yes_no_map = {"No": 0, "Yes": 1}
-smoking_map = {"Never": 0, "Former": 1, "Current": 2}
-alcohol_map = {"Never": 0, "Occasionally": 1, "Frequently": 2}
-health_map = {"Poor": 0, "Fair": 1, "Good": 2, "Very Good": 3, "Excellent": 4}
-age_map = {
-    "18-24": 0, "25-29": 1, "30-34": 2, "35-39": 3, "40-44": 4,
-    "45-49": 5, "50-54": 6, "55-59": 7, "60-64": 8, "65-69": 9,
-    "70-74": 10, "75-79": 11, "80+": 12
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EVAL_WORKERS = int(os.environ.get("EVAL_WORKERS", "3"))
+EVAL_REPORT = os.environ.get("EVAL_REPORT", os.path.join(BASE_DIR, "models", "eval_report.json"))
+EVAL_IMAGE_DIR = os.environ.get("EVAL_IMAGE_DIR", os.path.join(BASE_DIR, "data", "xray"))
+EVAL_BATCH_SIZE = int(os.environ.get("EVAL_BATCH_SIZE", "32"))
+EVAL_THRESHOLD = float(os.environ.get("EVAL_THRESHOLD", "0.5"))
+
+
+def env_float(name):
+    value = os.environ.get(name, "")
+    return float(value) if value else None
+
+# Promotion gates, off unless set
+EVAL_MIN_ACCURACY = env_float("EVAL_MIN_ACCURACY")
+EVAL_MIN_AUC = env_float("EVAL_MIN_AUC")
+EVAL_MAX_ECE = env_float("EVAL_MAX_ECE")
+
+# Same names and files as the registry in app.py
+XRAY_MODELS = {
+    "lung_xray": "best_lung_model.h5",
+    "bones": "best_custom_cnn.h5",
+    "kidney": "kidney_model.keras",
 }
-
-mapping_dict = {
-    "Sex": gender_map,
-    "Exercise": yes_no_map,
-    "Checkup": yes_no_map,
-    "General_Health": health_map,
-    "Skin_Cancer": yes_no_map,
-    "Other_Cancer": yes_no_map,
-    "Depression": yes_no_map,
-    "Diabetes": yes_no_map,
-    "Arthritis": yes_no_map,
-    "Smoking_History": smoking_map,
-    "Alcohol_Consumption": alcohol_map,
-    "Age_Category": age_map,
-    TARGET_COLUMN: yes_no_map  # Encode target as 0/1
+RISK_MODELS = {
+    # name: (training CSV, feature schema, model file)
+    "heart": ("heart.csv", "heart", "heart_model.pkl"),
+    "diabetes": ("diabetes.csv", "diabetes", "diabetes_model.pkl"),
+    "lung_risk": ("lung.csv", "lung", "lung_model.pkl"),
 }
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+# ===================== X-ray models =====================
+def labelled_images(folder):
+    classes = sorted(
+        d for d in os.listdir(folder) if os.path.isdir(os.path.join(folder, d))
+    )
+    paths, labels = [], []
+    for k, cls in enumerate(classes):
+        for name in sorted(os.listdir(os.path.join(folder, cls))):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(folder, cls, name))
+                labels.append(k)
+    return classes, paths, np.array(labels, dtype=np.int64)
+
+
+def evaluate_xray(name):
+    model_path = os.path.join(BASE_DIR, "models", XRAY_MODELS[name])
+    folder = os.path.join(EVAL_IMAGE_DIR, name)
+    if not os.path.exists(model_path) or not os.path.isdir(folder):
+        return {"skipped": f"{model_path} or {folder} not found"}
+
+    # TensorFlow is only imported in workers that score an image model
+    from inference import load_xray_model
+
+    started = time.perf_counter()
+    classes, paths, labels = labelled_images(folder)
+    model = load_xray_model(name, model_path)
+
+    batch = np.empty((EVAL_BATCH_SIZE,) + TARGET_SIZE[::-1] + (3,), dtype=np.float32)
+    outputs = []
+    for start in range(0, len(paths), EVAL_BATCH_SIZE):
+        chunk = paths[start:start + EVAL_BATCH_SIZE]
+        for i, path in enumerate(chunk):
+            with open(path, "rb") as f:
+                load_xray(f, batch[i])
+        outputs.append(np.asarray(model(batch[:len(chunk)]), dtype=np.float64))
+    outputs = np.concatenate(outputs) if outputs else np.empty((0, 1))
+
+    if outputs.shape[1] == 1:
+        if len(classes) != 2:
+            return {"skipped": f"single-output model needs 2 class folders, found {classes}"}
+        report = binary_report(labels, outputs[:, 0], EVAL_THRESHOLD, labels=classes)
+    else:
+        if outputs.shape[1] != len(classes):
+            return {"skipped": f"model has {outputs.shape[1]} outputs, found {len(classes)} "
+                               f"class folders {classes}"}
+        report = multiclass_report(labels, outputs, classes)
+
+    report.update({
+        "kind": "xray",
+        "model_path": model_path,
+        "image_dir": folder,
+        "eval_s": round(time.perf_counter() - started, 3),
+    })
+    return report
+
+
+# ===================== Risk models =====================
+def evaluate_risk(name):
+    import pandas as pd
+    from joblib import load
+    from sklearn.model_selection import train_test_split
+
+    from compiled_model import compile_model
+    from feature_schema import ENCODERS
+
+    csv_name, schema, model_file = RISK_MODELS[name]
+    csv_path = os.path.join(BASE_DIR, "data", csv_name)
+    model_path = os.path.join(BASE_DIR, "models", model_file)
+    if not os.path.exists(csv_path) or not os.path.exists(model_path):
+        return {"skipped": f"{csv_path} or {model_path} not found"}
+
+    started = time.perf_counter()
+    encoder = ENCODERS[schema]
+    df = pd.read_csv(csv_path)
+
+    # The serving schema's codes (as app.py encodes requests and
+    # train_models.py trains), then the same split as train_models.py
+    X = encoder.encode_frame(df)
+    y = encoder.encode_target(df).to_numpy()
+    _, X_test, _, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    # The same checks and compiled scorer as the route's loader
+    model = load(model_path)
+    encoder.check_model(model)
+    prob = compile_model(model).predict_proba(X_test.to_numpy())
+    report = binary_report(y_test, prob, EVAL_THRESHOLD,
+                           labels=[str(c) for c in model.classes_])
+    report.update({
+        "kind": "tabular",
+        "model_path": model_path,
+        "eval_s": round(time.perf_counter() - started, 3),
+    })
+    return report
+
+
+def evaluate(name):
+    if name in XRAY_MODELS:
+        return name, evaluate_xray(name)
+    return name, evaluate_risk(name)
+
+
+def print_summary(reports):
+    print(f"{'model':<12}{'kind':<9}{'rows':>8}{'accuracy':>10}{'roc_auc':>9}"
+          f"{'ece':>8}{'eval s':>8}")
+    for name, r in reports.items():
+        if "skipped" in r:
+            print(f"{name:<12} skipped: {r['skipped']}")
+            continue
+        print(f"{name:<12}{r['kind']:<9}{r['rows']:>8}{r['accuracy']:>10.4f}"
+              f"{r['roc_auc'] or 0:>9.4f}{r['calibration']['ece']:>8.4f}{r['eval_s']:>8.2f}")
 
-# ===================== Encode categorical columns =====================
-for col, map_dict in mapping_dict.items():
-    if col in df.columns:
-        df[col] = df[col].map(map_dict)
-
-# ===================== Split features and target =====================
-X = df.drop(TARGET_COLUMN, axis=1)
-y = df[TARGET_COLUMN]
-
-# ===================== Handle missing values =====================
-numeric_cols = X.select_dtypes(include=['int64', 'float64']).columns
-X[numeric_cols] = X[numeric_cols].fillna(X[numeric_cols].mean())
-
-categorical_cols = X.select_dtypes(include=['object', 'category']).columns
-for col in categorical_cols:
-    mode_val = X[col].mode()
-    if not mode_val.empty:
-        X[col] = X[col].fillna(mode_val[0])
-
-X = X.fillna(0)
-
-# ===================== Split train/test =====================
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
-)
-
-# ===================== Load trained model =====================
-model = load(MODEL_PATH)
-
-# ===================== Make predictions =====================
-y_pred = model.predict(X_test)
 
 # ===================== Evaluate =====================
-accuracy = accuracy_score(y_test, y_pred)
-print(f"Accuracy: {accuracy:.4f}")
-print("\nClassification Report:\n")
-print(classification_report(y_test, y_pred))
-
+if __name__ == "__main__":
+    all_models = list(XRAY_MODELS) + list(RISK_MODELS)
+    names = sys.argv[1:] or all_models
+    unknown = [n for n in names if n not in all_models]
+    if unknown:
+        sys.exit(f"unknown models {unknown}; choose from {all_models}")
+
+    started = time.perf_counter()
+    workers = max(1, min(EVAL_WORKERS, len(names)))
+    # One fresh process per model; TensorFlow state is never forked
+    with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=1) as pool:
+        reports = dict(pool.map(evaluate, names))
+
+    failed = {}
+    for name, r in reports.items():
+        if "skipped" not in r:
+            missed = gate(r, EVAL_MIN_ACCURACY, EVAL_MIN_AUC, EVAL_MAX_ECE)
+            if missed:
+                failed[name] = missed
+
+    print_summary(reports)
+    with open(EVAL_REPORT, "w") as f:
+        json.dump({
+            "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "wall_s": round(time.perf_counter() - started, 3),
+            "gates": {"min_accuracy": EVAL_MIN_ACCURACY, "min_auc": EVAL_MIN_AUC,
+                      "max_ece": EVAL_MAX_ECE},
+            "failed": failed,
+            "models": reports,
+        }, f, indent=2)
+    print(f"\nreport written to {EVAL_REPORT}")
+
+    for name, missed in failed.items():
+        print(f"GATE FAILED {name}: {', '.join(missed)}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,165 @@
+# check_backpressure.py
+#
+# Checks that an X-ray burst cannot take every request thread away from the
+# risk routes.
+#
+#   python check_backpressure.py                  # in-process, deterministic
+#   python check_backpressure.py --url http://127.0.0.1:5000 --size 1024
+#
+# In-process, a pool of THREADS threads stands in for gunicorn's gthread
+# request threads, and the CNN and tabular pools are built as app.py builds
+# them. --burst X-ray requests are sent first; their CNN jobs block until the
+# check ends, like uploads stuck behind a slow model. A risk request sent
+# after them must still complete within --max-risk-ms. That holds because
+# executors.py admits at most THREADS - 1 CNN jobs: the spare request thread
+# turns the rest of the burst away with 429 and then serves the risk request.
+#
+# With --url, --burst concurrent X-ray uploads of --size films go to a
+# running server while --risk sequential /predict/risk/* requests are timed.
+# One shared CPU adds its own queueing, so the latency there is a report;
+# only a failed risk request fails the check.
+#
+# Exit status 1 when the check fails.
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from urllib.parse import urlsplit
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+from executors import (  # noqa: E402
+    BoundedExecutor, Overloaded, THREADS,
+    CNN_WORKERS, CNN_QUEUE, CNN_ADMIT,
+    TABULAR_WORKERS, TABULAR_QUEUE, TABULAR_TIMEOUT,
+)
+
+RISK_ROUTES = ["heart", "diabetes", "lung"]
+
+
+# ===================== In-process =====================
+def check_in_process(args):
+    cnn = BoundedExecutor("cnn", CNN_WORKERS, CNN_QUEUE, 60, max_admitted=CNN_ADMIT)
+    tabular = BoundedExecutor("tabular", TABULAR_WORKERS, TABULAR_QUEUE, TABULAR_TIMEOUT)
+    request_threads = ThreadPoolExecutor(THREADS, thread_name_prefix="request")
+    release = threading.Event()
+
+    def xray_request():
+        try:
+            cnn.run(release.wait)
+            return 200
+        except Overloaded as e:
+            return e.status
+
+    def risk_request():
+        return tabular.run(lambda: 200)
+
+    burst = [request_threads.submit(xray_request) for _ in range(args.burst)]
+    started = time.perf_counter()
+    risk = request_threads.submit(risk_request)
+    try:
+        status = risk.result(timeout=args.max_risk_ms / 1000)
+    except TimeoutError:
+        status = None
+    waited = (time.perf_counter() - started) * 1000
+    admitted = cnn.stats()["in_flight"]
+    release.set()
+    request_threads.shutdown()
+
+    counts = {}
+    for future in burst:
+        counts[future.result()] = counts.get(future.result(), 0) + 1
+    print(f"request threads {THREADS}, CNN jobs admitted at most {CNN_ADMIT} "
+          f"(CNN_WORKERS {CNN_WORKERS} + CNN_QUEUE {CNN_QUEUE})")
+    print(f"xray  {args.burst} requests, {admitted} holding a thread: "
+          + ", ".join(f"{s}: {n}" for s, n in sorted(counts.items())))
+    if status is None:
+        print(f"risk  no answer within {args.max_risk_ms:g} ms: every request thread is held")
+    else:
+        print(f"risk  {status} in {waited:.1f} ms")
+    return status == 200
+
+
+# ===================== Live server =====================
+def post(url, path, body, content_type):
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=120)
+    started = time.perf_counter()
+    try:
+        conn.request("POST", path, body=body, headers={"Content-Type": content_type})
+        response = conn.getresponse()
+        response.read()
+        return response.status, time.perf_counter() - started
+    except (OSError, http.client.HTTPException):
+        return None, time.perf_counter() - started
+    finally:
+        conn.close()
+
+
+def check_server(args):
+    from synthetic import PatientSampler, XraySampler, multipart
+
+    url = urlsplit(args.url)
+    films = XraySampler(size=args.size)
+    uploads = [multipart([films.image()]) for _ in range(args.burst + 1)]
+    patients = PatientSampler()
+
+    def risk_body():
+        return json.dumps(patients.sample()).encode(), "application/json"
+
+    # Load the CNN and the risk models first, so loading is not timed below
+    post(url, "/predict/xray/lung", *uploads.pop())
+    for route in RISK_ROUTES:
+        post(url, f"/predict/risk/{route}", *risk_body())
+
+    xray_status = []
+    start = threading.Barrier(args.burst + 1)
+
+    def upload(body, content_type):
+        start.wait()
+        xray_status.append(post(url, "/predict/xray/lung", body, content_type)[0])
+
+    threads = [threading.Thread(target=upload, args=u) for u in uploads]
+    for t in threads:
+        t.start()
+    start.wait()
+    time.sleep(0.05)    # let the burst reach the server first
+
+    risk = [post(url, f"/predict/risk/{RISK_ROUTES[i % len(RISK_ROUTES)]}", *risk_body())
+            for i in range(args.risk)]
+    for t in threads:
+        t.join()
+
+    counts = {}
+    for status in xray_status:
+        counts[status] = counts.get(status, 0) + 1
+    ms = np.array([seconds * 1000 for _, seconds in risk])
+    failed = [status for status, _ in risk if status != 200]
+    print(f"xray  {args.burst} uploads of {args.size}x{args.size}: "
+          + ", ".join(f"{s}: {n}" for s, n in sorted(counts.items(), key=str)))
+    print(f"risk  {len(risk)} requests: p50 {np.percentile(ms, 50):.1f} ms, "
+          f"max {ms.max():.1f} ms, failed {len(failed)}")
+    return not failed
+
+
+# ===================== Main =====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that an X-ray burst leaves the risk routes a thread")
+    parser.add_argument("--url", help="running server to test; in-process when omitted")
+    parser.add_argument("--burst", type=int, default=48, help="concurrent X-ray requests")
+    parser.add_argument("--max-risk-ms", type=float, default=2000.0,
+                        help="in-process: how long the risk request may take")
+    parser.add_argument("--size", type=int, default=1024, help="--url: film width and height")
+    parser.add_argument("--risk", type=int, default=10, help="--url: risk requests sent")
+    args = parser.parse_args()
+
+    ok = check_server(args) if args.url else check_in_process(args)
+    print("OK" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,145 @@
+# executors.py
+#
+# Bounded inference pools with admission control. X-ray work (decode + CNN)
+# and tabular scoring run in separate pools, so a burst of X-ray uploads can
+# only fill the small CNN pool; it cannot occupy the server's request
+# threads and stall the cheap risk routes queued behind it.
+#
+# Each pool admits at most `workers + max_queue` jobs. Past that, requests
+# are turned away at once with 429 and a Retry-After estimate. A job that
+# is admitted but still not finished after `timeout` seconds gets 503.
+#
+# The request thread waits for its job, so every admitted CNN job also holds
+# one of the server's THREADS request threads. The CNN pool therefore admits
+# at most THREADS - 1 jobs, whatever CNN_WORKERS and CNN_QUEUE allow: an
+# X-ray burst is answered 429 while one thread is still free for the risk
+# routes, instead of occupying every thread first.
+
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from metrics import profiler
+
+# ===================== Configuration =====================
+CNN_WORKERS = int(os.environ.get("CNN_WORKERS", os.environ.get("XRAY_MAX_BATCH_SIZE", "8")))
+CNN_QUEUE = int(os.environ.get("CNN_QUEUE", "16"))
+CNN_TIMEOUT = float(os.environ.get("CNN_TIMEOUT", "30"))
+
+TABULAR_WORKERS = int(os.environ.get("TABULAR_WORKERS", "8"))
+TABULAR_QUEUE = int(os.environ.get("TABULAR_QUEUE", "256"))
+TABULAR_TIMEOUT = float(os.environ.get("TABULAR_TIMEOUT", "5"))
+
+# Request threads per worker; gunicorn.conf.py reads the same variable
+THREADS = int(os.environ.get("THREADS", "4"))
+CNN_ADMIT = max(1, min(CNN_WORKERS + CNN_QUEUE, THREADS - 1))
+
+
+class Overloaded(Exception):
+    def __init__(self, pool, status, retry_after, message):
+        super().__init__(message)
+        self.pool = pool
+        self.status = status
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    def __init__(self, name, workers, max_queue, timeout, max_admitted=None):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_admitted = min(workers + max_queue, max_admitted or workers + max_queue)
+        self._slots = threading.BoundedSemaphore(self.max_admitted)
+        self._executor = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+        # ---------- Metrics ----------
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.service_total = 0.0
+
+    def _pool(self):
+        # Created lazily and again after fork, like the micro-batchers
+        if self._pid != os.getpid():
+            with self._start_lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix=f"pool-{self.name}"
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+    def retry_after(self):
+        with self._lock:
+            mean_service = self.service_total / self.completed if self.completed else 1.0
+            queued = max(self.in_flight - self.running, 0)
+        return max(1, math.ceil(queued * mean_service / self.workers))
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded(self.name, 429, self.retry_after(),
+                             f"{self.name} pool is full, retry later")
+
+        with self._lock:
+            self.in_flight += 1
+        future = self._pool().submit(
+            self._call, fn, args, time.perf_counter(), threading.get_ident()
+        )
+        # Also fires for jobs cancelled before they start, so slots never leak
+        future.add_done_callback(self._release)
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise Overloaded(self.name, 503, self.retry_after(),
+                             f"{self.name} pool timed out after {self.timeout:g}s")
+
+    def _call(self, fn, args, submitted, owner):
+        started = time.perf_counter()
+        with self._lock:
+            self.running += 1
+            self.wait_total += started - submitted
+        try:
+            # Profiles of the submitting request include this pool thread
+            with profiler.working_for(owner):
+                return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.service_total += time.perf_counter() - started
+
+    def _release(self, future):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "max_admitted": self.max_admitted,
+                "in_flight": self.in_flight,
+                "running": self.running,
+                "queue_depth": max(self.in_flight - self.running, 0),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "mean_wait_ms": round(self.wait_total / self.completed * 1000, 3) if self.completed else 0,
+                "mean_service_ms": round(self.service_total / self.completed * 1000, 3) if self.completed else 0,
+            }
@@ -0,0 +1,90 @@
+# export_tflite.py
+#
+# Exports float16 / int8 TFLite variants of the X-ray CNNs and writes an
+# accuracy-parity report against the Keras model for each one.
+#
+#   python export_tflite.py --quantization float16 --images data/xray_samples
+#
+# Serve the exported files with XRAY_TFLITE=float16 (or int8).
+
+import argparse
+import json
+import os
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+
+from inference import CompiledModel, TFLiteModel, export_tflite, parity_report, tflite_path
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+XRAY_MODELS = {
+    "lung": os.path.join(BASE_DIR, "models", "best_lung_model.h5"),
+    "bones": os.path.join(BASE_DIR, "models", "best_custom_cnn.h5"),
+    "kidney": os.path.join(BASE_DIR, "models", "kidney_model.keras"),
+}
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+def load_images(folder, limit):
+    images = []
+    if folder:
+        for root, _, files in os.walk(folder):
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS) and len(images) < limit:
+                    image = Image.open(os.path.join(root, name)).convert("RGB")
+                    image = image.resize((224, 224))
+                    images.append(np.asarray(image, dtype=np.float32) / 255.0)
+    if not images:
+        # No labelled samples available: parity on random inputs still
+        # catches conversion bugs, but says little about real accuracy
+        print("No images found, using random inputs for calibration and parity")
+        rng = np.random.default_rng(0)
+        images = list(rng.random((limit, 224, 224, 3), dtype=np.float32))
+    return np.stack(images)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export TFLite variants of the X-ray CNNs next to the Keras files "
+                    "(<model file>.<quantization>.tflite) with a .parity.json report "
+                    "comparing their outputs with the Keras model. Serve them with "
+                    "XRAY_TFLITE=<quantization>."
+    )
+    parser.add_argument("--model", choices=[*XRAY_MODELS, "all"], default="all",
+                        help="CNN to export (default: all)")
+    parser.add_argument("--quantization", choices=["float16", "int8"], default="float16",
+                        help="float16 halves the weights; int8 also quantizes "
+                             "activations, calibrated on --images")
+    parser.add_argument("--images", help="folder of sample X-ray images for int8 calibration "
+                                         "and the parity report (random inputs if omitted)")
+    parser.add_argument("--limit", type=int, default=64,
+                        help="most sample images to use (default: 64)")
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.limit)
+    names = list(XRAY_MODELS) if args.model == "all" else [args.model]
+
+    for name in names:
+        keras_path = XRAY_MODELS[name]
+        compiled = CompiledModel(name, tf.keras.models.load_model(keras_path))
+        out_path = tflite_path(keras_path, args.quantization)
+
+        size = export_tflite(compiled, out_path, args.quantization, images)
+        report = parity_report(compiled, TFLiteModel(name, out_path), images)
+        report.update({
+            "model": name,
+            "quantization": args.quantization,
+            "keras_bytes": os.path.getsize(keras_path),
+            "tflite_bytes": size,
+        })
+
+        with open(out_path.replace(".tflite", ".parity.json"), "w") as f:
+            json.dump(report, f, indent=2)
+        print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,598 @@
+# feature_schema.py
+#
+# One declarative schema per risk model: the model's column order, where each
+# column comes from in an API request and in the training CSV, the category
+# codes and the defaults. Serving, batch scoring, training and accuracy checks
+# all encode through the compiled encoders at the bottom of this file, so the
+# codes a model is trained on are the codes it is served with.
+#
+# Kept identical in backend/ and aarogya_ai/backend/ (check_shared.py).
+
+import itertools
+import math
+
+import numpy as np
+
+# ===================== Mappings =====================
+gender_map = {"Male": 0, "Female": 1}
+yes_no_map = {"Yes": 1, "No": 0}
+smoking_map = {"Never": 0, "Former": 1, "Current": 2}
+alcohol_map = {"Never": 0, "Occasionally": 1, "Frequently": 2}
+health_map = {"Poor": 0, "Fair": 1, "Good": 2, "Very Good": 3, "Excellent": 4}
+age_map = {
+    "18-24": 0, "25-29": 1, "30-34": 2, "35-39": 3, "40-44": 4,
+    "45-49": 5, "50-54": 6, "55-59": 7, "60-64": 8, "65-69": 9,
+    "70-74": 10, "75-79": 11, "80+": 12
+}
+
+# Several CSVs store yes/no answers as 1 (No) / 2 (Yes)
+one_two_yes_no = {"1": "No", "2": "Yes"}
+
+
+# ===================== Helpers =====================
+def calculate_bmi(weight_kg, height_cm):
+    if weight_kg and height_cm:
+        return round(weight_kg / ((height_cm / 100) ** 2), 2)
+    return 0
+
+def to_float(value, default, name):
+    if value is None or value == "":
+        return default
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name}: expected a number, got {value!r}")
+    # float() accepts "inf" and "nan"; neither is a measurement
+    if not math.isfinite(number):
+        raise ValueError(f"{name}: expected a finite number, got {value!r}")
+    return number
+
+def category_code(mapping, value, default, name):
+    try:
+        return mapping.get(value, default)
+    except TypeError:
+        # A JSON list or object is unhashable, and never a label
+        raise ValueError(f"{name}: expected a category label, got {value!r}")
+
+def age_category(age):
+    # Same 5-year buckets as the Age_Category column in heart.csv
+    return min(max(int(age - 20) // 5, 0), 12)
+
+
+# ===================== Schemas =====================
+# Column keys:
+#   column   model / CSV column name, in model order
+#   field    request field it is read from (None = not asked, use default)
+#   kind     "category", "number", "bmi" or "age_category"
+#   map      category label -> code
+#   aliases  raw CSV value -> category label, for datasets that spell
+#            categories differently from the API
+#   default  value used when the field is missing or the label is unknown
+
+HEART_SCHEMA = {
+    "target": {"column": "Heart_Disease", "map": yes_no_map},
+    "columns": [
+        {"column": "General_Health", "field": "general_health", "kind": "category",
+         "map": health_map, "default": 2},
+        # Not asked: assume a yearly checkup
+        {"column": "Checkup", "field": None, "kind": "category", "map": yes_no_map,
+         "default": 1},
+        {"column": "Exercise", "field": "exercise", "kind": "category",
+         "map": yes_no_map, "default": 0},
+        {"column": "Skin_Cancer", "field": None, "kind": "category",
+         "map": yes_no_map, "default": 0},
+        {"column": "Other_Cancer", "field": None, "kind": "category",
+         "map": yes_no_map, "default": 0},
+        {"column": "Depression", "field": None, "kind": "category",
+         "map": yes_no_map, "default": 0},
+        {"column": "Diabetes", "field": "diabetes", "kind": "category",
+         "map": yes_no_map, "default": 0},
+        {"column": "Arthritis", "field": None, "kind": "category",
+         "map": yes_no_map, "default": 0},
+        {"column": "Sex", "field": "gender", "kind": "category",
+         "map": gender_map, "default": 0},
+        {"column": "Age_Category", "field": "age", "kind": "age_category",
+         "map": age_map, "default": 0},
+        {"column": "Height_(cm)", "field": "height_cm", "kind": "number", "default": 0.0},
+        {"column": "Weight_(kg)", "field": "weight_kg", "kind": "number", "default": 0.0},
+        {"column": "BMI", "field": "bmi", "kind": "bmi", "default": 0.0},
+        {"column": "Smoking_History", "field": "smoking_history", "kind": "category",
+         "map": smoking_map, "default": 0},
+        {"column": "Alcohol_Consumption", "field": "alcohol_consumption", "kind": "category",
+         "map": alcohol_map, "default": 0},
+        {"column": "Fruit_Consumption", "field": "fruit_consumption", "kind": "number",
+         "default": 0.0},
+        {"column": "Green_Vegetables_Consumption", "field": "green_veg_consumption",
+         "kind": "number", "default": 0.0},
+        {"column": "FriedPotato_Consumption", "field": None, "kind": "number",
+         "default": 0.0},
+    ],
+}
+
+DIABETES_SCHEMA = {
+    "target": {"column": "diabetes"},
+    "columns": [
+        {"column": "gender", "field": "gender", "kind": "category",
+         "map": gender_map, "default": 0},
+        {"column": "age", "field": "age", "kind": "number", "default": 0.0},
+        {"column": "hypertension", "field": "hypertension", "kind": "category",
+         "map": yes_no_map, "aliases": {"0": "No", "1": "Yes"}, "default": 0},
+        {"column": "heart_disease", "field": "heart_disease", "kind": "category",
+         "map": yes_no_map, "aliases": {"0": "No", "1": "Yes"}, "default": 0},
+        {"column": "smoking_history", "field": "smoking_history", "kind": "category",
+         "map": smoking_map,
+         "aliases": {"former": "Former", "not current": "Former", "ever": "Former",
+                     "No Info": "Never"},
+         "default": 0},
+        {"column": "bmi", "field": "bmi", "kind": "bmi", "default": 0.0},
+        {"column": "HbA1c_level", "field": "hba1c_level", "kind": "number", "default": 0.0},
+        {"column": "blood_glucose_level", "field": "blood_glucose_level", "kind": "number",
+         "default": 0.0},
+    ],
+}
+
+LUNG_SCHEMA = {
+    "target": {"column": "LUNG_CANCER", "map": yes_no_map},
+    "columns": [
+        {"column": "GENDER", "field": "gender", "kind": "category",
+         "map": gender_map, "aliases": {"M": "Male", "F": "Female"}, "default": 0},
+        {"column": "AGE", "field": "age", "kind": "number", "default": 0.0},
+        {"column": "SMOKING", "field": "smoking_history", "kind": "category",
+         "map": smoking_map, "aliases": {"1": "Never", "2": "Current"}, "default": 0},
+        {"column": "YELLOW_FINGERS", "field": "yellow_fingers", "kind": "category",
+         "map": yes_no_map, "aliases": one_two_yes_no, "default": 0},
+        {"column": "ANXIETY", "field": "anxiety", "kind": "category",
+         "map": yes_no_map, "aliases": one_two_yes_no, "default": 0},
+        {"column": "PEER_PRESSURE", "field": "peer_pressure", "kind": "category",
+         "map": yes_no_map, "aliases": one_two_yes_no, "default": 0},
+        {"column": "CHRONIC DISEASE", "field": "chronic_disease", "kind": "category",
+         "map": yes_no_map, "aliases": one_two_yes_no, "default": 0},
+        {"column": "FATIGUE ", "field": "fatigue", "kind": "category",
+         "map": yes_no_map, "aliases": one_two_yes_no, "default": 0},
+        {"column": "ALLERGY ", "field": "allergy", "kind": "category",
+         "map": yes_no_map, "aliases": one_two_yes_no, "default": 0},
+        {"column": "WHEEZING", "field": "wheezing", "kind": "category",
+         "map": yes_no_map, "aliases": one_two_yes_no, "default": 0},
+        {"column": "ALCOHOL CONSUMING", "field": "alcohol_consumption", "kind": "category",
+         "map": alcohol_map, "aliases": {"1": "Never", "2": "Frequently"}, "default": 0},
+        {"column": "COUGHING", "field": "coughing", "kind": "category",
+         "map": yes_no_map, "aliases": one_two_yes_no, "default": 0},
+        {"column": "SHORTNESS OF BREATH", "field": "shortness_of_breath", "kind": "category",
+         "map": yes_no_map, "aliases": one_two_yes_no, "default": 0},
+        {"column": "SWALLOWING DIFFICULTY", "field": "swallowing_difficulty",
+         "kind": "category", "map": yes_no_map, "aliases": one_two_yes_no, "default": 0},
+        {"column": "CHEST PAIN", "field": "chest_pain", "kind": "category",
+         "map": yes_no_map, "aliases": one_two_yes_no, "default": 0},
+    ],
+}
+
+SCHEMAS = {
+    "heart": HEART_SCHEMA,
+    "diabetes": DIABETES_SCHEMA,
+    "lung": LUNG_SCHEMA,
+}
+
+
+# ===================== Compiled encoder =====================
+def _frame_lookup(col):
+    # Case-insensitive label -> code table for raw CSV values
+    lookup = {label.lower(): code for label, code in col.get("map", {}).items()}
+    for raw, label in col.get("aliases", {}).items():
+        lookup[str(raw).strip().lower()] = col["map"][label]
+    return lookup
+
+
+class FeatureEncoder:
+    def __init__(self, name, schema):
+        self.name = name
+        self.schema = schema
+        self.columns = [c["column"] for c in schema["columns"]]
+        self.n_features = len(self.columns)
+
+        # Fields nobody asks for never change, so they are baked into the
+        # template row once and every request starts from a copy of it
+        self.template = np.zeros(self.n_features, dtype=np.float64)
+        self.categories = []
+        self.numbers = []
+        self.bmi = None
+        self.age_category = None
+        self.height = self.weight = None
+
+        for j, col in enumerate(schema["columns"]):
+            field, kind = col["field"], col["kind"]
+            self.template[j] = col["default"]
+            if field == "height_cm":
+                self.height = j
+            elif field == "weight_kg":
+                self.weight = j
+
+            if field is None:
+                continue
+            if kind == "category":
+                self.categories.append((j, field, col["map"], col["default"]))
+            elif kind == "number":
+                self.numbers.append((j, field, col["default"]))
+            elif kind == "bmi":
+                self.bmi = (j, field)
+            elif kind == "age_category":
+                self.age_category = (j, field)
+            else:
+                raise ValueError(f"{name}.{col['column']}: unknown kind {kind!r}")
+
+        # Request field -> the columns its value feeds. BMI is derived from
+        # weight and height when it is not given
+        self.field_columns = {}
+        for j, col in enumerate(schema["columns"]):
+            if col["field"] is not None:
+                self.field_columns.setdefault(col["field"], set()).add(j)
+        if self.bmi is not None:
+            for field in ("weight_kg", "height_cm"):
+                self.field_columns.setdefault(field, set()).add(self.bmi[0])
+
+    # ---------- API requests ----------
+    def encode_into(self, data, row):
+        row[:] = self.template
+        for j, field, mapping, default in self.categories:
+            row[j] = category_code(mapping, data.get(field), default, field)
+        for j, field, default in self.numbers:
+            row[j] = to_float(data.get(field), default, field)
+
+        if self.age_category is not None:
+            j, field = self.age_category
+            row[j] = age_category(to_float(data.get(field), 0.0, field))
+
+        if self.bmi is not None:
+            row[self.bmi[0]] = self.request_bmi(data)
+        return row
+
+    def request_bmi(self, data):
+        # The bmi field when given, else derived from weight and height
+        field = self.bmi[1]
+        bmi = to_float(data.get(field), 0.0, field)
+        if not bmi:
+            weight = to_float(data.get("weight_kg"), 0.0, "weight_kg")
+            height = to_float(data.get("height_cm"), 0.0, "height_cm")
+            bmi = calculate_bmi(weight, height)
+        return bmi
+
+    def encode(self, data):
+        return self.encode_into(data, np.empty(self.n_features, dtype=np.float64))
+
+    def encode_request_frame(self, df):
+        """Vectorized encode_records for a frame whose columns are request fields.
+
+        Cells mean what they would in a request: missing, NaN and "" take the
+        default, categories match their labels exactly. Returns
+        (X, index, errors) like encode_records, with the same error messages.
+        """
+        import pandas as pd
+
+        n = len(df)
+        X = np.tile(self.template, (n, 1))
+        error = np.full(n, None, dtype=object)
+
+        def parse(field, default, rows=None):
+            if field not in df.columns:
+                return np.full(n, default, dtype=np.float64)
+            values = df[field]
+            if pd.api.types.is_numeric_dtype(values.dtype):
+                # Parquet numbers: only NaN needs the default
+                parsed = values.to_numpy(dtype=np.float64, copy=True)
+                parsed[np.isnan(parsed)] = default
+                cells = parsed
+            else:
+                cells = values.to_numpy(dtype=object, copy=True)
+                missing = pd.isna(cells) | (cells == "")
+                cells[missing] = default
+                try:
+                    # float() on every cell, as to_float does
+                    parsed = cells.astype(np.float64)
+                except (TypeError, ValueError):
+                    # Some cell is not a number: find it, then let to_float
+                    # produce the value or the API's error message for just
+                    # those cells
+                    parsed = pd.to_numeric(cells, errors="coerce").astype(np.float64)
+                    odd = np.isnan(parsed) & ~missing
+                    # pandas' parser can differ from float() in the last
+                    # digit of long decimals: re-parse the good cells
+                    parsed[~odd] = cells[~odd].astype(np.float64)
+                    if rows is not None:
+                        odd &= rows
+                    for i in np.flatnonzero(odd):
+                        try:
+                            parsed[i] = to_float(cells[i], default, field)
+                        except ValueError as e:
+                            if error[i] is None:
+                                error[i] = str(e)
+
+            # "inf" / "nan" cells and infinite Parquet numbers: the same
+            # error to_float gives a JSON request
+            bad = ~np.isfinite(parsed)
+            if rows is not None:
+                bad &= rows
+            for i in np.flatnonzero(bad):
+                cell = cells[i].item() if isinstance(cells[i], np.generic) else cells[i]
+                try:
+                    to_float(cell, default, field)
+                except ValueError as e:
+                    if error[i] is None:
+                        error[i] = str(e)
+            return parsed
+
+        for j, field, mapping, default in self.categories:
+            if field not in df.columns:
+                continue
+            try:
+                X[:, j] = df[field].map(mapping).fillna(default).to_numpy(dtype=np.float64)
+            except TypeError:
+                # A list or object cell: look each cell up as encode() does
+                for i, cell in enumerate(df[field].to_numpy(dtype=object)):
+                    try:
+                        X[i, j] = category_code(mapping, cell, default, field)
+                    except ValueError as e:
+                        if error[i] is None:
+                            error[i] = str(e)
+        for j, field, default in self.numbers:
+            X[:, j] = parse(field, default)
+
+        if self.age_category is not None:
+            j, field = self.age_category
+            X[:, j] = np.clip(np.trunc(parse(field, 0.0) - 20) // 5, 0, 12)
+
+        if self.bmi is not None:
+            j, field = self.bmi
+            bmi = parse(field, 0.0)
+            todo = bmi == 0
+            if todo.any():
+                weight = parse("weight_kg", 0.0, rows=todo)
+                height = parse("height_cm", 0.0, rows=todo)
+                derive = todo & (weight != 0) & (height != 0)
+                bmi[derive] = round_2(weight[derive] / ((height[derive] / 100) ** 2))
+            X[:, j] = bmi
+
+        ok = np.array([e is None for e in error], dtype=bool)
+        index = np.flatnonzero(ok).tolist()
+        errors = [{"index": int(i), "error": error[i]} for i in np.flatnonzero(~ok)]
+        return X[ok], index, errors
+
+    def encode_parsed(self, data, parsed, row):
+        """encode_into, with the numeric fields already parsed by ScreeningEncoder."""
+        row[:] = self.template
+        for j, field, mapping, default in self.categories:
+            row[j] = category_code(mapping, data.get(field), default, field)
+        for j, field, default in self.numbers:
+            value = parsed_value(parsed, field)
+            row[j] = default if value is None else value
+        if self.age_category is not None:
+            j, field = self.age_category
+            row[j] = parsed_value(parsed, ("age_category", field))
+        if self.bmi is not None:
+            j, field = self.bmi
+            row[j] = parsed_value(parsed, ("bmi", field))
+        return row
+
+    def encode_records(self, records):
+        """Encode a list of request dicts into one matrix.
+
+        Returns (X, index, errors): X holds the rows that encoded cleanly,
+        index their positions in `records`, and errors one
+        {"index", "error"} entry per record that did not.
+        """
+        X = np.empty((len(records), self.n_features), dtype=np.float64)
+        index, errors = [], []
+        for i, record in enumerate(records):
+            if not isinstance(record, dict):
+                errors.append({"index": i, "error": "record must be a JSON object"})
+                continue
+            try:
+                self.encode_into(record, X[len(index)])
+            except ValueError as e:
+                errors.append({"index": i, "error": str(e)})
+                continue
+            index.append(i)
+        return X[:len(index)], index, errors
+
+    def encode_axis(self, base, field, values):
+        """{column: encoded values} for the columns `field` feeds, one value per entry."""
+        columns = {}
+        for j, f, mapping, default in self.categories:
+            if f == field:
+                columns[j] = [category_code(mapping, v, default, f) for v in values]
+        for j, f, default in self.numbers:
+            if f == field:
+                columns[j] = [to_float(v, default, f) for v in values]
+        if self.age_category is not None and self.age_category[1] == field:
+            columns[self.age_category[0]] = [age_category(to_float(v, 0.0, field)) for v in values]
+        if self.bmi is not None and self.bmi[0] in self.field_columns.get(field, ()):
+            columns[self.bmi[0]] = self.axis_bmi(base, field, values)
+        return columns
+
+    def axis_bmi(self, base, field, values):
+        # request_bmi() for every value of `field`, vectorized. Weight and
+        # height are only parsed when some value needs the BMI derived
+        def parse(f):
+            if f == field:
+                return np.array([to_float(v, 0.0, f) for v in values], dtype=np.float64)
+            return np.full(len(values), to_float(base.get(f), 0.0, f), dtype=np.float64)
+
+        bmi = parse(self.bmi[1])
+        todo = bmi == 0
+        if todo.any():
+            weight, height = parse("weight_kg"), parse("height_cm")
+            derive = todo & (weight != 0) & (height != 0)
+            bmi[derive] = round_2(weight[derive] / ((height[derive] / 100) ** 2))
+        return bmi
+
+    def encode_grid(self, base, axes):
+        """Rows for every combination of axis values, in row-major order.
+
+        `axes` is [(field, values), ...]. Every other field comes from
+        `base`. Axes that feed disjoint columns only re-encode those
+        columns, once per value, and are combined by broadcasting; otherwise
+        every combination is encoded in full. Raises ValueError like encode().
+        """
+        fields = [field for field, _ in axes]
+        # The first grid point; the axis columns are overwritten below
+        base_row = self.encode({**base, **{field: values[0] for field, values in axes}})
+        shape = [len(values) for _, values in axes]
+        feeds = [self.field_columns.get(field, set()) for field in fields]
+        if len(axes) == 1 or not feeds[0] & feeds[1]:
+            X = np.empty(shape + [self.n_features], dtype=np.float64)
+            X[...] = base_row
+            for k, (field, values) in enumerate(axes):
+                along = [1] * len(axes)
+                along[k] = len(values)
+                for j, encoded in self.encode_axis(base, field, values).items():
+                    X[..., j] = np.asarray(encoded, dtype=np.float64).reshape(along)
+            return X.reshape(-1, self.n_features)
+
+        combos = list(itertools.product(*(values for _, values in axes)))
+        X = np.empty((len(combos), self.n_features), dtype=np.float64)
+        for row, combo in zip(X, combos):
+            self.encode_into({**base, **dict(zip(fields, combo))}, row)
+        return X
+
+    # ---------- Datasets ----------
+    def csv_dtypes(self):
+        """pandas dtypes for the CSV columns this schema reads.
+
+        Category columns are read as pandas categoricals, so a label is
+        stored once per distinct value instead of once per row.
+        """
+        dtypes = {}
+        for col in self.schema["columns"]:
+            if col["kind"] in ("category", "age_category"):
+                dtypes[col["column"]] = "category"
+            else:
+                dtypes[col["column"]] = "float64"
+        target = self.schema["target"]
+        dtypes[target["column"]] = "category" if "map" in target else "float64"
+        return dtypes
+
+    def encode_frame(self, df):
+        """Encode a raw CSV DataFrame into the model's columns."""
+        # Imported here so the API, which never encodes frames, starts without pandas
+        import pandas as pd
+
+        out = {}
+        for col in self.schema["columns"]:
+            name, kind = col["column"], col["kind"]
+            if name not in df.columns:
+                out[name] = np.full(len(df), col["default"], dtype=np.float64)
+                continue
+
+            values = df[name]
+            if kind in ("category", "age_category") and isinstance(values.dtype, pd.CategoricalDtype):
+                # Look up each distinct label once, then gather by code; code -1
+                # (missing value) picks the NaN appended at the end
+                labels = pd.Series(values.cat.categories.astype(str))
+                codes = labels.str.strip().str.lower().map(_frame_lookup(col))
+                codes = np.append(codes.to_numpy(dtype=np.float64), np.nan)
+                encoded = pd.Series(codes[values.cat.codes.to_numpy()], index=df.index)
+            elif kind in ("category", "age_category"):
+                keys = values.astype(str).str.strip().str.lower()
+                encoded = keys.map(_frame_lookup(col))
+            else:
+                encoded = pd.to_numeric(values, errors="coerce")
+            out[name] = encoded.fillna(col["default"]).to_numpy(dtype=np.float64)
+        return pd.DataFrame(out, columns=self.columns, index=df.index)
+
+    def encode_target(self, df):
+        target = self.schema["target"]
+        values = df[target["column"]]
+        if "map" in target:
+            lookup = {k.lower(): v for k, v in target["map"].items()}
+            values = values.astype(str).str.strip().str.lower().map(lookup)
+        return values.astype(int)
+
+    def check_model(self, model):
+        self.check_columns(getattr(model, "feature_names_in_", self.columns))
+
+    def check_columns(self, columns):
+        expected = list(columns)
+        if expected != self.columns:
+            raise ValueError(
+                f"{self.name} model columns {expected} do not match "
+                f"the feature schema {self.columns}"
+            )
+
+
+def round_2(values):
+    """round(v, 2) for an array, matching Python's round exactly.
+
+    Scaling by 100 can nudge a value sitting on a .xx5 tie across it, so
+    those few are rounded by Python's round itself.
+    """
+    scaled = values * 100
+    out = np.round(scaled) / 100
+    tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(tie):
+        out[i] = round(float(values[i]), 2)
+    return out
+
+
+def parsed_value(parsed, key):
+    value = parsed[key]
+    if isinstance(value, ValueError):
+        raise value
+    return value
+
+
+class ScreeningEncoder:
+    """Encodes one patient payload for several models at once.
+
+    Numeric fields, the BMI and the age bucket are parsed or computed once
+    and shared by every model that reads them; each model then only fills
+    its own row. A field that fails to parse only fails the models that
+    read it.
+    """
+
+    def __init__(self, encoders):
+        self.encoders = encoders
+        self.numbers = sorted({f for e in encoders.values() for _, f, _ in e.numbers})
+        self.age_fields = sorted({e.age_category[1] for e in encoders.values() if e.age_category})
+        self.bmi_fields = sorted({e.bmi[1] for e in encoders.values() if e.bmi})
+        if self.bmi_fields:
+            self.numbers = sorted(set(self.numbers) | {"weight_kg", "height_cm"})
+
+    def parse(self, data):
+        parsed = {}
+        for field in self.numbers:
+            try:
+                parsed[field] = to_float(data.get(field), None, field)
+            except ValueError as e:
+                parsed[field] = e
+        for field in self.age_fields:
+            try:
+                parsed[("age_category", field)] = age_category(to_float(data.get(field), 0.0, field))
+            except ValueError as e:
+                parsed[("age_category", field)] = e
+        for field in self.bmi_fields:
+            try:
+                bmi = to_float(data.get(field), 0.0, field)
+                if not bmi:
+                    weight = parsed_value(parsed, "weight_kg") or 0.0
+                    height = parsed_value(parsed, "height_cm") or 0.0
+                    bmi = calculate_bmi(weight, height)
+                parsed[("bmi", field)] = bmi
+            except ValueError as e:
+                parsed[("bmi", field)] = e
+        return parsed
+
+    def encode(self, data, names):
+        """Return ({name: feature row}, {name: error}) for the named models."""
+        parsed = self.parse(data)
+        rows, errors = {}, {}
+        for name in names:
+            encoder = self.encoders[name]
+            try:
+                rows[name] = encoder.encode_parsed(
+                    data, parsed, np.empty(encoder.n_features, dtype=np.float64)
+                )
+            except ValueError as e:
+                errors[name] = str(e)
+        return rows, errors
+
+
+ENCODERS = {name: FeatureEncoder(name, schema) for name, schema in SCHEMAS.items()}
+SCREENING = ScreeningEncoder(ENCODERS)
@@ -0,0 +1,167 @@
+# inference.py
+#
+# Inference wrappers for the X-ray CNNs.
+#
+# CompiledModel traces the Keras model once into a tf.function with a fixed
+# (None, 224, 224, 3) float32 signature, so requests skip model.predict's
+# data-adapter setup and retrace checks. warmup() runs synthetic batches at
+# boot so the first real request does not pay for tracing.
+#
+# TFLiteModel runs an exported float16 / int8 variant (see export_tflite.py)
+# through the TFLite interpreter, which uses XNNPACK on CPU.
+#
+# stats() of either wrapper counts calls and graph rebuilds (tf.function
+# traces, interpreter tensor re-allocations); /metrics exports them so a soak
+# test can tell a retracing leak from ordinary allocator growth.
+
+import os
+import threading
+import time
+
+import numpy as np
+import tensorflow as tf
+
+INPUT_SHAPE = (224, 224, 3)
+
+# Set to "float16" or "int8" to serve exported TFLite variants when present
+XRAY_TFLITE = os.environ.get("XRAY_TFLITE", "")
+TFLITE_THREADS = int(os.environ.get("XRAY_TFLITE_THREADS", "0")) or None
+
+
+# ===================== Keras (tf.function) =====================
+class CompiledModel:
+    def __init__(self, name, model):
+        self.name = name
+        self.model = model
+        self.backend = "tf.function"
+        self.warmup_ms = {}
+        self.calls = 0
+        self._fn = tf.function(
+            self._forward,
+            input_signature=[tf.TensorSpec((None,) + INPUT_SHAPE, tf.float32)],
+        )
+
+    def _forward(self, images):
+        return self.model(images, training=False)
+
+    def __call__(self, images):
+        images = tf.convert_to_tensor(images, dtype=tf.float32)
+        self.calls += 1
+        return self._fn(images).numpy()
+
+    def stats(self):
+        # The fixed input signature means one trace; more is a leak
+        return {"calls": self.calls, "traces": self._fn.experimental_get_tracing_count()}
+
+    def warmup(self, batch_sizes=(1,)):
+        for size in batch_sizes:
+            started = time.perf_counter()
+            self(np.zeros((size,) + INPUT_SHAPE, dtype=np.float32))
+            self.warmup_ms[size] = round((time.perf_counter() - started) * 1000, 2)
+        print(f"{self.name} warmed up ({self.backend}):", self.warmup_ms)
+
+
+# ===================== TFLite =====================
+def tflite_interpreter(path, num_threads=None):
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=path, num_threads=num_threads)
+
+
+class TFLiteModel:
+    def __init__(self, name, path, num_threads=TFLITE_THREADS):
+        self.name = name
+        self.path = path
+        self.backend = f"tflite:{os.path.basename(path)}"
+        self.warmup_ms = {}
+        self._interpreter = tflite_interpreter(path, num_threads)
+        self._input = self._interpreter.get_input_details()[0]["index"]
+        self._output = self._interpreter.get_output_details()[0]["index"]
+        self._batch_size = None
+        self.calls = 0
+        self.reallocations = 0
+        # An interpreter owns its tensors, so calls must not overlap
+        self._lock = threading.Lock()
+
+    def __call__(self, images):
+        images = np.asarray(images, dtype=np.float32)
+        with self._lock:
+            self.calls += 1
+            if images.shape[0] != self._batch_size:
+                self._interpreter.resize_tensor_input(self._input, images.shape)
+                self._interpreter.allocate_tensors()
+                self._batch_size = images.shape[0]
+                self.reallocations += 1
+            self._interpreter.set_tensor(self._input, images)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output).copy()
+
+    warmup = CompiledModel.warmup
+
+    def stats(self):
+        return {"calls": self.calls, "reallocations": self.reallocations}
+
+
+def tflite_path(keras_path, quantization):
+    root, _ = os.path.splitext(keras_path)
+    return f"{root}.{quantization}.tflite"
+
+
+def load_xray_model(name, keras_path):
+    """Return the fastest available inference wrapper for one X-ray model."""
+    if XRAY_TFLITE:
+        path = tflite_path(keras_path, XRAY_TFLITE)
+        if os.path.exists(path):
+            return TFLiteModel(name, path)
+        print(f"{name}: {path} not found, using the Keras model")
+    return CompiledModel(name, tf.keras.models.load_model(keras_path))
+
+
+# ===================== Export =====================
+def export_tflite(compiled, path, quantization="float16", representative_images=None):
+    converter = tf.lite.TFLiteConverter.from_keras_model(compiled.model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if quantization == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == "int8":
+        if representative_images is None or len(representative_images) == 0:
+            raise ValueError("int8 export needs representative images")
+
+        def representative_dataset():
+            for image in representative_images:
+                yield [np.asarray(image, dtype=np.float32)[None]]
+
+        # Integer kernels inside, float32 in and out so preprocessing and
+        # response handling stay the same
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    else:
+        raise ValueError(f"unknown quantization {quantization!r}")
+
+    with open(path, "wb") as f:
+        f.write(converter.convert())
+    return os.path.getsize(path)
+
+
+def parity_report(reference, candidate, images):
+    """Compare two inference wrappers on the same preprocessed images."""
+    images = np.asarray(images, dtype=np.float32)
+    expected = np.concatenate([reference(images[i:i + 1]) for i in range(len(images))])
+    actual = np.concatenate([candidate(images[i:i + 1]) for i in range(len(images))])
+    diff = np.abs(expected - actual)
+
+    # Sigmoid heads are thresholded at 0.5, softmax heads use argmax
+    if expected.shape[-1] == 1:
+        agree = (expected[:, 0] >= 0.5) == (actual[:, 0] >= 0.5)
+    else:
+        agree = expected.argmax(axis=-1) == actual.argmax(axis=-1)
+
+    return {
+        "images": int(len(images)),
+        "max_abs_diff": float(diff.max()),
+        "mean_abs_diff": float(diff.mean()),
+        "label_agreement": float(agree.mean()),
+    }
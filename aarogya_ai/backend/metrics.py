@@ -0,0 +1,370 @@
+# metrics.py
+#
+# Hot-path instrumentation, Prometheus text export and an opt-in sampling
+# profiler.
+#
+#   stage_timer(model)   a request creates one timer and calls
+#                        timer.mark("encode"), timer.mark("predict"), ...
+#                        after each stage. A mark is one perf_counter() call
+#                        plus a histogram bucket increment, so it is cheap
+#                        enough for the hot path.
+#   instrument(app)      per-route request latency and status counts
+#   render()             everything above, plus gauges from the stats() of
+#                        registries, caches and pools, in Prometheus text
+#                        format for GET /metrics
+#   process_stats()      this process's RSS, threads, open files and Python
+#                        heap size, exported as <prefix>_process_* gauges
+#                        labelled with the pid (read from /proc, so Linux only)
+#
+# Profiling (off by default):
+#   PROFILE_SLOW_MS=500  sample every request; requests slower than this
+#                        dump a profile
+#   PROFILE_HEADER=1     honour "X-Profile: 1" to profile a single request
+# A sampler thread records the request thread's stack every
+# PROFILE_INTERVAL_MS. Pool threads running the request's work are
+# recorded too. Profiles are written to PROFILE_DIR in folded-stack format,
+# which flamegraph.pl, speedscope and inferno read directly.
+#
+# Metrics are per process: under gunicorn every worker keeps its own.
+#
+# Kept identical in backend/ and aarogya_ai/backend/ (check_shared.py).
+
+import bisect
+import gc
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# ===================== Configuration =====================
+METRICS_PREFIX = os.environ.get("METRICS_PREFIX", "aarogya")
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", "0"))
+PROFILE_HEADER = os.environ.get("PROFILE_HEADER", "0") == "1"
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+# Seconds between full gc.get_objects() counts (the walk costs ~ms per 100k objects)
+GC_OBJECTS_INTERVAL = float(os.environ.get("GC_OBJECTS_INTERVAL", "60"))
+
+# Seconds; covers a 50 us cache hit up to a 10 s cold CNN load
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+           0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# ===================== Histograms =====================
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)     # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class HistogramFamily:
+    """One histogram per label-value tuple."""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            with self._lock:
+                child = self.children.setdefault(values, Histogram())
+        return child
+
+    def observe(self, values, seconds):
+        self.labels(*values).observe(seconds)
+
+
+class CounterFamily:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, values, amount=1):
+        with self._lock:
+            self.values[values] = self.values.get(values, 0) + amount
+
+
+STAGES = HistogramFamily(
+    f"{METRICS_PREFIX}_stage_duration_seconds",
+    "Time spent in one stage of a prediction request", ("model", "stage"),
+)
+REQUESTS = HistogramFamily(
+    f"{METRICS_PREFIX}_request_duration_seconds",
+    "End-to-end request latency by route", ("route", "method"),
+)
+RESPONSES = CounterFamily(
+    f"{METRICS_PREFIX}_responses_total",
+    "Responses by route and status code", ("route", "method", "status"),
+)
+_collectors = []
+
+
+class StageTimer:
+    def __init__(self, model):
+        self.model = model
+        self.last = time.perf_counter()
+
+    def mark(self, stage):
+        """Record the time since the previous mark (or creation) as `stage`."""
+        now = time.perf_counter()
+        STAGES.labels(self.model, stage).observe(now - self.last)
+        self.last = now
+
+
+def stage_timer(model):
+    return StageTimer(model)
+
+
+def add_collector(prefix, stats_fn, label="name"):
+    """Export the numeric fields of stats_fn() as gauges.
+
+    stats_fn returns {label_value: stats_dict}, e.g. {"cnn": pool.stats()}.
+    Every int / float / bool field becomes <METRICS_PREFIX>_<prefix>_<field>.
+    """
+    _collectors.append((prefix, stats_fn, label))
+
+
+# ===================== Process =====================
+def proc_status(pid="self"):
+    """RSS, peak RSS and thread count of a process from /proc; {} if it is gone."""
+    out = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key == "VmRSS":
+                    out["rss_mb"] = round(int(value.split()[0]) / 1024, 2)
+                elif key == "VmHWM":
+                    out["peak_rss_mb"] = round(int(value.split()[0]) / 1024, 2)
+                elif key == "Threads":
+                    out["threads"] = int(value)
+    except (OSError, ValueError):
+        return {}
+    return out
+
+
+_gc_objects = {"at": None, "count": 0}
+
+
+def process_stats():
+    stats = proc_status()
+    try:
+        stats["open_fds"] = len(os.listdir("/proc/self/fd"))
+    except OSError:
+        pass
+    # Live Python memory blocks and GC-tracked objects (gc.freeze()d ones
+    # excluded): steady growth here is a Python-level leak, growth in RSS
+    # alone is native (TensorFlow, numpy, the allocator). Counting the
+    # objects walks all of them, so it is refreshed every GC_OBJECTS_INTERVAL
+    # and the scrape only reads the collector's cheap per-generation counts.
+    stats["python_blocks"] = sys.getallocatedblocks()
+    stats["gc_pending"] = sum(gc.get_count())
+    now = time.monotonic()
+    if _gc_objects["at"] is None or now - _gc_objects["at"] >= GC_OBJECTS_INTERVAL:
+        _gc_objects["count"] = len(gc.get_objects())
+        _gc_objects["at"] = now
+    stats["gc_objects"] = _gc_objects["count"]
+    return stats
+
+
+add_collector("process", lambda: {str(os.getpid()): process_stats()}, label="pid")
+
+
+# ===================== Prometheus text format =====================
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _render_histograms(family, lines):
+    lines.append(f"# HELP {family.name} {family.help}")
+    lines.append(f"# TYPE {family.name} histogram")
+    with family._lock:
+        children = sorted(family.children.items())
+    for values, hist in children:
+        counts, total, count = hist.snapshot()
+        cumulative = 0
+        for bound, n in zip(hist.buckets + (float("inf"),), counts):
+            cumulative += n
+            le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+            lines.append(f"{family.name}_bucket{_labels(family.label_names, values, le)} {cumulative}")
+        lines.append(f"{family.name}_sum{_labels(family.label_names, values)} {total!r}")
+        lines.append(f"{family.name}_count{_labels(family.label_names, values)} {count}")
+
+
+def render():
+    lines = []
+    _render_histograms(STAGES, lines)
+    _render_histograms(REQUESTS, lines)
+
+    lines.append(f"# HELP {RESPONSES.name} {RESPONSES.help}")
+    lines.append(f"# TYPE {RESPONSES.name} counter")
+    with RESPONSES._lock:
+        responses = sorted(RESPONSES.values.items())
+    for values, n in responses:
+        lines.append(f"{RESPONSES.name}{_labels(RESPONSES.label_names, values)} {n}")
+
+    for prefix, stats_fn, label in _collectors:
+        gauges = {}
+        for key, stats in stats_fn().items():
+            for field, value in stats.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    gauges.setdefault(field, []).append((key, value))
+        for field, samples in gauges.items():
+            name = f"{METRICS_PREFIX}_{prefix}_{field}"
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in samples:
+                lines.append(f"{name}{_labels((label,), (key,))} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# ===================== Sampling profiler =====================
+class SamplingProfiler:
+    def __init__(self, interval_ms=PROFILE_INTERVAL_MS, out_dir=PROFILE_DIR):
+        self.interval = interval_ms / 1000.0
+        self.out_dir = out_dir
+        self._active = {}          # request thread id -> {folded stack: samples}
+        self._delegates = {}       # pool thread id -> request thread id
+        self._lock = threading.Lock()
+        self._pid = None
+        self.dumped = 0
+
+    def _ensure_thread(self):
+        # Started lazily and again after fork, like the micro-batchers
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name="profiler", daemon=True).start()
+            self._pid = os.getpid()
+
+    @staticmethod
+    def _fold(frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for tid, samples in self._active.items():
+                    if tid in frames:
+                        stack = "request;" + self._fold(frames[tid])
+                        samples[stack] = samples.get(stack, 0) + 1
+                for worker, owner in list(self._delegates.items()):
+                    samples = self._active.get(owner)
+                    if samples is not None and worker in frames:
+                        stack = "pool;" + self._fold(frames[worker])
+                        samples[stack] = samples.get(stack, 0) + 1
+
+    def start(self):
+        self._ensure_thread()
+        with self._lock:
+            self._active[threading.get_ident()] = {}
+
+    def stop(self):
+        with self._lock:
+            return self._active.pop(threading.get_ident(), None)
+
+    @contextmanager
+    def working_for(self, owner):
+        """Attribute this thread's samples to the request thread `owner`."""
+        me = threading.get_ident()
+        self._delegates[me] = owner
+        try:
+            yield
+        finally:
+            self._delegates.pop(me, None)
+
+    def dump(self, samples, label, elapsed):
+        os.makedirs(self.out_dir, exist_ok=True)
+        safe = label.strip("/").replace("/", "_").replace("<", "").replace(">", "") or "root"
+        path = os.path.join(
+            self.out_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe}-{elapsed * 1000:.0f}ms.folded"
+        )
+        with open(path, "w") as f:
+            for stack, n in sorted(samples.items()):
+                f.write(f"{stack} {n}\n")
+        self.dumped += 1
+        return path
+
+
+profiler = SamplingProfiler()
+
+
+# ===================== Flask hooks =====================
+def instrument(app):
+    """Time every request by route and profile the ones asked for."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request():
+        g.metrics_started = time.perf_counter()
+        g.profiling = PROFILE_SLOW_MS > 0 or (
+            PROFILE_HEADER and request.headers.get("X-Profile") == "1"
+        )
+        if g.profiling:
+            profiler.start()
+
+    @app.after_request
+    def _finish_request(response):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        REQUESTS.observe((route, request.method), elapsed)
+        RESPONSES.inc((route, request.method, str(response.status_code)))
+
+        if g.pop("profiling", False):
+            samples = profiler.stop()
+            forced = PROFILE_HEADER and request.headers.get("X-Profile") == "1"
+            if samples and (forced or elapsed * 1000 >= PROFILE_SLOW_MS):
+                response.headers["X-Profile-File"] = os.path.basename(
+                    profiler.dump(samples, route, elapsed)
+                )
+        return response
+
+    @app.teardown_request
+    def _discard_profile(exc):
+        # after_request is skipped on unhandled errors; never leak a sampler slot
+        if g.pop("profiling", False):
+            profiler.stop()
@@ -0,0 +1,131 @@
+# micro_batcher.py
+#
+# Dynamic micro-batching for the X-ray CNNs. Requests for the same model are
+# queued; a worker thread collects up to MAX_BATCH_SIZE images or waits at
+# most MAX_WAIT_MS after the first one, runs them as one stacked
+# (B, 224, 224, 3) tensor and hands each caller its own row of the output.
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from metrics import STAGES
+
+# ===================== Configuration =====================
+MAX_BATCH_SIZE = int(os.environ.get("XRAY_MAX_BATCH_SIZE", "8"))
+MAX_WAIT_MS = float(os.environ.get("XRAY_MAX_WAIT_MS", "5"))
+
+
+class MicroBatcher:
+    def __init__(self, name, predict_fn, max_batch_size=MAX_BATCH_SIZE,
+                 max_wait_ms=MAX_WAIT_MS):
+        self.name = name
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue = None
+        self._worker = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+        # ---------- Metrics ----------
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes = {}          # batch size -> count
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.inference_total = 0.0
+
+    def _ensure_worker(self):
+        # Started lazily and restarted after fork: threads do not survive
+        # into pre-forked server workers (gunicorn --preload)
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._worker = threading.Thread(
+                target=self._run, name=f"batcher-{self.name}", daemon=True
+            )
+            self._worker.start()
+            self._pid = os.getpid()
+
+    def submit(self, image):
+        """Queue one (224, 224, 3) image and return a Future of its output row."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((image, future, time.perf_counter()))
+        return future
+
+    def predict(self, image):
+        return self.submit(image).result()
+
+    # ---------- Worker ----------
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+
+            # A bad image (wrong shape or dtype) fails np.stack; that must fail
+            # the batch's futures, not kill the worker and hang every caller.
+            try:
+                images = np.stack([item[0] for item in batch])
+                outputs = self.predict_fn(images)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+
+            for i, (_, future, _) in enumerate(batch):
+                future.set_result(outputs[i])
+            self._record(batch, started, finished)
+
+    def _record(self, batch, started, finished):
+        waits = [started - queued_at for _, _, queued_at in batch]
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+            self.queue_wait_total += sum(waits)
+            self.queue_wait_max = max(self.queue_wait_max, max(waits))
+            self.inference_total += finished - started
+        STAGES.labels(self.name, "batch_forward").observe(finished - started)
+        wait_hist = STAGES.labels(self.name, "batch_wait")
+        for wait in waits:
+            wait_hist.observe(wait)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "queue_depth": self._queue.qsize() if self._queue else 0,
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": round(self.items / self.batches, 3) if self.batches else 0,
+                "batch_size_counts": dict(sorted(self.batch_sizes.items())),
+                "mean_queue_wait_ms": round(self.queue_wait_total / self.items * 1000, 3) if self.items else 0,
+                "max_queue_wait_ms": round(self.queue_wait_max * 1000, 3),
+                "mean_inference_ms": round(self.inference_total / self.batches * 1000, 3) if self.batches else 0,
+            }
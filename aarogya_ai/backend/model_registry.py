@@ -0,0 +1,178 @@
+# model_registry.py
+#
+# Lazy, memory-bounded model registry shared by backend/app.py and
+# aarogya_ai/backend/app.py (keep the two copies identical; check_shared.py).
+#
+# Models are registered with a loader and loaded the first time a route asks
+# for them, or at startup if listed in MODEL_PRELOAD. Heavy models (the CNNs)
+# are evicted least-recently-used first once their combined size exceeds
+# MODEL_MEMORY_BUDGET_MB. Loaders import their framework themselves, so a
+# worker that only serves tabular traffic never imports TensorFlow.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# ===================== Configuration =====================
+MODEL_MEMORY_BUDGET_MB = float(os.environ.get("MODEL_MEMORY_BUDGET_MB", "0")) or None
+MODEL_PRELOAD = [
+    name.strip() for name in os.environ.get("MODEL_PRELOAD", "").split(",") if name.strip()
+]
+
+
+class ModelRegistry:
+    def __init__(self, memory_budget_mb=MODEL_MEMORY_BUDGET_MB):
+        self.memory_budget = memory_budget_mb * 1024 * 1024 if memory_budget_mb else None
+        self._specs = {}
+        self._loaded = OrderedDict()     # name -> model, least recently used first
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.loads = {}
+        self.evictions = {}
+        self._listeners = []
+
+    def register(self, name, loader, path=None, heavy=False):
+        """Register `loader()` under `name`.
+
+        `path` is the artifact on disk; its size is used as the model's
+        memory estimate. Only heavy models count against the budget.
+        """
+        self._specs[name] = {"loader": loader, "path": path, "heavy": heavy}
+        self._load_locks.setdefault(name, threading.Lock())
+
+    def names(self, heavy=None):
+        return [
+            name for name, spec in self._specs.items()
+            if heavy is None or spec["heavy"] == heavy
+        ]
+
+    def add_listener(self, fn):
+        """Call `fn(name, model)` every time a model is (re)loaded."""
+        self._listeners.append(fn)
+
+    def get(self, name):
+        with self._lock:
+            if name in self._loaded:
+                self._loaded.move_to_end(name)
+                return self._loaded[name]
+
+        # Load outside the registry lock so one slow CNN load does not block
+        # requests for models that are already in memory
+        with self._load_locks[name]:
+            with self._lock:
+                if name in self._loaded:
+                    self._loaded.move_to_end(name)
+                    return self._loaded[name]
+
+            spec = self._specs[name]
+            started = time.perf_counter()
+            model = spec["loader"]()
+            elapsed = time.perf_counter() - started
+
+            with self._lock:
+                self._loaded[name] = model
+                self._sizes[name] = os.path.getsize(spec["path"]) if spec["path"] else 0
+                self.loads[name] = self.loads.get(name, 0) + 1
+                self._evict_over_budget(keep=name)
+            print(f"Loaded model {name} in {elapsed:.2f}s")
+            for fn in self._listeners:
+                fn(name, model)
+            return model
+
+    def preload(self, names):
+        for name in names:
+            if name in self._specs:
+                self.get(name)
+            else:
+                print(f"MODEL_PRELOAD: unknown model {name!r}, skipped")
+
+    def reload(self, name):
+        """Drop the loaded copy and load `name` again from disk."""
+        self.evict(name)
+        return self.get(name)
+
+    def swap(self, name, loader, path=None):
+        """Load a replacement for `name` with `loader` and switch to it.
+
+        Requests keep getting the current model while the replacement loads;
+        the switch itself is one assignment under the registry lock. If the
+        loader raises, nothing changes. Later (re)loads use the new loader.
+        """
+        with self._load_locks[name]:
+            started = time.perf_counter()
+            model = loader()
+            elapsed = time.perf_counter() - started
+
+            with self._lock:
+                self._specs[name] = dict(self._specs[name], loader=loader, path=path)
+                self._loaded[name] = model
+                self._loaded.move_to_end(name)
+                self._sizes[name] = os.path.getsize(path) if path else 0
+                self.loads[name] = self.loads.get(name, 0) + 1
+                self._evict_over_budget(keep=name)
+            print(f"Swapped model {name} in {elapsed:.2f}s")
+            for fn in self._listeners:
+                fn(name, model)
+            return model
+
+    def unregister(self, name):
+        self.evict(name)
+        with self._lock:
+            self._specs.pop(name, None)
+
+    def is_registered(self, name):
+        return name in self._specs
+
+    def is_loaded(self, name):
+        return name in self._loaded
+
+    def peek(self, name):
+        """The loaded model, or None; unlike get() it never loads or reorders."""
+        return self._loaded.get(name)
+
+    def evict(self, name):
+        with self._lock:
+            if self._loaded.pop(name, None) is not None:
+                self._sizes.pop(name, None)
+                self.evictions[name] = self.evictions.get(name, 0) + 1
+
+    def _heavy_bytes(self):
+        return sum(self._sizes[n] for n in self._loaded if self._specs[n]["heavy"])
+
+    def _evict_over_budget(self, keep):
+        if self.memory_budget is None:
+            return
+        for name in list(self._loaded):
+            if self._heavy_bytes() <= self.memory_budget:
+                break
+            if name != keep and self._specs[name]["heavy"]:
+                del self._loaded[name]
+                self._sizes.pop(name, None)
+                self.evictions[name] = self.evictions.get(name, 0) + 1
+                print(f"Evicted model {name} (memory budget)")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_budget_mb": self.memory_budget / 1024 / 1024 if self.memory_budget else None,
+                "heavy_loaded_mb": round(self._heavy_bytes() / 1024 / 1024, 2),
+                "loaded": list(self._loaded),
+                "registered": list(self._specs),
+                "loads": dict(self.loads),
+                "evictions": dict(self.evictions),
+            }
+
+    def model_stats(self):
+        """Per-model view of stats(), keyed by model name."""
+        with self._lock:
+            return {
+                name: {
+                    "loaded": name in self._loaded,
+                    "size_mb": round(self._sizes.get(name, 0) / 1024 / 1024, 3),
+                    "loads": self.loads.get(name, 0),
+                    "evictions": self.evictions.get(name, 0),
+                }
+                for name in self._specs
+            }
@@ -0,0 +1,107 @@
+# preprocessing.py
+#
+# X-ray upload decode and preprocessing.
+#
+# The old path (Image.open -> convert("RGB") -> resize -> np.array / 255.0)
+# made several full-resolution copies and a float64 array per request. Here:
+#   - JPEGs are decoded with draft(), so libjpeg scales down while decoding
+#   - other images are shrunk with reduce() before the final resample
+#   - grayscale films are resized as one channel and only widened to RGB
+#     when written into the output buffer
+#   - pixels are normalized straight into a preallocated float32 buffer
+
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+from PIL import Image
+
+TARGET_SIZE = (224, 224)
+
+# Raw image bodies above this size are spooled to disk instead of memory
+SPOOL_MAX_BYTES = 1024 * 1024
+
+_local = threading.local()
+
+
+def _buffer():
+    # One (224, 224, 3) float32 buffer per request thread. The caller blocks
+    # until its result is ready and the batcher copies images when stacking,
+    # so the buffer is free again by the next request on this thread.
+    buf = getattr(_local, "buf", None)
+    if buf is None:
+        buf = _local.buf = np.empty(TARGET_SIZE[::-1] + (3,), dtype=np.float32)
+    return buf
+
+
+def xray_upload(request):
+    """Return a readable file object for the uploaded X-ray, or None.
+
+    Multipart uploads are already spooled to a temporary file by Werkzeug.
+    A raw image/* body is copied from the request stream in chunks into a
+    spooled file so large films never sit in memory as one bytes object.
+    """
+    if "file" in request.files:
+        return request.files["file"].stream
+
+    if request.mimetype.startswith("image/"):
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        shutil.copyfileobj(request.stream, spool, 64 * 1024)
+        spool.seek(0)
+        return spool
+    return None
+
+
+def xray_uploads(request):
+    """Every uploaded X-ray as (filename, file object) pairs; [] when there are none.
+
+    Several multipart "file" parts are a study; a raw image/* body is one film.
+    """
+    files = request.files.getlist("file")
+    if files:
+        return [(f.filename, f.stream) for f in files]
+    upload = xray_upload(request)
+    return [] if upload is None else [(None, upload)]
+
+
+def decode_xray(fp, timer=None):
+    """Decode an image file into a (224, 224) PIL image in L or RGB mode."""
+    image = Image.open(fp)
+
+    if image.format == "JPEG":
+        # Let the decoder do a cheap 1/2, 1/4 or 1/8 DCT downscale
+        image.draft("RGB" if image.mode != "L" else "L", TARGET_SIZE)
+
+    if timer is not None:
+        # Decoding is lazy; force it here so decode and resize time apart
+        image.load()
+        timer.mark("decode")
+
+    # Grayscale and RGB can be resized before any colour conversion; other
+    # modes (palette, CMYK, 16-bit, alpha) are converted first as before
+    if image.mode not in ("L", "RGB"):
+        image = image.convert("RGB")
+
+    image = image.resize(TARGET_SIZE, Image.BICUBIC, reducing_gap=3.0)
+    if timer is not None:
+        timer.mark("resize")
+    return image
+
+
+def normalize_into(image, out=None):
+    """Scale pixels to [0, 1] float32 in `out` without a float64 temporary."""
+    if out is None:
+        out = _buffer()
+    pixels = np.asarray(image)
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, None]     # broadcast one channel to RGB
+    np.divide(pixels, np.float32(255.0), out=out)
+    return out
+
+
+def load_xray(fp, out=None, timer=None):
+    out = normalize_into(decode_xray(fp, timer), out)
+    if timer is not None:
+        timer.mark("normalize")
+    return out
@@ -0,0 +1,526 @@
+# soak.py
+#
+# Soak test: replays synthetic traffic (synthetic.py) against a running
+# server at a fixed request rate for hours, and tracks memory and latency
+# drift.
+#
+#   python soak.py --url http://127.0.0.1:5000 --rps 20 --duration 4h \
+#       --pidfile /tmp/gunicorn.pid
+#   python soak.py --url ... --routes diabetes,xray --duration 30m --window 30s
+#
+# Requests are sent open loop: the schedule does not wait for slow answers.
+# When every sender is busy and the backlog is full, the request is dropped
+# and counted. Each route is probed once, and routes the server does not have
+# are skipped. Every --window seconds the runner records, per route:
+# request rate, p50 / p99 latency, and 4xx, 429/503 and failed (5xx or
+# connection error) counts. It also records:
+#   rss        RSS of the server processes from /proc: the --pid processes
+#              or the gunicorn master in --pidfile plus its workers, found
+#              again each window so restarted workers are picked up. Needs
+#              the runner to be on the server's host
+#   server     the /metrics gauges that show growth: <prefix>_process_*
+#              (per worker RSS, Python heap, GC objects sampled every
+#              GC_OBJECTS_INTERVAL),
+#              _tensorflow_traces / _reallocations (tf.function retracing,
+#              TFLite tensor re-allocations), _model_size_mb,
+#              _prediction_cache_size and the X-ray cache's entries, tensors
+#              and disk_mb
+# Windows are appended to a JSONL report as they close, so a run that dies
+# keeps its history. The last line is the summary: RSS growth in MB per hour
+# (least squares over the windows after --warmup) and the p50 / p99 drift of
+# each route between the first and last third of the run. The exit status
+# is 1 when RSS grows faster than SOAK_RSS_MB_PER_HOUR, a p99 drifts by more
+# than SOAK_P99_DRIFT (routes with SOAK_MIN_SAMPLES requests per third), or
+# more than SOAK_MAX_ERROR_RATE of requests fail. Run the soak from another
+# machine, or at least other cores, when latency drift matters: a client
+# sharing the server's CPU adds its own jitter.
+#
+# Kept identical in backend/ and aarogya_ai/backend/ (check_shared.py).
+
+import argparse
+import http.client
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+from metrics import proc_status  # noqa: E402
+from synthetic import PatientSampler, XraySampler, multipart  # noqa: E402
+
+# ===================== Configuration =====================
+SOAK_RSS_MB_PER_HOUR = float(os.environ.get("SOAK_RSS_MB_PER_HOUR", "50"))
+SOAK_P99_DRIFT = float(os.environ.get("SOAK_P99_DRIFT", "0.5"))
+SOAK_MAX_ERROR_RATE = float(os.environ.get("SOAK_MAX_ERROR_RATE", "0.01"))
+# Routes with fewer successful requests per third are reported, not checked
+SOAK_MIN_SAMPLES = int(os.environ.get("SOAK_MIN_SAMPLES", "2000"))
+
+BATCH_SIZE = 20
+WHATIF_STEPS = 50
+SERVER_GAUGES = re.compile(
+    r"^\w+?_(process_\w+|tensorflow_(traces|reallocations)|model_size_mb"
+    r"|prediction_cache_size|xray_cache_(entries|tensors|disk_mb))[{ ]"
+)
+
+
+# ===================== Payloads =====================
+def single(patients, i):
+    return json.dumps(patients.sample()).encode(), "application/json"
+
+
+def batch(patients, i):
+    return json.dumps(patients.batch(BATCH_SIZE)).encode(), "application/json"
+
+
+def whatif(field, start, stop):
+    def make(patients, i):
+        grid = {"field": field, "start": start, "stop": stop, "steps": WHATIF_STEPS}
+        body = {"patient": patients.sample(), "grid": grid}
+        return json.dumps(body).encode(), "application/json"
+    return make
+
+
+def xray(films_per_request):
+    def make(films, i):
+        return multipart([films.image() for _ in range(films_per_request)])
+    return make
+
+
+# Route -> (share of traffic, payload, sampler kind)
+ROUTES = {
+    "/predict/heart": (10, single, "patients"),
+    "/predict/diabetes": (10, single, "patients"),
+    "/predict/lung": (10, single, "patients"),
+    "/predict/screening": (5, single, "patients"),
+    "/predict/heart/batch": (1, batch, "patients"),
+    "/predict/diabetes/batch": (1, batch, "patients"),
+    "/predict/lung/batch": (1, batch, "patients"),
+    "/predict/heart/whatif": (1, whatif("weight_kg", 50, 149), "patients"),
+    "/predict/diabetes/whatif": (1, whatif("hba1c_level", 4, 9), "patients"),
+    "/predict/risk/heart": (10, single, "patients"),
+    "/predict/risk/diabetes": (10, single, "patients"),
+    "/predict/risk/lung": (10, single, "patients"),
+    "/predict/xray/lung": (2, xray(1), "films"),
+    "/predict/xray/bones": (1, xray(1), "films"),
+    "/predict/xray/kidney": (1, xray(1), "films"),
+    "/predict/xray": (1, xray(2), "films"),
+}
+
+
+def parse_duration(text):
+    """Seconds from "90", "90s", "30m" or "4h"."""
+    units = {"s": 1, "m": 60, "h": 3600}
+    if text[-1:] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+# ===================== Server processes =====================
+def children(pid):
+    out = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The process name may contain spaces: fields start after ")"
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            out.append(int(entry))
+    return out
+
+
+def server_pids(args):
+    pids = list(args.pid)
+    if args.pidfile:
+        try:
+            with open(args.pidfile) as f:
+                master = int(f.read().strip())
+        except (OSError, ValueError):
+            return pids
+        pids += [master] + children(master)
+    return pids
+
+
+def rss_sample(pids):
+    rss = {}
+    for pid in pids:
+        mb = proc_status(pid).get("rss_mb")
+        if mb is not None:
+            rss[str(pid)] = mb
+    return rss
+
+
+def scrape_gauges(url):
+    """The growth-related gauges from GET /metrics, {"name{labels}": value}."""
+    # A fresh connection: a kept-alive one would be closed by the server
+    # between windows
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    try:
+        conn.request("GET", "/metrics")
+        response = conn.getresponse()
+        text = response.read().decode()
+    except (OSError, http.client.HTTPException):
+        return {}
+    finally:
+        conn.close()
+    if response.status != 200:
+        return {}
+    gauges = {}
+    for line in text.splitlines():
+        if line.startswith("#") or not SERVER_GAUGES.match(line):
+            continue
+        key, _, value = line.rpartition(" ")
+        try:
+            gauges[key] = float(value)
+        except ValueError:
+            pass
+    return gauges
+
+
+# ===================== Windows =====================
+class Window:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.latencies = {}
+        self.counts = {}
+        self.lag = []
+        self._lock = threading.Lock()
+
+    def record(self, route, status, seconds, lag):
+        if status is None or (status >= 500 and status != 503):
+            kind = "failed"
+        elif status in (429, 503):
+            kind = "rejected"
+        elif status >= 400:
+            kind = "client_error"
+        else:
+            kind = "ok"
+        with self._lock:
+            counts = self.counts.setdefault(route, {"ok": 0, "client_error": 0,
+                                                    "rejected": 0, "failed": 0})
+            counts[kind] += 1
+            if kind == "ok":
+                self.latencies.setdefault(route, []).append(seconds)
+            self.lag.append(lag)
+
+    def summary(self, elapsed, dropped):
+        with self._lock:
+            latencies, counts, lag = self.latencies, self.counts, self.lag
+        seconds = time.monotonic() - self.started
+        routes = {}
+        for route, c in sorted(counts.items()):
+            lat = np.array(latencies.get(route, [])) * 1000
+            routes[route] = {
+                "rps": round(sum(c.values()) / seconds, 2),
+                **c,
+                "p50_ms": round(float(np.percentile(lat, 50)), 3) if len(lat) else None,
+                "p99_ms": round(float(np.percentile(lat, 99)), 3) if len(lat) else None,
+            }
+        return {
+            "t": round(elapsed, 1),
+            "rps": round(sum(r["rps"] for r in routes.values()), 2),
+            "dropped": dropped,
+            "send_lag_ms": round(float(np.mean(lag)) * 1000, 3) if lag else 0.0,
+            "routes": routes,
+        }
+
+
+# ===================== Runner =====================
+class Soak:
+    def __init__(self, args, routes):
+        self.args = args
+        self.url = urlsplit(args.url)
+        self.routes = routes
+        self.samplers = {
+            "patients": PatientSampler(seed=args.seed, invalid_rate=args.invalid_rate),
+            "films": XraySampler(seed=args.seed, repeat=args.xray_repeat),
+        }
+        # Samplers are not thread safe: payloads are built by the scheduler
+        self.backlog = queue.Queue(maxsize=args.concurrency * 4)
+        self.window = Window()
+        self.dropped = 0
+        self.stopping = threading.Event()
+
+    def connect(self):
+        return http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=60)
+
+    def post(self, conn, route, body, content_type):
+        conn.request("POST", route, body, {"Content-Type": content_type})
+        response = conn.getresponse()
+        response.read()
+        return response.status
+
+    def probe(self):
+        """Drop the routes the server does not have."""
+        served = {}
+        for route, spec in self.routes.items():
+            share, make, kind = spec
+            # One connection per probe: a 404 leaves the body unread, so the
+            # server may close the connection
+            conn = self.connect()
+            status = self.post(conn, route, *make(self.samplers[kind], 0))
+            conn.close()
+            if status in (404, 405):
+                print(f"{route}: not served by {self.args.url}, skipped")
+            else:
+                served[route] = spec
+        return served
+
+    def sender(self):
+        conn = self.connect()
+        while True:
+            item = self.backlog.get()
+            if item is None:
+                break
+            route, body, content_type, due = item
+            sent = time.monotonic()
+            try:
+                status = self.post(conn, route, body, content_type)
+            except (OSError, http.client.HTTPException):
+                status = None
+                conn.close()
+                conn = self.connect()
+            self.window.record(route, status, time.monotonic() - sent, sent - due)
+        conn.close()
+
+    def schedule(self, deadline):
+        names = list(self.routes)
+        shares = np.array([self.routes[r][0] for r in names], dtype=float)
+        rng = np.random.default_rng(self.args.seed)
+        picks = rng.choice(len(names), size=100000, p=shares / shares.sum())
+        interval = 1.0 / self.args.rps
+        due = time.monotonic()
+        i = 0
+        while not self.stopping.is_set() and due < deadline:
+            route = names[picks[i % len(picks)]]
+            _, make, kind = self.routes[route]
+            body, content_type = make(self.samplers[kind], i)
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self.backlog.put_nowait((route, body, content_type, due))
+            except queue.Full:
+                self.dropped += 1
+            i += 1
+            due += interval
+
+    def run(self, report):
+        args = self.args
+        started = time.monotonic()
+        deadline = started + parse_duration(args.duration)
+        senders = [threading.Thread(target=self.sender, daemon=True)
+                   for _ in range(args.concurrency)]
+        for t in senders:
+            t.start()
+        scheduler = threading.Thread(target=self.schedule, args=(deadline,), daemon=True)
+        scheduler.start()
+
+        windows = []
+        window_s = parse_duration(args.window)
+        try:
+            while time.monotonic() < deadline:
+                time.sleep(min(window_s, max(deadline - time.monotonic(), 0)))
+                window, self.window = self.window, Window()
+                dropped, self.dropped = self.dropped, 0
+                summary = window.summary(time.monotonic() - started, dropped)
+                summary["rss"] = rss_sample(server_pids(args))
+                summary["server"] = scrape_gauges(self.url)
+                windows.append(summary)
+                report.write(json.dumps(summary, sort_keys=True) + "\n")
+                report.flush()
+                print_window(summary)
+        except KeyboardInterrupt:
+            print("interrupted, summarizing")
+        finally:
+            self.stopping.set()
+            scheduler.join()
+            for _ in senders:
+                self.backlog.put(None)
+        return windows
+
+
+# ===================== Drift =====================
+def slope_per_hour(points):
+    """Least-squares slope of [(seconds, value)], per hour; None under 3 points."""
+    if len(points) < 3:
+        return None
+    t, v = np.array(points, dtype=float).T
+    if np.ptp(t) == 0:
+        return None
+    return round(float(np.polyfit(t, v, 1)[0]) * 3600, 3)
+
+
+def thirds(rows, field):
+    """Median of `field` over the first and last third of the windows, and
+    the fewest successful requests behind either."""
+    rows = [r for r in rows if r[field] is not None]
+    if len(rows) < 2:
+        return None, None, 0
+    k = max(len(rows) // 3, 1)
+    first, last = rows[:k], rows[-k:]
+    samples = min(sum(r["ok"] for r in first), sum(r["ok"] for r in last))
+    return (float(np.median([r[field] for r in first])),
+            float(np.median([r[field] for r in last])), samples)
+
+
+def drift(first, last):
+    if first is None or last is None or first == 0:
+        return None
+    return round(last / first - 1, 4)
+
+
+def analyze(windows, warmup_s):
+    steady = [w for w in windows if w["t"] > warmup_s] or windows
+    totals = {"ok": 0, "client_error": 0, "rejected": 0, "failed": 0}
+    for w in windows:
+        for r in w["routes"].values():
+            for k in totals:
+                totals[k] += r[k]
+    sent = sum(totals.values())
+
+    rss_total = [(w["t"], sum(w["rss"].values())) for w in steady if w["rss"]]
+    rss_max = [(w["t"], max(w["rss"].values())) for w in steady if w["rss"]]
+    server = {}
+    for key in sorted({k for w in steady for k in w["server"]}):
+        points = [(w["t"], w["server"][key]) for w in steady if key in w["server"]]
+        server[key] = {"first": points[0][1], "last": points[-1][1],
+                       "per_hour": slope_per_hour(points)}
+
+    routes = {}
+    for route in sorted({r for w in steady for r in w["routes"]}):
+        rows = [w["routes"][route] for w in steady if route in w["routes"]]
+        *p50, samples = thirds(rows, "p50_ms")
+        *p99, _ = thirds(rows, "p99_ms")
+        routes[route] = {
+            "p50_ms": p50, "p99_ms": p99, "samples": samples,
+            "p50_drift": drift(*p50), "p99_drift": drift(*p99),
+        }
+
+    return {
+        "summary": True,
+        "windows": len(windows),
+        "requests": totals,
+        "failure_rate": round(totals["failed"] / sent, 5) if sent else None,
+        "dropped": sum(w["dropped"] for w in windows),
+        "rss_mb": {
+            "first": rss_total[0][1] if rss_total else None,
+            "last": rss_total[-1][1] if rss_total else None,
+            "total_per_hour": slope_per_hour(rss_total),
+            "largest_process_per_hour": slope_per_hour(rss_max),
+        },
+        "server": server,
+        "routes": routes,
+    }
+
+
+def failed_checks(result):
+    failures = []
+    growth = result["rss_mb"]["total_per_hour"]
+    if growth is not None and growth > SOAK_RSS_MB_PER_HOUR:
+        failures.append(f"RSS grows {growth:.1f} MB/h (limit {SOAK_RSS_MB_PER_HOUR:g})")
+    for route, r in result["routes"].items():
+        # A p99 over a few hundred requests is mostly noise
+        if r["samples"] < SOAK_MIN_SAMPLES:
+            continue
+        if r["p99_drift"] is not None and r["p99_drift"] > SOAK_P99_DRIFT:
+            failures.append(f"{route} p99 drifted {r['p99_drift']:+.0%}")
+    rate = result["failure_rate"]
+    if rate is not None and rate > SOAK_MAX_ERROR_RATE:
+        failures.append(f"{rate:.2%} of requests failed")
+    return failures
+
+
+# ===================== Reporting =====================
+def print_window(w):
+    ok = [r for r in w["routes"].values() if r["p99_ms"] is not None]
+    worst = max((r["p99_ms"] for r in ok), default=0.0)
+    failed = sum(r["failed"] for r in w["routes"].values())
+    rejected = sum(r["rejected"] for r in w["routes"].values())
+    rss = sum(w["rss"].values())
+    print(f"{w['t']:>8.0f}s {w['rps']:>8.1f} req/s  worst p99 {worst:>8.2f} ms  "
+          f"failed {failed:>4}  429/503 {rejected:>4}  dropped {w['dropped']:>4}  "
+          f"rss {rss:>8.1f} MB ({len(w['rss'])} proc)")
+
+
+def print_summary(result):
+    rss = result["rss_mb"]
+    print(f"\n{result['windows']} windows, requests {result['requests']}, "
+          f"dropped {result['dropped']}")
+    if rss["first"] is not None:
+        print(f"RSS {rss['first']:.1f} -> {rss['last']:.1f} MB, "
+              f"{rss['total_per_hour']} MB/h total, "
+              f"{rss['largest_process_per_hour']} MB/h largest process")
+    print(f"\n{'route':<28}{'p50 ms':>20}{'p99 ms':>20}{'p99 drift':>11}{'samples':>9}")
+    for route, r in result["routes"].items():
+        p50, p99 = r["p50_ms"], r["p99_ms"]
+        if p50[0] is None:
+            continue
+        p99_drift = "-" if r["p99_drift"] is None else f"{r['p99_drift']:+.1%}"
+        print(f"{route:<28}{p50[0]:>9.2f} ->{p50[1]:>8.2f}{p99[0]:>9.2f} ->{p99[1]:>8.2f}"
+              f"{p99_drift:>11}{r['samples']:>9}")
+    growing = {k: s for k, s in result["server"].items() if s["per_hour"]}
+    if growing:
+        print(f"\n{'server gauge':<60}{'first':>12}{'last':>12}{'per hour':>12}")
+        for key, s in growing.items():
+            print(f"{key:<60}{s['first']:>12g}{s['last']:>12g}{s['per_hour']:>12g}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak-test a running server.")
+    parser.add_argument("--url", required=True, help="server to load, e.g. http://127.0.0.1:5000")
+    parser.add_argument("--rps", type=float, default=20, help="target requests per second")
+    parser.add_argument("--duration", default="1h", help="run time: 3600, 90m, 4h")
+    parser.add_argument("--window", default="60s", help="length of one reporting window")
+    parser.add_argument("--warmup", default="5m", help="left out of the drift figures")
+    parser.add_argument("--concurrency", type=int, default=16, help="sender connections")
+    parser.add_argument("--routes", default="", help="comma-separated substrings to filter routes")
+    parser.add_argument("--pid", type=int, action="append", default=[],
+                        help="server process to track (repeatable)")
+    parser.add_argument("--pidfile", help="gunicorn pid file: master and workers are tracked")
+    parser.add_argument("--xray-repeat", type=float, default=0.2,
+                        help="share of uploads that resend an earlier film")
+    parser.add_argument("--invalid-rate", type=float, default=0.0,
+                        help="share of patients sent with an invalid field")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="JSONL report (default soak-<time>.jsonl)")
+    args = parser.parse_args()
+
+    routes = ROUTES
+    if args.routes:
+        wanted = args.routes.split(",")
+        routes = {r: spec for r, spec in ROUTES.items() if any(w in r for w in wanted)}
+
+    soak = Soak(args, routes)
+    soak.routes = soak.probe()
+    if not soak.routes:
+        sys.exit("no routes to soak")
+
+    out = args.out or f"soak-{time.strftime('%Y%m%d-%H%M%S')}.jsonl"
+    print(f"{args.rps:g} req/s for {args.duration} over {len(soak.routes)} routes -> {out}")
+    with open(out, "w") as report:
+        windows = soak.run(report)
+        result = analyze(windows, parse_duration(args.warmup))
+        report.write(json.dumps(result, sort_keys=True) + "\n")
+
+    print_summary(result)
+    failures = failed_checks(result)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
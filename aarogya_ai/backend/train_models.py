@@ -1,25 +1,31 @@
 # train_models.py
+#
+# Trains the risk models served by /predict/risk/*. The CSVs are encoded with
+# feature_schema.py, the same schema app.py encodes requests with, so the
+# codes a model is trained on are the codes it is served with.
 
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import LabelEncoder
 import joblib
 import os
 
+from feature_schema import ENCODERS
+
 # Create models directory if not exists
 os.makedirs("models", exist_ok=True)
 
-def train_model(csv_path, target_column, model_name):
-    df = pd.read_csv(csv_path)
+def train_model(csv_path, schema_name, model_name):
+    if not os.path.exists(csv_path):
+        print(f"{model_name} skipped: {csv_path} not found")
+        return
 
-    # Encode categorical columns
-    for col in df.columns:
-        if df[col].dtype == "object":
-            df[col] = LabelEncoder().fit_transform(df[col])
+    encoder = ENCODERS[schema_name]
+    df = pd.read_csv(csv_path)
 
-    X = df.drop(target_column, axis=1)
-    y = df[target_column]
+    # Encode the feature columns and the target through the serving schema
+    X = encoder.encode_frame(df)
+    y = encoder.encode_target(df)
 
     # Split train/test
     X_train, X_test, y_train, y_test = train_test_split(
@@ -35,6 +41,6 @@ def train_model(csv_path, target_column, model_name):
     print(f"{model_name} trained successfully!")
 
 # ===================== Train models =====================
-train_model("data/heart.csv", "Heart_Disease", "heart_model")
+train_model("data/heart.csv", "heart", "heart_model")
 train_model("data/diabetes.csv", "diabetes", "diabetes_model")
-train_model("data/lung.csv", "LUNG_CANCER", "lung_model")
+train_model("data/lung.csv", "lung", "lung_model")
@@ -0,0 +1,32 @@
+# wsgi.py
+#
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+
+import os
+
+from app import app, registry
+from model_registry import MODEL_PRELOAD
+
+# Load and warm the CNNs in each worker before it takes requests (set 0 to
+# load them on first use instead)
+XRAY_PRELOAD = os.environ.get("XRAY_PRELOAD", "1") == "1"
+
+# The sklearn risk models are loaded in the gunicorn master and shared
+# copy-on-write. TensorFlow is not fork-safe, so the CNNs cannot be: each
+# worker loads its own copy after the fork, in warm_worker() (serve TFLite
+# variants with XRAY_TFLITE to have workers share the weights through the
+# page cache instead).
+registry.preload(MODEL_PRELOAD or registry.names(heavy=False))
+
+
+def warm_worker():
+    """Called by gunicorn.conf.py's post_worker_init in every new worker."""
+    if not XRAY_PRELOAD:
+        return
+    for name in registry.names(heavy=True):
+        try:
+            # Loading also runs the warm-up batches (register_xray_model)
+            registry.get(name)
+        except Exception as e:
+            # Left to load on first use, where the error reaches the client
+            print(f"XRAY_PRELOAD: {name} failed to load: {e}")
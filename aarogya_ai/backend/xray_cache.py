@@ -0,0 +1,200 @@
+# xray_cache.py
+#
+# Deduplication cache for X-ray inference. Uploads are keyed on a BLAKE2b
+# hash of their raw bytes plus the model id (name and artifact version), so
+# re-tries, second opinions and the same film sent to several endpoints
+# reuse one forward pass.
+#
+#   memory   LRU of model outputs (tiny arrays), XRAY_CACHE_SIZE entries
+#   tensors  optional LRU of preprocessed (224, 224, 3) inputs shared by all
+#            models, XRAY_CACHE_TENSORS entries (0 = off)
+#   disk     outputs as .npy files under XRAY_CACHE_DIR, bounded by
+#            XRAY_CACHE_DISK_MB, so hits survive restarts
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# ===================== Configuration =====================
+XRAY_CACHE_SIZE = int(os.environ.get("XRAY_CACHE_SIZE", "4096"))
+XRAY_CACHE_TENSORS = int(os.environ.get("XRAY_CACHE_TENSORS", "0"))
+XRAY_CACHE_DIR = os.environ.get("XRAY_CACHE_DIR", "")
+XRAY_CACHE_DISK_MB = float(os.environ.get("XRAY_CACHE_DISK_MB", "256"))
+
+
+def upload_digest(fp):
+    """Hash an upload stream in chunks and rewind it for decoding."""
+    h = hashlib.blake2b(digest_size=16)
+    for chunk in iter(lambda: fp.read(1 << 20), b""):
+        h.update(chunk)
+    fp.seek(0)
+    return h.hexdigest()
+
+
+def model_version(path):
+    # Size + mtime is enough to tell a retrained CNN apart without hashing
+    # hundreds of megabytes of weights at startup
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "missing"
+    return f"{st.st_size:x}{int(st.st_mtime):x}"
+
+
+class XrayCache:
+    def __init__(self, cache_dir, max_entries=XRAY_CACHE_SIZE, max_tensors=XRAY_CACHE_TENSORS,
+                 disk_mb=XRAY_CACHE_DISK_MB):
+        self.max_entries = max_entries
+        self.max_tensors = max_tensors
+        self.cache_dir = cache_dir
+        self.disk_budget = int(disk_mb * 1024 * 1024)
+        self._outputs = OrderedDict()
+        self._tensors = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.tensor_hits = 0
+        self.disk_evictions = 0
+
+        self._disk_bytes = 0
+        if self.cache_dir and self.disk_budget > 0:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+        else:
+            self.cache_dir = None
+
+    # ---------- Outputs ----------
+    def get(self, model_id, digest):
+        key = (model_id, digest)
+        with self._lock:
+            output = self._outputs.get(key)
+            if output is not None:
+                self._outputs.move_to_end(key)
+                self.hits += 1
+                return output
+
+        output = self._read_disk(model_id, digest)
+        with self._lock:
+            if output is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._remember(key, output)
+        return output
+
+    def put(self, model_id, digest, output):
+        output = np.array(output, copy=True)
+        self._remember((model_id, digest), output)
+        self._write_disk(model_id, digest, output)
+
+    def _remember(self, key, output):
+        with self._lock:
+            self._outputs[key] = output
+            self._outputs.move_to_end(key)
+            while len(self._outputs) > self.max_entries:
+                self._outputs.popitem(last=False)
+
+    # ---------- Preprocessed tensors ----------
+    def get_tensor(self, digest):
+        if not self.max_tensors:
+            return None
+        with self._lock:
+            tensor = self._tensors.get(digest)
+            if tensor is not None:
+                self._tensors.move_to_end(digest)
+                self.tensor_hits += 1
+            return tensor
+
+    def put_tensor(self, digest, tensor):
+        if not self.max_tensors:
+            return
+        # The preprocessing buffer is reused per thread, so keep a copy
+        tensor = np.array(tensor, copy=True)
+        with self._lock:
+            self._tensors[digest] = tensor
+            while len(self._tensors) > self.max_tensors:
+                self._tensors.popitem(last=False)
+
+    # ---------- Disk tier ----------
+    def _path(self, model_id, digest):
+        return os.path.join(self.cache_dir, model_id, f"{digest}.npy")
+
+    def _disk_files(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".npy"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, st.st_size, st.st_mtime
+
+    def _read_disk(self, model_id, digest):
+        if self.cache_dir is None:
+            return None
+        path = self._path(model_id, digest)
+        try:
+            output = np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)      # mtime doubles as last-used time for eviction
+        return output
+
+    def _write_disk(self, model_id, digest, output):
+        if self.cache_dir is None:
+            return
+        path = self._path(model_id, digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, output, allow_pickle=False)
+        size = os.path.getsize(tmp)
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._disk_bytes += size
+            over = self._disk_bytes > self.disk_budget
+        if over:
+            self._trim_disk()
+
+    def _trim_disk(self):
+        files = sorted(self._disk_files(), key=lambda f: f[2])
+        total = sum(size for _, size, _ in files)
+        # Trim to 90% so we do not rescan the directory on every write
+        target = self.disk_budget * 0.9
+        for path, size, _ in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.disk_evictions += 1
+        with self._lock:
+            self._disk_bytes = total
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._outputs),
+                "max_entries": self.max_entries,
+                "tensors": len(self._tensors),
+                "max_tensors": self.max_tensors,
+                "disk_dir": self.cache_dir,
+                "disk_mb": round(self._disk_bytes / 1024 / 1024, 3),
+                "disk_budget_mb": round(self.disk_budget / 1024 / 1024, 3),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "tensor_hits": self.tensor_hits,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0,
+                "disk_evictions": self.disk_evictions,
+            }
@@ -5,6 +5,10 @@ import questions from "./questions";
 
 const API_BASE = "http://127.0.0.1:5000";
 
+const renderRisk = ({ risk, error }) => (
+  error ? <em>⚠️ {error}</em> : <strong>{risk}%</strong>
+);
+
 export default function Quiz() {
   const [formData, setFormData] = useState({});
   const [result, setResult] = useState(null);
@@ -37,15 +41,19 @@ export default function Quiz() {
     setResult(null);
 
     try {
-      // Call APIs sequentially and safely
-      const heart = await safeFetch(`${API_BASE}/predict/heart`);
-      const diabetes = await safeFetch(`${API_BASE}/predict/diabetes`);
-      const lung = await safeFetch(`${API_BASE}/predict/lung`);
+      // One request scores every risk model from the same answers. A model
+      // whose fields did not parse is listed in `errors` instead of `risks`
+      const { risks = {}, errors = {} } = await safeFetch(`${API_BASE}/predict/screening`);
+      const outcome = (name) => (
+        risks[name]
+          ? { risk: risks[name].risk_percentage }
+          : { error: errors[name] || "Not available" }
+      );
 
       setResult({
-        heart: heart.risk_percentage,
-        diabetes: diabetes.risk_percentage,
-        lung: lung.risk_percentage,
+        heart: outcome("heart"),
+        diabetes: outcome("diabetes"),
+        lung: outcome("lung"),
       });
 
     } catch (err) {
@@ -100,9 +108,9 @@ export default function Quiz() {
 
       {result && (
         <div className="result-box">
-          <p>❤️ Heart Disease Risk: <strong>{result.heart}%</strong></p>
-          <p>🩸 Diabetes Risk: <strong>{result.diabetes}%</strong></p>
-          <p>🫁 Lung Cancer Risk: <strong>{result.lung}%</strong></p>
+          <p>❤️ Heart Disease Risk: {renderRisk(result.heart)}</p>
+          <p>🩸 Diabetes Risk: {renderRisk(result.diabetes)}</p>
+          <p>🫁 Lung Cancer Risk: {renderRisk(result.lung)}</p>
 
 
         </div>
@@ -1,214 +1,682 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from joblib import load
-import pandas as pd
+import numpy as np
+import itertools
+import json
 import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+import wire
+from compiled_model import LookupLogistic
+from feature_schema import ENCODERS, SCREENING
+from model_format import load_scorer
+from model_registry import ModelRegistry, MODEL_PRELOAD
+from model_store import ModelStore, ShadowStats, MODEL_SHADOW_RATE
+from prediction_cache import PredictionCache, file_version
 
 app = Flask(__name__)
 CORS(app)
 
+# Per-route latency histograms and the opt-in slow-request profiler
+metrics.instrument(app)
+
+# orjson for JSON bodies; MessagePack and Arrow by Content-Type / Accept
+wire.install(app)
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # ===================== Load models =====================
-heart_model = load(os.path.join(BASE_DIR, "models", "heart_model.pkl"))
-diabetes_model = load(os.path.join(BASE_DIR, "models", "diabetes_model.pkl"))
-lung_model = load(os.path.join(BASE_DIR, "models", "lung_model.pkl"))
+# Models load on first use (or at startup via MODEL_PRELOAD)
+registry = ModelRegistry()
 
-print("Heart model features:", heart_model.feature_names_in_)
-print("Diabetes model expects:", diabetes_model.n_features_in_)
-print("lungs model expects:", lung_model.n_features_in_)
+# Identical encoded inputs skip scoring; entries die with their model version
+prediction_cache = PredictionCache()
+registry.add_listener(lambda name, model: prediction_cache.invalidate(name))
 
 
-# ===================== Mappings =====================
-gender_map = {"Male": 0, "Female": 1}
-yes_no_map = {"Yes": 1, "No": 0}
-smoking_map = {"Never": 0, "Former": 1, "Current": 2}
-alcohol_map = {"Never": 0, "Occasionally": 1, "Frequently": 2}
-health_map = {"Poor": 0, "Fair": 1, "Good": 2, "Very Good": 3, "Excellent": 4}
+# Versioned artifacts published by train_models.py; the fixed paths below
+# are the fallback for models that were never published
+store = ModelStore()
+shadow_stats = ShadowStats()
+
+RISK_MODELS = {
+    "heart": "heart_model",
+    "diabetes": "diabetes_model",
+    "lung": "lung_model",
+}
 
-# ===================== Helper =====================
-def calculate_bmi(weight_kg, height_cm):
-    if weight_kg and height_cm:
-        return round(weight_kg / ((height_cm / 100) ** 2), 2)
-    return 0
+# Score single requests from precomputed partial-logit tables
+# (compiled_model.LookupLogistic) instead of encode + predict_one
+RISK_LOOKUP_TABLES = os.environ.get("RISK_LOOKUP_TABLES", "0") == "1"
+
+
+def scorer_loader(name, path):
+    def load_and_warm():
+        # .lin array files are memory-mapped without sklearn; pickles fall
+        # back to joblib (model_format.load_scorer)
+        scorer = load_scorer(path, ENCODERS[name], version=file_version(path))
+        if RISK_LOOKUP_TABLES and scorer.compiled:
+            scorer = LookupLogistic(scorer, ENCODERS[name])
+
+        # Score a few rows before the scorer is handed out, so a broken
+        # artifact fails here while the previous version is still serving
+        rows = np.zeros((8, scorer.n_features))
+        scorer.predict_proba(rows)
+        scorer.predict_one(rows[0])
+        if scorer.lookup:
+            scorer.predict_request({})
+        return scorer
+
+    return load_and_warm
+
+
+def active_path(name):
+    return store.active_path(name, os.path.join(BASE_DIR, "models", RISK_MODELS[name]))
+
+
+for name in RISK_MODELS:
+    path = active_path(name)
+    registry.register(name, scorer_loader(name, path), path=path)
+
+registry.preload(MODEL_PRELOAD)
+
+
+def apply_manifest():
+    """Swap in every model whose active version changed (runs on the watcher thread)."""
+    for name in RISK_MODELS:
+        version = store.active(name)
+        path = store.artifact_path(name, version) if version else None
+        if version and not registry.is_loaded(name):
+            # Not in memory in this worker; the next request loads the new version
+            registry.register(name, scorer_loader(name, path), path=path)
+        elif version and registry.get(name).version != version:
+            try:
+                registry.swap(name, scorer_loader(name, path), path=path)
+            except Exception as e:
+                print(f"Keeping {name} {registry.get(name).version}: {version} failed to load: {e!r}")
+
+        # Forget pinned versions that left the manifest
+        for key in registry.names():
+            model, pinned, pinned_version = key.partition("@")
+            if model == name and pinned and pinned_version not in store.versions(name):
+                registry.unregister(key)
+
+
+store.watch(apply_manifest)
+
+
+@app.before_request
+def watch_model_store():
+    store.ensure_watching()
+
+
+def versioned_scorer(name, version):
+    """Scorer for one stored version, registered and loaded on first use."""
+    key = f"{name}@{version}"
+    if not registry.is_registered(key):
+        path = store.artifact_path(name, version)
+        registry.register(key, scorer_loader(name, path), path=path)
+    return registry.get(key)
+
+
+def request_scorer(name):
+    """The active scorer, or the version pinned with an X-Model-Version header."""
+    scorer = registry.get(name)
+    pinned = request.headers.get("X-Model-Version")
+    if not pinned:
+        return scorer
+    version = store.resolve(name, pinned)
+    if version is None:
+        raise LookupError(f"unknown {name} model version {pinned!r}")
+    if version == scorer.version:
+        return scorer
+    return versioned_scorer(name, version)
 
-def safe_float(value, default=0.0):
+
+def shadow_version(name, scorer):
+    """The candidate to shadow-score this request against, if any."""
+    candidate = store.candidate(name)
+    if not candidate or candidate == scorer.version or request.headers.get("X-Model-Version"):
+        return None
+    if request.headers.get("X-Shadow") == "1" or random.random() < MODEL_SHADOW_RATE:
+        return candidate
+    return None
+
+
+def shadow_score(name, version, X):
+    # Runs after the response has been sent (call_on_close). Both versions
+    # score the same rows back to back, so their latencies are comparable
+    try:
+        active = registry.get(name)
+        candidate = versioned_scorer(name, version)
+        started = time.perf_counter()
+        active_probs = active.predict_proba(X)
+        middle = time.perf_counter()
+        candidate_probs = candidate.predict_proba(X)
+        finished = time.perf_counter()
+    except Exception as e:
+        print(f"Shadow scoring {name}@{version} failed: {e!r}")
+        shadow_stats.error(name, version)
+        return
+    metrics.STAGES.observe((name, "shadow_candidate"), finished - middle)
+    shadow_stats.record(name, version, active_probs, candidate_probs,
+                        middle - started, finished - middle)
+
+metrics.add_collector("model", registry.model_stats, label="model")
+metrics.add_collector("prediction_cache", lambda: {"tabular": prediction_cache.stats()})
+metrics.add_collector("shadow", shadow_stats.stats, label="model")
+
+
+# ===================== Batch helpers =====================
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+def read_batch_records():
+    """Return (records, errors) from a JSON array or an NDJSON body.
+
+    Lines that fail to parse are reported as per-record errors so one bad
+    line in an uploaded file does not reject the rest of the batch.
+    """
+    if request.mimetype in NDJSON_TYPES:
+        records, errors = [], []
+        lines = request.get_data(as_text=True).splitlines()
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError as e:
+                errors.append({"index": len(records), "error": f"invalid JSON: {e}"})
+                records.append(None)
+        return records, errors
+
+    data = wire.request_body(silent=True)
+    if isinstance(data, dict):
+        data = data.get("records")
+    if not isinstance(data, list):
+        return None, []
+    return data, []
+
+
+def score_batch(scorer, X, index, errors, count, fmt, timer):
+    risks = np.empty(0)
+    if index:
+        # one vectorized call for the whole batch
+        risks = np.round(scorer.predict_proba(X) * 100, 2)
+        timer.mark("predict")
+
+    errors.sort(key=lambda e: e["index"])
+    if fmt == wire.ARROW:
+        # One row per input record, in order; failed records have a null risk
+        risk = np.full(count, np.nan)
+        risk[index] = risks
+        error = [None] * count
+        for e in errors:
+            error[e["index"]] = e["error"]
+        response = wire.arrow_response({"risk_percentage": risk, "error": error},
+                                       {"model_version": scorer.version, "count": count})
+    else:
+        response = wire.respond({
+            "count": count,
+            "model_version": scorer.version,
+            "results": [
+                {"index": i, "risk_percentage": float(r)}
+                for i, r in zip(index, risks)
+            ],
+            "errors": errors
+        }, fmt)
+    response.headers["X-Model-Version"] = scorer.version
+    timer.mark("serialize")
+    return response
+
+
+def batch_response(name):
+    timer = metrics.stage_timer(f"{name}_batch")
+    fmt = wire.response_format(arrow=True)
+    frame = records = None
+    if wire.is_arrow_request():
+        # Columnar batches skip per-record dicts and are encoded in one pass
+        frame = wire.read_arrow()
+    else:
+        records, errors = read_batch_records()
+        if records is None:
+            return wire.respond({"error": "Expected a JSON array of patient records"}), 400
+    timer.mark("parse")
+    try:
+        scorer = request_scorer(name)
+    except LookupError as e:
+        return wire.respond({"error": str(e)}), 404
+    timer.mark("load")
+
+    encoder = ENCODERS[name]
+    if frame is not None:
+        X, index, errors = encoder.encode_request_frame(frame)
+        count = len(frame)
+    else:
+        X, index, encode_errors = encoder.encode_records(records)
+        failed = {e["index"] for e in errors}
+        errors += [e for e in encode_errors if e["index"] not in failed]
+        count = len(records)
+    timer.mark("encode")
+    response = score_batch(scorer, X, index, errors, count, fmt, timer)
+
+    version = shadow_version(name, scorer)
+    if version and len(X):
+        response.call_on_close(lambda: shadow_score(name, version, X))
+    return response
+
+
+def single_response(name):
+    timer = metrics.stage_timer(name)
+    fmt = wire.response_format()
+    data = wire.request_body()
+    timer.mark("parse")
+    # Both the encoder and the lookup tables read fields with data.get()
+    if not isinstance(data, dict):
+        return wire.respond({"error": "Expected one JSON object with the patient's answers"},
+                            fmt), 400
+    try:
+        scorer = request_scorer(name)
+    except LookupError as e:
+        return wire.respond({"error": str(e)}, fmt), 404
+    timer.mark("load")
+    if scorer.lookup:
+        return lookup_response(name, scorer, data, fmt, timer)
+    try:
+        features = ENCODERS[name].encode(data)
+    except ValueError as e:
+        return wire.respond({"error": str(e)}, fmt), 400
+    timer.mark("encode")
+
+    key = prediction_cache.key(name, scorer.version, features)
+    body = prediction_cache.get(key)
+    timer.mark("cache")
+    if body is not None:
+        response = wire.respond_json_bytes(body, fmt)
+        response.headers["X-Cache"] = "HIT"
+        response.headers["X-Model-Version"] = scorer.version
+        return response
+
+    prob = scorer.predict_one(features)   # probability of disease
+    risk_percent = round(prob * 100, 2)
+    timer.mark("predict")
+
+    result = {
+        "risk_percentage": risk_percent,
+        "model_version": scorer.version
+    }
+    response = wire.respond(result, fmt)
+    # The cache holds JSON bodies, whatever format this client asked for
+    prediction_cache.set(key, response.get_data() if fmt == wire.JSON
+                         else app.json.response(result).get_data())
+    response.headers["X-Cache"] = "MISS"
+    response.headers["X-Model-Version"] = scorer.version
+    timer.mark("serialize")
+
+    version = shadow_version(name, scorer)
+    if version:
+        response.call_on_close(lambda: shadow_score(name, version, features[None, :]))
+    return response
+
+
+def lookup_response(name, scorer, data, fmt, timer):
+    # The tables read the request dict directly: there is no encoded row to
+    # key the prediction cache on, and a lookup costs less than a cache hit
     try:
-        if value in ["", None]:
-            return default
-        return float(value)
-    except:
-        return default
+        prob = scorer.predict_request(data)
+    except ValueError as e:
+        return wire.respond({"error": str(e)}, fmt), 400
+    timer.mark("predict")
 
+    response = wire.respond({
+        "risk_percentage": round(prob * 100, 2),
+        "model_version": scorer.version
+    }, fmt)
+    response.headers["X-Model-Version"] = scorer.version
+    timer.mark("serialize")
 
-# ===================== Routes =====================
-@app.route("/")
-def home():
-    return "Backend is running successfully 🚀"
+    version = shadow_version(name, scorer)
+    if version:
+        features = ENCODERS[name].encode(data)
+        response.call_on_close(lambda: shadow_score(name, version, features[None, :]))
+    return response
 
-# =====================================================
-# ✅ HEART PREDICTION (FIXED & SAFE)
-# =====================================================
-@app.route("/predict/heart", methods=["POST"])
-def predict_heart():
-    data = request.json
-    row = {}
 
-    for feature in heart_model.feature_names_in_:
+# ===================== File scoring =====================
+PARQUET_TYPES = ("application/vnd.apache.parquet", "application/x-parquet")
 
-        if feature == "General_Health":
-            row[feature] = health_map.get(data.get("general_health"), 2)
 
-        elif feature == "Checkup":
-            row[feature] = 1  # assume yearly checkup (safe default)
+def spool(stream):
+    # In memory up to 8 MB, on disk past that
+    copy = tempfile.SpooledTemporaryFile(max_size=8 << 20)
+    shutil.copyfileobj(stream, copy)
+    copy.seek(0)
+    return copy
 
-        elif feature == "Exercise":
-            row[feature] = yes_no_map.get(data.get("exercise"), 0)
 
-        elif feature in ["Skin_Cancer", "Other_Cancer",
-                         "Depression", "Arthritis"]:
-            row[feature] = 0  # not asked → assume No
+def file_response(name):
+    """Score an uploaded CSV / Parquet file and stream the scored CSV back.
 
-        elif feature == "Diabetes":
-            row[feature] = yes_no_map.get(data.get("diabetes"), 0)
+    Accepts a multipart "file" field, a raw text/csv body or a raw Parquet
+    body. Rows are read, scored and sent SCORE_CHUNK_ROWS at a time, so a
+    large upload never sits in memory whole.
+    """
+    # pandas is imported on the first file upload, not at startup
+    from score_file import csv_stream, is_parquet, read_chunks
 
-        elif feature == "Sex":
-            row[feature] = gender_map.get(data.get("gender"), 0)
+    try:
+        scorer = request_scorer(name)
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+
+    upload = request.files.get("file")
+    if upload is not None:
+        # Flask closes request.files when the view returns, before the
+        # streamed body is read, so the upload is copied out first
+        source, parquet = spool(upload.stream), is_parquet(upload.filename or "")
+    elif request.mimetype in PARQUET_TYPES:
+        # Parquet needs random access
+        source, parquet = spool(request.stream), True
+    else:
+        source, parquet = request.stream, False
+
+    # Read the first chunk up front so a malformed file is still a 400
+    chunks = read_chunks(source, parquet)
+    try:
+        first = next(chunks, None)
+    except (ValueError, RuntimeError) as e:
+        return jsonify({"error": f"could not read the uploaded file: {e}"}), 400
+    if first is None:
+        return jsonify({"error": "the uploaded file has no rows"}), 400
+
+    body = csv_stream(scorer, ENCODERS[name], itertools.chain([first], chunks))
+    response = Response(stream_with_context(body), mimetype="text/csv")
+    response.headers["X-Model-Version"] = scorer.version
+    response.headers["Content-Disposition"] = f'attachment; filename="{name}_scored.csv"'
+    return response
+
+
+# ===================== Screening =====================
+# Compiled scorers take microseconds, so models are scored inline by
+# default; SCREENING_PARALLEL=1 fans out to threads for slow fallback models
+SCREENING_PARALLEL = os.environ.get("SCREENING_PARALLEL", "0") == "1"
+screening_pool = ThreadPoolExecutor(max_workers=len(RISK_MODELS), thread_name_prefix="screening") \
+    if SCREENING_PARALLEL else None
+
+
+def screening_models():
+    names = request.args.get("models")
+    if not names:
+        return list(RISK_MODELS)
+    names = [n.strip() for n in names.split(",") if n.strip()]
+    unknown = [n for n in names if n not in RISK_MODELS]
+    if unknown:
+        raise LookupError(f"unknown models {unknown}; choose from {list(RISK_MODELS)}")
+    return names
+
+
+def screen_one(name, features):
+    """(risk, model_version) for one model, through the prediction cache."""
+    scorer = registry.get(name)
+    key = prediction_cache.key(name, scorer.version, features)
+    body = prediction_cache.get(key)
+    if body is not None:
+        return json.loads(body)["risk_percentage"], scorer.version
+    risk = round(scorer.predict_one(features) * 100, 2)
+    # Stored exactly as the single-model route would, so both share entries
+    prediction_cache.set(key, app.json.response(
+        risk_percentage=risk, model_version=scorer.version
+    ).get_data())
+    return risk, scorer.version
+
+
+def screening_response():
+    timer = metrics.stage_timer("screening")
+    data = wire.request_body(silent=True)
+    if not isinstance(data, dict):
+        return wire.respond({"error": "Expected one JSON object with the patient's answers"}), 400
+    try:
+        names = screening_models()
+    except LookupError as e:
+        return wire.respond({"error": str(e)}), 400
+    timer.mark("parse")
+
+    # Shared fields (age, BMI, height, weight, ...) are parsed once for all models
+    rows, errors = SCREENING.encode(data, names)
+    timer.mark("encode")
+    if not rows:
+        # Nothing to score: same body, so clients still see each model's error
+        return wire.respond({"risks": {}, "errors": errors}), 400
+
+    if screening_pool is not None and len(rows) > 1:
+        futures = {name: screening_pool.submit(screen_one, name, row) for name, row in rows.items()}
+        scored = {name: f.result() for name, f in futures.items()}
+    else:
+        scored = {name: screen_one(name, row) for name, row in rows.items()}
+    timer.mark("predict")
+
+    response = wire.respond({
+        "risks": {
+            name: {"risk_percentage": risk, "model_version": version}
+            for name, (risk, version) in scored.items()
+        },
+        "errors": errors,
+    })
+    timer.mark("serialize")
+    return response
+
+
+# ===================== What-if =====================
+WHATIF_MAX_POINTS = int(os.environ.get("WHATIF_MAX_POINTS", "10000"))
+WHATIF_MAX_STEPS = 1000
+
+
+def whatif_axes(encoder, grid):
+    """[(field, values), ...] from the request's "grid"; raises ValueError."""
+    if isinstance(grid, dict):
+        grid = [grid]
+    if not isinstance(grid, list) or not 1 <= len(grid) <= 2:
+        raise ValueError("grid must be one or two axes")
+    axes = []
+    for axis in grid:
+        field = axis.get("field") if isinstance(axis, dict) else None
+        if not isinstance(field, str) or field not in encoder.field_columns:
+            raise ValueError(f"{encoder.name} does not read field {field!r}; "
+                             f"choose from {sorted(encoder.field_columns)}")
+        if "values" in axis:
+            values = axis["values"]
+            if not isinstance(values, list) or not values:
+                raise ValueError(f"{field}: values must be a non-empty list")
+        else:
+            try:
+                start, stop, steps = float(axis["start"]), float(axis["stop"]), int(axis["steps"])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"{field}: give values, or numeric start, stop and steps")
+            if not 2 <= steps <= WHATIF_MAX_STEPS:
+                raise ValueError(f"{field}: steps must be between 2 and {WHATIF_MAX_STEPS}")
+            values = np.linspace(start, stop, steps).tolist()
+        axes.append((field, values))
+    if len(axes) == 2 and axes[0][0] == axes[1][0]:
+        raise ValueError("the two grid axes must be different fields")
+    return axes
+
+
+def whatif_response(name):
+    timer = metrics.stage_timer(f"{name}_whatif")
+    data = wire.request_body(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get("patient"), dict):
+        return wire.respond({"error": "Expected a JSON object with a patient"}), 400
+    base = data["patient"]
+    scenarios = data.get("scenarios") or {}
+    if not isinstance(scenarios, dict) or not all(isinstance(c, dict) for c in scenarios.values()):
+        return wire.respond({"error": "scenarios must map a name to the fields it changes"}), 400
+    encoder = ENCODERS[name]
+    try:
+        axes = whatif_axes(encoder, data["grid"]) if data.get("grid") else []
+    except ValueError as e:
+        return wire.respond({"error": str(e)}), 400
+    shape = [len(values) for _, values in axes]
+    points = 1 + len(scenarios) + (int(np.prod(shape)) if axes else 0)
+    if points > WHATIF_MAX_POINTS:
+        return wire.respond({"error": f"{points} points requested; the limit is {WHATIF_MAX_POINTS}"}), 400
+    timer.mark("parse")
+    try:
+        scorer = request_scorer(name)
+    except LookupError as e:
+        return wire.respond({"error": str(e)}), 404
+    timer.mark("load")
+
+    # Base patient, each scenario and the whole grid in one matrix
+    X = np.empty((points, encoder.n_features), dtype=np.float64)
+    try:
+        encoder.encode_into(base, X[0])
+        for row, (label, changes) in zip(X[1:], scenarios.items()):
+            try:
+                encoder.encode_into({**base, **changes}, row)
+            except ValueError as e:
+                raise ValueError(f"scenario {label!r}: {e}")
+        if axes:
+            X[1 + len(scenarios):] = encoder.encode_grid(base, axes)
+    except ValueError as e:
+        return wire.respond({"error": str(e)}), 400
+    timer.mark("encode")
+
+    # One vectorized pass for every point
+    risks = np.round(scorer.predict_proba(X) * 100, 2)
+    timer.mark("predict")
+
+    base_risk = float(risks[0])
+    body = {
+        "model_version": scorer.version,
+        "risk_percentage": base_risk,
+        "scenarios": {
+            label: {"risk_percentage": float(r), "change": round(float(r) - base_risk, 2)}
+            for label, r in zip(scenarios, risks[1:])
+        },
+    }
+    if axes:
+        body["grid"] = {
+            "fields": [field for field, _ in axes],
+            "values": [values for _, values in axes],
+            "risk_percentage": risks[1 + len(scenarios):].reshape(shape).tolist(),
+        }
+    response = wire.respond(body)
+    response.headers["X-Model-Version"] = scorer.version
+    timer.mark("serialize")
+    return response
 
-        elif feature == "Age_Category":
-            age = int(data.get("age", 0))
-            row[feature] = min(age // 10, 9)  # convert age → category
 
-        elif feature == "Height_(cm)":
-            row[feature] = float(data.get("height_cm", 0))
+# ===================== Routes =====================
+@app.route("/")
+def home():
+    return "Backend is running successfully 🚀"
 
-        elif feature == "Weight_(kg)":
-            row[feature] = float(data.get("weight_kg", 0))
+@app.route("/models")
+def models_status():
+    return jsonify(registry.stats())
 
-        elif feature == "BMI":
-            h = float(data.get("height_cm", 0))
-            w = float(data.get("weight_kg", 0))
-            row[feature] = float(data.get("bmi") or calculate_bmi(w, h))
+@app.route("/models/versions")
+def model_versions():
+    return jsonify({
+        "serving": {name: registry.get(name).version for name in RISK_MODELS
+                    if registry.is_loaded(name)},
+        "manifest": store.manifest()["models"],
+        "shadow": shadow_stats.stats(),
+    })
 
-        elif feature == "Smoking_History":
-            row[feature] = smoking_map.get(data.get("smoking_history"), 0)
+@app.route("/cache")
+def cache_status():
+    return jsonify(prediction_cache.stats())
 
-        elif feature == "Alcohol_Consumption":
-            row[feature] = alcohol_map.get(data.get("alcohol_consumption"), 0)
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
-        elif feature == "Fruit_Consumption":
-            row[feature] = int(data.get("fruit_consumption", 0))
+# =====================================================
+# ✅ HEART PREDICTION (FIXED & SAFE)
+# =====================================================
+@app.route("/predict/heart", methods=["POST"])
+def predict_heart():
+    return single_response("heart")
 
-        elif feature == "Green_Vegetables_Consumption":
-            row[feature] = int(data.get("green_veg_consumption", 0))
 
-        elif feature == "FriedPotato_Consumption":
-            row[feature] = 0  # not asked
+@app.route("/predict/heart/batch", methods=["POST"])
+def predict_heart_batch():
+    return batch_response("heart")
 
-        else:
-            row[feature] = 0
 
-    X = pd.DataFrame([row])
+@app.route("/predict/heart/file", methods=["POST"])
+def predict_heart_file():
+    return file_response("heart")
 
-    prob = heart_model.predict_proba(X)[0][1]   # probability of disease
-    risk_percent = round(prob * 100, 2)
 
-    return jsonify({
-        "risk_percentage": risk_percent
-    })
+@app.route("/predict/heart/whatif", methods=["POST"])
+def predict_heart_whatif():
+    return whatif_response("heart")
 
 
 # =====================================================
-# Diabetes Prediction (UNCHANGED)
+# Diabetes Prediction
 # =====================================================
 @app.route("/predict/diabetes", methods=["POST"])
 def predict_diabetes():
-    data = request.json
-
-    gender = gender_map.get(data.get("gender"), 0)
-    age = int(data.get("age", 0))
-
-    height = safe_float(data.get("height_cm"))
-    weight = safe_float(data.get("weight_kg"))
-    bmi = safe_float(data.get("bmi")) or calculate_bmi(weight, height)
-
-    exercise = yes_no_map.get(data.get("exercise"), 0)
-    smoking = smoking_map.get(data.get("smoking_history"), 0)
-    alcohol = alcohol_map.get(data.get("alcohol_consumption"), 0)
-
-    hba1c = safe_float(data.get("hba1c_level"))
-    glucose = safe_float(data.get("blood_glucose_level"))
-
-    features = [
-        gender,
-        age,
-        bmi,
-        exercise,
-        smoking,
-        alcohol,
-        hba1c,
-        glucose
-    ]
-
-    prob = diabetes_model.predict_proba([features])[0][1]
-    risk_percent = round(prob * 100, 2)
+    return single_response("diabetes")
 
-    return jsonify({
-        "risk_percentage": risk_percent
-    })
+
+@app.route("/predict/diabetes/batch", methods=["POST"])
+def predict_diabetes_batch():
+    return batch_response("diabetes")
 
 
+@app.route("/predict/diabetes/file", methods=["POST"])
+def predict_diabetes_file():
+    return file_response("diabetes")
+
+
+@app.route("/predict/diabetes/whatif", methods=["POST"])
+def predict_diabetes_whatif():
+    return whatif_response("diabetes")
+
 
 # =====================================================
-# Lung Cancer Prediction (UNCHANGED)
+# Lung Cancer Prediction
 # =====================================================
 @app.route("/predict/lung", methods=["POST"])
 def predict_lung():
-    data = request.json
-
-    gender = gender_map.get(data.get("gender"), 0)
-    age = int(data.get("age", 0))
-
-    smoking_history = smoking_map.get(data.get("smoking_history"), 0)
-    alcohol_consumption = alcohol_map.get(data.get("alcohol_consumption"), 0)
-
-    yellow_fingers = yes_no_map.get(data.get("yellow_fingers"), 0)
-    anxiety = yes_no_map.get(data.get("anxiety"), 0)
-    chronic_disease = yes_no_map.get(data.get("chronic_disease"), 0)
-    fatigue = yes_no_map.get(data.get("fatigue"), 0)
-    wheezing = yes_no_map.get(data.get("wheezing"), 0)
-    coughing = yes_no_map.get(data.get("coughing"), 0)
-    shortness_of_breath = yes_no_map.get(data.get("shortness_of_breath"), 0)
-    swallowing_difficulty = yes_no_map.get(data.get("swallowing_difficulty"), 0)
-    chest_pain = yes_no_map.get(data.get("chest_pain"), 0)
-
-    features = [
-        gender,
-        age,
-        smoking_history,
-        alcohol_consumption,
-        yellow_fingers,
-        anxiety,
-        chronic_disease,
-        fatigue,
-        wheezing,
-        coughing,
-        shortness_of_breath,
-        swallowing_difficulty,
-        chest_pain,
-        0,  # padding (model expects 15)
-        0   # padding (model expects 15)
-    ]
-    prob = lung_model.predict_proba([features])[0][1]
-    risk_percent = round(prob * 100, 2)
+    return single_response("lung")
+
+
+@app.route("/predict/lung/batch", methods=["POST"])
+def predict_lung_batch():
+    return batch_response("lung")
 
-    return jsonify({
-        "risk_percentage": risk_percent
-    })
 
+@app.route("/predict/lung/file", methods=["POST"])
+def predict_lung_file():
+    return file_response("lung")
 
 
+@app.route("/predict/lung/whatif", methods=["POST"])
+def predict_lung_whatif():
+    return whatif_response("lung")
+
+
+
+
+# =====================================================
+# Screening: every risk model from one questionnaire
+# =====================================================
+@app.route("/predict/screening", methods=["POST"])
+def predict_screening():
+    return screening_response()
+
 
 # ===================== Main =====================
 if __name__ == "__main__":
+    # Development server only; use gunicorn (see wsgi.py) in production
     app.run(debug=False)
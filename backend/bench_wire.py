@@ -0,0 +1,152 @@
+# bench_wire.py
+#
+# Serialization cost per record for each body format wire.py speaks.
+#
+#   python bench_wire.py                    # 1000-record batches
+#   python bench_wire.py --records 100 --repeat 50
+#
+# For a batch of diabetes patients it times, per record:
+#   decode    request body -> what the route encodes (dicts, or a DataFrame
+#             for Arrow)
+#   encode    the batch route's result -> response body
+#   route     POST /predict/diabetes/batch end to end through the Flask test
+#             client, in that format in and out
+# and the request / response size per record. Formats whose package is not
+# installed are skipped.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+from wire import ARROW, JSON, MSGPACK, optional  # noqa: E402
+
+RECORD = {"gender": "Female", "age": 54, "height_cm": 160, "weight_kg": 70,
+          "smoking_history": "Former", "hypertension": "No", "heart_disease": "No",
+          "hba1c_level": 6.1, "blood_glucose_level": 140}
+
+
+def make_records(n):
+    return [dict(RECORD, age=20 + i % 60, weight_kg=50 + i % 50) for i in range(n)]
+
+
+def make_result(n):
+    # The shape of a /predict/<model>/batch response
+    risks = np.round(np.random.default_rng(0).random(n) * 100, 2)
+    return {
+        "count": n,
+        "model_version": "0123456789ab",
+        "results": [{"index": i, "risk_percentage": float(r)} for i, r in enumerate(risks)],
+        "errors": [],
+    }
+
+
+def arrow_bytes(columns, metadata=None):
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    table = pa.table({k: pa.array(v, from_pandas=True) for k, v in columns.items()})
+    if metadata:
+        table = table.replace_schema_metadata(metadata)
+    sink = pa.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+# ===================== Codecs =====================
+def codecs():
+    """name -> (content type, encode request, decode request, encode response)."""
+    out = {
+        "json (stdlib)": (
+            JSON,
+            lambda records: json.dumps(records).encode(),
+            json.loads,
+            lambda result: json.dumps(result, sort_keys=True, separators=(",", ":")).encode(),
+        ),
+    }
+    orjson = optional("orjson")
+    if orjson is not None:
+        options = orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        out["json (orjson)"] = (
+            JSON,
+            orjson.dumps,
+            orjson.loads,
+            lambda result: orjson.dumps(result, option=options),
+        )
+    msgpack = optional("msgpack")
+    if msgpack is not None:
+        out["msgpack"] = (MSGPACK, msgpack.packb, msgpack.unpackb, msgpack.packb)
+    if optional("pyarrow") is not None:
+        import pandas as pd
+        import pyarrow.ipc
+
+        out["arrow"] = (
+            ARROW,
+            lambda records: arrow_bytes(pd.DataFrame(records).to_dict("series")),
+            lambda body: pyarrow.ipc.open_stream(body).read_all().to_pandas(),
+            lambda result: arrow_bytes(
+                {"risk_percentage": [r["risk_percentage"] for r in result["results"]],
+                 "error": [None] * result["count"]},
+                {"model_version": result["model_version"]},
+            ),
+        )
+    return out
+
+
+def per_record_us(fn, arg, n, repeat):
+    fn(arg)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    return (time.perf_counter() - started) / repeat / n * 1e6
+
+
+# ===================== Main =====================
+def main():
+    parser = argparse.ArgumentParser(description="Serialization cost per record, per format.")
+    parser.add_argument("--records", type=int, default=1000, help="records per batch")
+    parser.add_argument("--repeat", type=int, default=20, help="timed repetitions")
+    args = parser.parse_args()
+    n = args.records
+
+    from app import app
+
+    client = app.test_client()
+    records, result = make_records(n), make_result(n)
+
+    print(f"{n} diabetes records per batch, us per record")
+    print(f"{'format':<16}{'decode':>9}{'encode':>9}{'route':>9}{'req B':>8}{'resp B':>8}")
+    for name, (content_type, encode_request, decode_request, encode_response) in codecs().items():
+        body = encode_request(records)
+        response_body = encode_response(result)
+        decode = per_record_us(decode_request, body, n, args.repeat)
+        encode = per_record_us(encode_response, result, n, args.repeat)
+
+        def post(_):
+            r = client.post("/predict/diabetes/batch", data=body,
+                            content_type=content_type, headers={"Accept": content_type})
+            assert r.status_code == 200, r.data[:200]
+
+        provider = app.json
+        if name == "json (stdlib)":
+            # Flask's own provider, as without wire.install
+            app.json = DefaultJSONProvider(app)
+        try:
+            route = per_record_us(post, None, n, args.repeat)
+        finally:
+            app.json = provider
+
+        print(f"{name:<16}{decode:>9.2f}{encode:>9.2f}{route:>9.2f}"
+              f"{len(body) / n:>8.1f}{len(response_body) / n:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,93 +1,142 @@
 # check_accuracy.py
-
-import pandas as pd
-from joblib import load
+#
+# Evaluates every risk model on its hold-out split and writes one JSON
+# report: accuracy, ROC-AUC, precision / recall / F1, Brier score, log loss,
+# confusion matrix and a calibration table per model. Models are scored in
+# parallel worker processes through the same compiled scorers the API
+# serves with (array files and pickles alike, via model_format.load_scorer),
+# and metrics come from evaluation.py.
+#
+#   python check_accuracy.py                      # every model with data
+#   python check_accuracy.py diabetes lung        # a subset
+#   EVAL_MIN_AUC=0.8 python check_accuracy.py     # exit 1 below the gate
+#
+# The hold-out is the same train_test_split(test_size=0.2, random_state=42)
+# that train_models.py uses in full mode.
+#
+# EVAL_VERSION=active|candidate|previous|<version> scores that version from the model
+# store (model_store.py) instead of models/<name>.pkl, so a candidate can be
+# gated before it is activated.
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, classification_report
+
+from dataset_cache import load_dataset
+from evaluation import binary_report, gate
+from feature_schema import ENCODERS
+from model_format import load_scorer
+from model_store import ModelStore
+from prediction_cache import file_version
+from train_models import MODELS
 
 # ===================== Configuration =====================
-CSV_PATH = "data/heart.csv"        # Change to your dataset
-MODEL_PATH = "models/heart_model.pkl"  # Path to trained model
-TARGET_COLUMN = "Heart_Disease"
-
-# ===================== Load dataset =====================
-df = pd.read_csv(CSV_PATH)
-
-# ===================== Normalize categorical text =====================
-text_columns = [
-    "Sex", "Exercise", "Checkup", "General_Health",
-    "Skin_Cancer", "Other_Cancer", "Depression",
-    "Diabetes", "Arthritis", "Smoking_History",
-    "Alcohol_Consumption", "Age_Category", TARGET_COLUMN
-]
-
-for col in text_columns:
-    if col in df.columns and df[col].dtype == 'object':
-        df[col] = df[col].str.strip().str.title()
-
-# ===================== Mapping dictionaries =====================
-gender_map = {"Male": 0, "Female": 1}
-yes_no_map = {"No": 0, "Yes": 1}
-smoking_map = {"Never": 0, "Former": 1, "Current": 2}
-alcohol_map = {"Never": 0, "Occasionally": 1, "Frequently": 2}
-health_map = {"Poor": 0, "Fair": 1, "Good": 2, "Very Good": 3, "Excellent": 4}
-age_map = {
-    "18-24": 0, "25-29": 1, "30-34": 2, "35-39": 3, "40-44": 4,
-    "45-49": 5, "50-54": 6, "55-59": 7, "60-64": 8, "65-69": 9,
-    "70-74": 10, "75-79": 11, "80+": 12
-}
-
-mapping_dict = {
-    "Sex": gender_map,
-    "Exercise": yes_no_map,
-    "Checkup": yes_no_map,
-    "General_Health": health_map,
-    "Skin_Cancer": yes_no_map,
-    "Other_Cancer": yes_no_map,
-    "Depression": yes_no_map,
-    "Diabetes": yes_no_map,
-    "Arthritis": yes_no_map,
-    "Smoking_History": smoking_map,
-    "Alcohol_Consumption": alcohol_map,
-    "Age_Category": age_map,
-    TARGET_COLUMN: yes_no_map  # Encode target as 0/1
-}
-
-# ===================== Encode categorical columns =====================
-for col, map_dict in mapping_dict.items():
-    if col in df.columns:
-        df[col] = df[col].map(map_dict)
-
-# ===================== Split features and target =====================
-X = df.drop(TARGET_COLUMN, axis=1)
-y = df[TARGET_COLUMN]
-
-# ===================== Handle missing values =====================
-numeric_cols = X.select_dtypes(include=['int64', 'float64']).columns
-X[numeric_cols] = X[numeric_cols].fillna(X[numeric_cols].mean())
-
-categorical_cols = X.select_dtypes(include=['object', 'category']).columns
-for col in categorical_cols:
-    mode_val = X[col].mode()
-    if not mode_val.empty:
-        X[col] = X[col].fillna(mode_val[0])
-
-X = X.fillna(0)
-
-# ===================== Split train/test =====================
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
-)
-
-# ===================== Load trained model =====================
-model = load(MODEL_PATH)
-
-# ===================== Make predictions =====================
-y_pred = model.predict(X_test)
+EVAL_WORKERS = int(os.environ.get("EVAL_WORKERS", "3"))
+EVAL_REPORT = os.environ.get("EVAL_REPORT", "models/eval_report.json")
+EVAL_THRESHOLD = float(os.environ.get("EVAL_THRESHOLD", "0.5"))
+EVAL_VERSION = os.environ.get("EVAL_VERSION", "")
+
+
+def env_float(name):
+    value = os.environ.get(name, "")
+    return float(value) if value else None
+
+# Promotion gates, off unless set
+EVAL_MIN_ACCURACY = env_float("EVAL_MIN_ACCURACY")
+EVAL_MIN_AUC = env_float("EVAL_MIN_AUC")
+EVAL_MAX_ECE = env_float("EVAL_MAX_ECE")
+
+
+# ===================== Worker =====================
+def evaluate(name):
+    csv_path, model_name = MODELS[name]
+    model_path = f"models/{model_name}.pkl"
+    if EVAL_VERSION:
+        store = ModelStore(poll_s=0)
+        version = store.resolve(name, EVAL_VERSION)
+        if version is None:
+            return name, {"skipped": f"no {EVAL_VERSION!r} version of {name} in the model store"}
+        model_path = store.artifact_path(name, version)
+    if not os.path.exists(csv_path) or not os.path.exists(model_path):
+        return name, {"skipped": f"{csv_path} or {model_path} not found"}
+
+    started = time.perf_counter()
+    dataset = load_dataset(name, csv_path)
+
+    # Split row numbers, not frames, then gather only the hold-out rows
+    _, test = train_test_split(np.arange(dataset.rows), test_size=0.2, random_state=42)
+    test.sort()
+    X_test = np.asarray(dataset.X[test])
+    y_test = np.asarray(dataset.y[test])
+
+    # Store artifacts are usually array files; load_scorer checks either
+    # kind against the schema and only unpickles .pkl files
+    scorer = load_scorer(model_path, ENCODERS[name], version=file_version(model_path))
+    prob = scorer.predict_proba(X_test)
+
+    target_map = ENCODERS[name].schema["target"].get("map", {})
+    labels = [label for label, _ in sorted(target_map.items(), key=lambda kv: kv[1])] or ["0", "1"]
+    report = binary_report(y_test, prob, threshold=EVAL_THRESHOLD, labels=labels)
+    report.update({
+        "kind": "tabular",
+        "model_path": model_path,
+        "model_version": file_version(model_path),
+        "dataset_rows": dataset.rows,
+        "compiled": scorer.compiled,
+        "eval_s": round(time.perf_counter() - started, 3),
+    })
+    return name, report
+
+
+def print_summary(reports):
+    print(f"{'model':<12}{'rows':>9}{'accuracy':>10}{'roc_auc':>9}{'f1':>8}"
+          f"{'brier':>8}{'ece':>8}{'eval s':>8}")
+    for name, r in reports.items():
+        if "skipped" in r:
+            print(f"{name:<12} skipped: {r['skipped']}")
+            continue
+        print(f"{name:<12}{r['rows']:>9}{r['accuracy']:>10.4f}{r['roc_auc'] or 0:>9.4f}"
+              f"{r['f1']:>8.4f}{r['brier']:>8.4f}{r['calibration']['ece']:>8.4f}"
+              f"{r['eval_s']:>8.2f}")
 
-# ===================== Evaluate =====================
-accuracy = accuracy_score(y_test, y_pred)
-print(f"Accuracy: {accuracy:.4f}")
-print("\nClassification Report:\n")
-print(classification_report(y_test, y_pred))
 
+# ===================== Evaluate =====================
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(MODELS)
+    unknown = [n for n in names if n not in MODELS]
+    if unknown:
+        sys.exit(f"unknown models {unknown}; choose from {list(MODELS)}")
+
+    started = time.perf_counter()
+    workers = max(1, min(EVAL_WORKERS, len(names)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        reports = dict(pool.map(evaluate, names))
+
+    failed = {}
+    for name, r in reports.items():
+        if "skipped" not in r:
+            missed = gate(r, EVAL_MIN_ACCURACY, EVAL_MIN_AUC, EVAL_MAX_ECE)
+            if missed:
+                failed[name] = missed
+
+    print_summary(reports)
+    with open(EVAL_REPORT, "w") as f:
+        json.dump({
+            "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "wall_s": round(time.perf_counter() - started, 3),
+            "gates": {"min_accuracy": EVAL_MIN_ACCURACY, "min_auc": EVAL_MIN_AUC,
+                      "max_ece": EVAL_MAX_ECE},
+            "failed": failed,
+            "models": reports,
+        }, f, indent=2)
+    print(f"\nreport written to {EVAL_REPORT}")
+
+    for name, missed in failed.items():
+        print(f"GATE FAILED {name}: {', '.join(missed)}")
+    sys.exit(1 if failed else 0)
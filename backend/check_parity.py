@@ -0,0 +1,179 @@
+# check_parity.py
+#
+# Checks that the compiled NumPy scorers in compiled_model.py, and the
+# array files the API loads (model_format.py), give the same probabilities
+# as sklearn's predict_proba for every trained model. The lookup-table
+# scorers (RISK_LOOKUP_TABLES=1) are checked on random request payloads,
+# unknown labels, missing fields and bad numbers included. The batch
+# encoders (encode_records for the JSON batch routes, encode_request_frame
+# for file scoring), screening and the lookup tables must fail exactly the
+# records encode() fails, each on its own and with the same message: one
+# "inf", list or object value may not take the batch down with it.
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from joblib import load
+
+from compiled_model import LookupLogistic, compile_model
+from feature_schema import ENCODERS, SCREENING
+from model_format import EXTENSION, load_linear
+
+# ===================== Configuration =====================
+MODEL_PATHS = {
+    "heart": "models/heart_model.pkl",
+    "diabetes": "models/diabetes_model.pkl",
+    "lung": "models/lung_model.pkl",
+}
+TOLERANCE = 1e-9
+N_ROWS = 10000
+N_REQUESTS = 5000
+
+# JSON values that are not scalars, or are booleans, for any field
+ODD_VALUES = [["Male"], [1.0], {"value": 1}, {}, True, False]
+
+rng = np.random.default_rng(42)
+failed = False
+
+
+def random_request(encoder):
+    """A request dict with every kind of value the API can receive."""
+    data = {}
+    for col in encoder.schema["columns"]:
+        field = col["field"]
+        if field is None or rng.random() < 0.1:
+            continue                                  # missing
+        if col["kind"] == "category":
+            labels = list(col["map"]) + ["Unknown"]
+            data[field] = labels[rng.integers(len(labels))]
+        else:
+            value = float(rng.normal(50, 40))
+            data[field] = rng.choice([value, str(round(value, 1)), int(value), ""])
+    for field in ("height_cm", "weight_kg"):
+        if rng.random() < 0.8:
+            data[field] = float(rng.uniform(140, 200) if field == "height_cm" else rng.uniform(40, 140))
+    if rng.random() < 0.02:
+        data[rng.choice(sorted(data) or ["age"])] = "n/a"      # must fail like encode()
+    if rng.random() < 0.02:
+        data[rng.choice(sorted(data) or ["age"])] = str(rng.choice(["inf", "-inf", "nan"]))
+    if rng.random() < 0.03:
+        data[rng.choice(sorted(data) or ["age"])] = ODD_VALUES[rng.integers(len(ODD_VALUES))]
+    return data
+
+
+def outcome(fn, data):
+    # A ValueError is the API's 400 / per-record error; anything else is a 500
+    try:
+        return fn(data), None
+    except ValueError as e:
+        return None, str(e)
+    except Exception as e:
+        return None, f"raised {type(e).__name__}: {e}"
+
+
+def screening_outcome(name, data):
+    rows, errors = SCREENING.encode(data, [name])
+    return rows.get(name), errors.get(name)
+
+for name, path in MODEL_PATHS.items():
+    model = load(path)
+    scorers = {"compiled": compile_model(model)}
+    array_path = path[:-len(".pkl")] + EXTENSION
+    if os.path.exists(array_path):
+        scorers["array"] = load_linear(array_path, ENCODERS[name])
+
+    # Mix small categorical codes with wide continuous values so both the
+    # saturated and the mid-range parts of the sigmoid are exercised
+    X = np.hstack([
+        rng.integers(0, 5, size=(N_ROWS, model.n_features_in_ // 2)),
+        rng.normal(50, 40, size=(N_ROWS, model.n_features_in_ - model.n_features_in_ // 2)),
+    ]).astype(np.float64)
+
+    expected = model.predict_proba(
+        pd.DataFrame(X, columns=getattr(model, "feature_names_in_", None))
+    )[:, 1]
+
+    for kind, scorer in scorers.items():
+        batch_diff = np.max(np.abs(scorer.predict_proba(X) - expected))
+        single_diff = max(
+            abs(scorer.predict_one(X[i]) - expected[i]) for i in range(200)
+        )
+        diff = max(batch_diff, single_diff)
+
+        status = "OK" if diff <= TOLERANCE else "FAIL"
+        failed = failed or diff > TOLERANCE
+        print(f"{name:9s} {kind:9s} compiled={scorer.compiled!s:5s} max |diff| = {diff:.3e}  {status}")
+
+    # Lookup tables: request dict in, compared with sklearn on the encoded row
+    encoder = ENCODERS[name]
+    lookup = LookupLogistic(compile_model(model), encoder)
+    rows, probs, errors, mismatched = [], [], 0, 0
+    for _ in range(N_REQUESTS):
+        data = random_request(encoder)
+        row, error = outcome(encoder.encode, data)
+        prob, lookup_error = outcome(lookup.predict_request, data)
+        if error or lookup_error:
+            errors += 1
+            mismatched += error != lookup_error
+            continue
+        rows.append(row)
+        probs.append(prob)
+    expected = model.predict_proba(
+        pd.DataFrame(np.array(rows), columns=getattr(model, "feature_names_in_", None))
+    )[:, 1]
+    diff = np.max(np.abs(np.array(probs) - expected))
+
+    ok = diff <= TOLERANCE and not mismatched
+    failed = failed or not ok
+    print(f"{name:9s} {'lookup':9s} tables={lookup.table_stats()['entries']:<6d}"
+          f" max |diff| = {diff:.3e}  errors matched = {errors - mismatched}/{errors}"
+          f"  {'OK' if ok else 'FAIL'}")
+
+    # Batches: the same records through encode(), encode_records,
+    # encode_request_frame, screening and the lookup tables, with a
+    # non-finite record and list / object values among them
+    records = [random_request(encoder) for _ in range(N_REQUESTS)]
+    records[N_REQUESTS // 2] = dict(records[N_REQUESTS // 2], age="inf")
+    records[N_REQUESTS // 3] = dict(records[N_REQUESTS // 3], gender=["Male"])
+    records[N_REQUESTS // 4] = dict(records[N_REQUESTS // 4], age={"years": 50})
+    single = [outcome(encoder.encode, r) for r in records]
+    want_index = [i for i, (_, error) in enumerate(single) if error is None]
+    want_errors = [{"index": i, "error": error}
+                   for i, (_, error) in enumerate(single) if error is not None]
+    want_X = np.array([single[i][0] for i in want_index])
+    crashed = [e for e in want_errors if e["error"].startswith("raised ")]
+
+    ok = not crashed
+    print(f"{name:9s} {'batch':9s} {'single':8s} rows={len(want_index)} errors={len(want_errors)}"
+          f" raised={len(crashed)}  {'OK' if ok else 'FAIL'}")
+    frame = pd.DataFrame(records, dtype=object)
+    for kind, encode in (("records", encoder.encode_records),
+                         ("frame", encoder.encode_request_frame)):
+        try:
+            X, index, errors = encode(records if kind == "records" else frame)
+            same = (index == want_index and errors == want_errors
+                    and X.shape == want_X.shape and np.array_equal(X, want_X))
+        except Exception as e:
+            print(f"{name:9s} {'batch':9s} {kind:8s} raised {type(e).__name__}: {e}")
+            index, errors, same = [], [], False
+        ok = ok and same
+        print(f"{name:9s} {'batch':9s} {kind:8s} rows={len(index)} errors={len(errors)}"
+              f"  {'OK' if same else 'FAIL'}")
+
+    for kind, score in (("screen", lambda r: screening_outcome(name, r)),
+                        ("lookup", lambda r: outcome(lookup.predict_request, r))):
+        results = [score(r) for r in records]
+        same = all(
+            error == want_error and (error is not None or value is not None)
+            and (kind != "screen" or error is not None or np.array_equal(value, row))
+            for (value, error), (row, want_error) in zip(results, single)
+        )
+        ok = ok and same
+        n_errors = sum(error is not None for _, error in results)
+        print(f"{name:9s} {'batch':9s} {kind:8s} rows={len(results) - n_errors} errors={n_errors}"
+              f"  {'OK' if same else 'FAIL'}")
+    failed = failed or not ok
+
+sys.exit(1 if failed else 0)
@@ -0,0 +1,69 @@
+# check_shared.py
+#
+# Checks that the modules shared by the two Flask apps are still identical
+# in backend/ and aarogya_ai/backend/. Each app imports its own copy (both
+# are deployed from their own directory), so an edit made to one copy only
+# would let the two servers drift apart without anyone noticing.
+#
+#   python check_shared.py          # exit 1 and print a diff if any copy differs
+#   python check_shared.py --sync   # copy backend/'s version over the other one
+#
+# Run it from backend/ after changing any file in SHARED.
+
+import difflib
+import os
+import shutil
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OTHER_DIR = os.path.join(BASE_DIR, os.pardir, "aarogya_ai", "backend")
+
+# ===================== Configuration =====================
+SHARED = [
+    "bench_routes.py",
+    "compiled_model.py",
+    "evaluation.py",
+    "feature_schema.py",
+    "gunicorn.conf.py",
+    "metrics.py",
+    "model_registry.py",
+    "soak.py",
+    "synthetic.py",
+]
+
+
+def read(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+# ===================== Main =====================
+if __name__ == "__main__":
+    sync = "--sync" in sys.argv[1:]
+    failed = False
+    for name in SHARED:
+        ours = read(os.path.join(BASE_DIR, name))
+        theirs_path = os.path.join(OTHER_DIR, name)
+        theirs = read(theirs_path)
+        if ours is None:
+            print(f"{name}: missing from backend/")
+            failed = True
+        elif ours == theirs:
+            print(f"{name}: OK")
+        elif sync:
+            shutil.copyfile(os.path.join(BASE_DIR, name), theirs_path)
+            print(f"{name}: copied to aarogya_ai/backend/")
+        elif theirs is None:
+            print(f"{name}: missing from aarogya_ai/backend/")
+            failed = True
+        else:
+            print(f"{name}: DIFFERS")
+            sys.stdout.writelines(difflib.unified_diff(
+                ours.splitlines(keepends=True), theirs.splitlines(keepends=True),
+                f"backend/{name}", f"aarogya_ai/backend/{name}"))
+            failed = True
+
+    sys.exit(1 if failed else 0)
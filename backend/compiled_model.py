@@ -0,0 +1,254 @@
+# compiled_model.py
+#
+# Serving-time scorers for the risk models. Every model written by
+# train_models.py is a binary linear classifier with logistic loss
+# (LogisticRegression, or SGDClassifier in TRAIN_MODE=sgd), so the
+# probability is just sigmoid(x . coef + intercept). Compiling pulls those weights out once at
+# startup and scores requests with plain NumPy instead of going through
+# sklearn's input validation on every call.
+#
+# sklearn is imported only when a fitted sklearn model is compiled; scorers
+# loaded from array files (model_format.py) never import it.
+#
+# LookupLogistic goes one step further for single requests: the logit
+# contribution of every constant and categorical column is summed ahead of
+# time into tables indexed by the packed category codes, so scoring a
+# request dict is a table read plus one multiply-add per numeric field.
+#
+# Kept identical in backend/ and aarogya_ai/backend/ (check_shared.py).
+
+import math
+import threading
+from array import array
+
+import numpy as np
+
+from feature_schema import age_category, calculate_bmi, category_code, to_float
+
+# ===================== Configuration =====================
+LOOKUP_MAX_BITS = 16     # largest table: 2**16 float64 entries (512 KB)
+AGE_CATEGORIES = 13      # codes 0..12 from age_category()
+
+
+def sigmoid(z):
+    # exp(-log(1 + exp(-z))) is the numerically stable form of 1 / (1 + e^-z)
+    return np.exp(-np.logaddexp(0.0, -z))
+
+
+def sigmoid_scalar(z):
+    # Same stable form for one Python float, without a NumPy round trip
+    if z >= 0:
+        return 1.0 / (1.0 + math.exp(-z))
+    e = math.exp(z)
+    return e / (1.0 + e)
+
+
+# ===================== Linear models =====================
+class CompiledLogistic:
+    lookup = False
+
+    def __init__(self, model, version=None):
+        self._init(model.coef_[0], model.intercept_[0],
+                   getattr(model, "feature_names_in_", []), version)
+
+    @classmethod
+    def from_weights(cls, coef, intercept, feature_names, version=None):
+        scorer = cls.__new__(cls)
+        scorer._init(coef, intercept, feature_names, version)
+        return scorer
+
+    def _init(self, coef, intercept, feature_names, version):
+        # A read-only memory map is used as is; no copy is made
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.n_features = len(self.coef)
+        self.feature_names = list(feature_names)
+        self.compiled = True
+        self.version = version
+        self._local = threading.local()
+
+    def _row_buffer(self):
+        # One preallocated row per thread, reused for every request
+        row = getattr(self._local, "row", None)
+        if row is None:
+            row = self._local.row = np.zeros(self.n_features, dtype=np.float64)
+        return row
+
+    def predict_one(self, features):
+        row = self._row_buffer()
+        row[:] = features
+        return float(sigmoid(row @ self.coef + self.intercept))
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        return sigmoid(X @ self.coef + self.intercept)
+
+
+# ===================== Fallback =====================
+class SklearnScorer:
+    lookup = False
+
+    def __init__(self, model, version=None):
+        self.model = model
+        self.n_features = int(model.n_features_in_)
+        self.feature_names = list(getattr(model, "feature_names_in_", []))
+        self.compiled = False
+        self.version = version
+
+    def _frame(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if self.feature_names:
+            import pandas as pd
+            return pd.DataFrame(X, columns=self.feature_names)
+        return X
+
+    def predict_one(self, features):
+        return float(self.model.predict_proba(self._frame([features]))[0][1])
+
+    def predict_proba(self, X):
+        return self.model.predict_proba(self._frame(X))[:, 1]
+
+
+# ===================== Lookup tables =====================
+class LookupLogistic:
+    """A CompiledLogistic that scores request dicts with precomputed tables.
+
+    At load time the constant columns (fields nobody asks for) are folded
+    into the intercept, and every categorical column, the age bucket
+    included, gets a few bits of a packed key. For each group of at most
+    max_bits bits, a table holds the summed logit contribution of every
+    code combination. predict_request() builds the keys with one dict
+    lookup per category and adds the numeric fields on top; the result
+    matches encode() + predict_one(), error messages included.
+
+    predict_one / predict_proba on encoded rows go to the wrapped scorer.
+    """
+
+    lookup = True
+
+    def __init__(self, scorer, encoder, max_bits=LOOKUP_MAX_BITS):
+        self.scorer = scorer
+        self.version = scorer.version
+        self.n_features = scorer.n_features
+        self.feature_names = scorer.feature_names
+        self.compiled = True
+        coef = [float(c) for c in scorer.coef]
+
+        # One dimension per categorical column: its distinct codes, and the
+        # request label -> position in that list
+        dims = []
+        for j, field, mapping, default in encoder.categories:
+            codes = sorted(set(mapping.values()) | {default})
+            index = {label: codes.index(code) for label, code in mapping.items()}
+            dims.append((j, field, index, codes.index(default), codes))
+        if encoder.age_category is not None:
+            j, field = encoder.age_category
+            dims.append((j, field, None, 0, list(range(AGE_CATEGORIES))))
+
+        # Columns that are neither a category, the age bucket, a number nor
+        # BMI never change: fold them into the intercept
+        variable = {d[0] for d in dims} | {j for j, _, _ in encoder.numbers}
+        if encoder.bmi is not None:
+            variable.add(encoder.bmi[0])
+        bias = float(scorer.intercept)
+        for j in range(self.n_features):
+            if j not in variable:
+                bias += coef[j] * float(encoder.template[j])
+        self.bias = bias
+
+        # Pack the dimensions into keys of at most max_bits bits each
+        self.tables = []
+        self.categories = []
+        self.age = None
+        group, bits = [], 0
+        for dim in dims:
+            width = max(1, (len(dim[4]) - 1).bit_length())
+            if group and bits + width > max_bits:
+                self.tables.append(self._build(group, bits, coef))
+                group, bits = [], 0
+            group.append((dim, bits, width))
+            g = len(self.tables)
+            j, field, index, default, codes = dim
+            if index is None:
+                self.age = (g, bits, field)
+            else:
+                self.categories.append((g, field, index, default, bits))
+            bits += width
+        if group:
+            self.tables.append(self._build(group, bits, coef))
+
+        self.numbers = [(field, coef[j], default) for j, field, default in encoder.numbers]
+        self.bmi = (encoder.bmi[1], coef[encoder.bmi[0]]) if encoder.bmi is not None else None
+
+    @staticmethod
+    def _build(group, bits, coef):
+        keys = np.arange(1 << bits)
+        table = np.zeros(1 << bits, dtype=np.float64)
+        for (j, _, _, _, codes), shift, width in group:
+            position = (keys >> shift) & ((1 << width) - 1)
+            contribution = coef[j] * np.asarray(codes + [0.0] * ((1 << width) - len(codes)))
+            # Positions past the last code are never produced by a request
+            table += contribution[position]
+        # array("d") keeps 8 bytes per entry and indexes to a plain float
+        packed = array("d")
+        packed.frombytes(table.tobytes())
+        return packed
+
+    def table_stats(self):
+        return {
+            "tables": len(self.tables),
+            "entries": sum(len(t) for t in self.tables),
+            "numeric_fields": len(self.numbers) + (self.bmi is not None),
+        }
+
+    def predict_request(self, data):
+        """Probability of disease for one request dict."""
+        keys = [0] * len(self.tables)
+        for g, field, index, default, shift in self.categories:
+            keys[g] |= category_code(index, data.get(field), default, field) << shift
+
+        # Numbers, then age, then BMI: the order encode_into() validates in
+        z = self.bias
+        for field, weight, default in self.numbers:
+            z += weight * to_float(data.get(field), default, field)
+
+        if self.age is not None:
+            g, shift, field = self.age
+            keys[g] |= age_category(to_float(data.get(field), 0.0, field)) << shift
+
+        if self.bmi is not None:
+            field, weight = self.bmi
+            bmi = to_float(data.get(field), 0.0, field)
+            if not bmi:
+                bmi = calculate_bmi(to_float(data.get("weight_kg"), 0.0, "weight_kg"),
+                                    to_float(data.get("height_cm"), 0.0, "height_cm"))
+            z += weight * bmi
+
+        for table, key in zip(self.tables, keys):
+            z += table[key]
+        return sigmoid_scalar(z)
+
+    def predict_one(self, features):
+        return self.scorer.predict_one(features)
+
+    def predict_proba(self, X):
+        return self.scorer.predict_proba(X)
+
+
+def is_compilable(model):
+    from sklearn.linear_model import LogisticRegression, SGDClassifier
+
+    logistic = isinstance(model, LogisticRegression) or (
+        isinstance(model, SGDClassifier) and model.loss == "log_loss"
+    )
+    return (
+        logistic
+        and len(model.classes_) == 2
+        and model.coef_.shape[0] == 1
+    )
+
+
+def compile_model(model, version=None):
+    if is_compilable(model):
+        return CompiledLogistic(model, version)
+    return SklearnScorer(model, version)
@@ -0,0 +1,175 @@
+# dataset_cache.py
+#
+# Encoded dataset cache for training, evaluation and benchmarks. The first
+# time a CSV is used it is parsed in chunks, encoded through the serving
+# schema and written as a raw float64 feature matrix plus a target vector:
+#
+#   data/cache/<schema>/X.f8      (rows, n_features) float64, C order
+#   data/cache/<schema>/y.i8      (rows,) int64
+#   data/cache/<schema>/meta.json source hash, schema hash, shape, columns
+#
+# Later runs memory-map those files, with no text parsing and no category
+# lookups, so loading takes milliseconds whatever the CSV size. The entry is
+# keyed on the CSV's content hash and on a hash of the schema, so editing
+# either rebuilds it. If size and mtime still match, the CSV is not
+# re-hashed at all.
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from feature_schema import ENCODERS
+from prediction_cache import file_version
+
+# ===================== Configuration =====================
+DATASET_CACHE = os.environ.get("DATASET_CACHE", "1") != "0"
+DATASET_CACHE_DIR = os.environ.get("DATASET_CACHE_DIR", "data/cache")
+DATASET_CHUNK_ROWS = int(os.environ.get("DATASET_CHUNK_ROWS", "200000"))
+
+FORMAT_VERSION = 1
+
+
+# ===================== CSV =====================
+def read_csv_chunks(csv_path, encoder, chunk_rows=DATASET_CHUNK_ROWS):
+    """Yield (X, y) DataFrame / Series pairs per chunk of a raw CSV."""
+    dtypes = encoder.csv_dtypes()
+    reader = pd.read_csv(
+        csv_path, dtype=dtypes, usecols=lambda c: c in dtypes, chunksize=chunk_rows
+    )
+    for chunk in reader:
+        yield encoder.encode_frame(chunk), encoder.encode_target(chunk)
+
+
+def schema_version(encoder):
+    blob = json.dumps(encoder.schema, sort_keys=True, default=str)
+    return hashlib.sha256(f"{FORMAT_VERSION}:{blob}".encode()).hexdigest()[:12]
+
+
+# ===================== Dataset =====================
+class Dataset:
+    def __init__(self, name, X, y, columns, source=None, cached=False):
+        self.name = name
+        self.X = X
+        self.y = y
+        self.columns = columns
+        self.rows = len(y)
+        self.source = source
+        self.cached = cached
+
+    def frame(self):
+        # copy=False keeps the memory map; sklearn records the column names
+        return pd.DataFrame(self.X, columns=self.columns, copy=False)
+
+    def target(self):
+        return pd.Series(self.y, copy=False)
+
+    def chunks(self, chunk_rows=DATASET_CHUNK_ROWS):
+        """Yield (start, X, y) slices; only the pages being read are resident."""
+        for start in range(0, self.rows, chunk_rows):
+            stop = min(start + chunk_rows, self.rows)
+            X = pd.DataFrame(self.X[start:stop], columns=self.columns, copy=False)
+            yield start, X, pd.Series(self.y[start:stop], copy=False)
+
+
+# ===================== Cache =====================
+def _entry_dir(name):
+    return os.path.join(DATASET_CACHE_DIR, name)
+
+
+def _read_meta(name):
+    try:
+        with open(os.path.join(_entry_dir(name), "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_fresh(name, meta, csv_path, encoder):
+    if meta is None or meta.get("schema") != schema_version(encoder):
+        return False
+    st = os.stat(csv_path)
+    if meta["size"] == st.st_size and meta["mtime_ns"] == st.st_mtime_ns:
+        return True
+    # Touched or copied: only a content change invalidates the entry
+    if meta["sha256"] != file_version(csv_path):
+        return False
+    meta["size"], meta["mtime_ns"] = st.st_size, st.st_mtime_ns
+    _write_meta(_entry_dir(name), meta)
+    return True
+
+
+def _write_meta(folder, meta):
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, os.path.join(folder, "meta.json"))
+
+
+def build(name, csv_path, encoder):
+    """Encode `csv_path` chunk by chunk into a new cache entry."""
+    started = time.perf_counter()
+    st = os.stat(csv_path)
+    os.makedirs(DATASET_CACHE_DIR, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=DATASET_CACHE_DIR, prefix=f".{name}-")
+    os.chmod(tmp, 0o755)
+
+    rows = 0
+    with open(os.path.join(tmp, "X.f8"), "wb") as fx, open(os.path.join(tmp, "y.i8"), "wb") as fy:
+        for X, y in read_csv_chunks(csv_path, encoder):
+            np.ascontiguousarray(X.to_numpy(dtype=np.float64)).tofile(fx)
+            y.to_numpy(dtype=np.int64).tofile(fy)
+            rows += len(X)
+
+    _write_meta(tmp, {
+        "source": csv_path,
+        "sha256": file_version(csv_path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "schema": schema_version(encoder),
+        "rows": rows,
+        "columns": encoder.columns,
+        "build_s": round(time.perf_counter() - started, 3),
+    })
+
+    # Swap the new entry in; if another process got there first, keep theirs
+    final = _entry_dir(name)
+    shutil.rmtree(final, ignore_errors=True)
+    try:
+        os.rename(tmp, final)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+    print(f"{name}: cached {rows} encoded rows in {time.perf_counter() - started:.2f}s")
+
+
+def _open(name, meta):
+    folder = _entry_dir(name)
+    shape = (meta["rows"], len(meta["columns"]))
+    if meta["rows"] == 0:
+        X, y = np.empty(shape), np.empty(0, dtype=np.int64)
+    else:
+        X = np.memmap(os.path.join(folder, "X.f8"), dtype=np.float64, mode="r", shape=shape)
+        y = np.memmap(os.path.join(folder, "y.i8"), dtype=np.int64, mode="r", shape=shape[:1])
+    return Dataset(name, X, y, meta["columns"], source=meta["source"], cached=True)
+
+
+def load_dataset(name, csv_path, encoder=None):
+    """Return the encoded dataset for `csv_path`, building the cache if needed."""
+    encoder = encoder or ENCODERS[name]
+    if not DATASET_CACHE:
+        parts = list(read_csv_chunks(csv_path, encoder))
+        X = np.concatenate([X.to_numpy(dtype=np.float64) for X, _ in parts])
+        y = np.concatenate([y.to_numpy(dtype=np.int64) for _, y in parts])
+        return Dataset(name, X, y, encoder.columns, source=csv_path)
+
+    meta = _read_meta(name)
+    if not _is_fresh(name, meta, csv_path, encoder):
+        build(name, csv_path, encoder)
+        meta = _read_meta(name)
+    return _open(name, meta)
@@ -0,0 +1,158 @@
+# evaluation.py
+#
+# Vectorized classification metrics for the evaluation harness
+# (check_accuracy.py). Everything is plain NumPy over whole score arrays: no
+# per-row Python and no sklearn.metrics round trips, so scoring a million
+# hold-out rows costs a few sorts and bincounts.
+#
+# Kept identical in backend/ and aarogya_ai/backend/ (check_shared.py).
+
+import numpy as np
+
+CALIBRATION_BINS = 10
+
+
+# ===================== Building blocks =====================
+def confusion_matrix(y_true, y_pred, n_classes):
+    """counts[i, j] = rows of true class i predicted as class j."""
+    flat = np.asarray(y_true, dtype=np.int64) * n_classes + np.asarray(y_pred, dtype=np.int64)
+    return np.bincount(flat, minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+
+
+def average_ranks(scores):
+    # 1-based ranks, ties share the mean of the ranks they span
+    order = np.argsort(scores, kind="mergesort")
+    _, inverse, counts = np.unique(scores[order], return_inverse=True, return_counts=True)
+    ends = np.cumsum(counts)
+    ranks = np.empty(len(scores), dtype=np.float64)
+    ranks[order] = ((ends - counts + 1 + ends) / 2.0)[inverse]
+    return ranks
+
+
+def roc_auc(y_true, scores):
+    """Area under the ROC curve via the Mann-Whitney U statistic."""
+    y_true = np.asarray(y_true, dtype=bool)
+    positives = int(y_true.sum())
+    negatives = len(y_true) - positives
+    if positives == 0 or negatives == 0:
+        return None
+    ranks = average_ranks(np.asarray(scores, dtype=np.float64))
+    u = ranks[y_true].sum() - positives * (positives + 1) / 2.0
+    return float(u / (positives * negatives))
+
+
+def calibration(y_true, prob, bins=CALIBRATION_BINS):
+    """Reliability table over equal-width probability bins, plus ECE."""
+    y_true = np.asarray(y_true, dtype=np.float64)
+    prob = np.asarray(prob, dtype=np.float64)
+    index = np.minimum((prob * bins).astype(np.int64), bins - 1)
+    counts = np.bincount(index, minlength=bins)
+    prob_sum = np.bincount(index, weights=prob, minlength=bins)
+    pos_sum = np.bincount(index, weights=y_true, minlength=bins)
+
+    filled = counts > 0
+    mean_prob = np.divide(prob_sum, counts, out=np.zeros(bins), where=filled)
+    observed = np.divide(pos_sum, counts, out=np.zeros(bins), where=filled)
+    ece = float(np.sum(counts * np.abs(observed - mean_prob)) / max(len(prob), 1))
+    return {
+        "ece": round(ece, 6),
+        "bins": [
+            {"lower": i / bins, "upper": (i + 1) / bins, "count": int(counts[i]),
+             "mean_prob": round(float(mean_prob[i]), 6),
+             "observed_rate": round(float(observed[i]), 6)}
+            for i in range(bins) if filled[i]
+        ],
+    }
+
+
+def _rates(cm):
+    # Per-class precision / recall / F1 from a confusion matrix
+    tp = np.diag(cm).astype(np.float64)
+    predicted = cm.sum(axis=0)
+    actual = cm.sum(axis=1)
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall = np.divide(tp, actual, out=np.zeros_like(tp), where=actual > 0)
+    denom = precision + recall
+    f1 = np.divide(2 * precision * recall, denom, out=np.zeros_like(tp), where=denom > 0)
+    return precision, recall, f1, actual
+
+
+def _rounded(value):
+    return None if value is None else round(value, 6)
+
+
+# ===================== Reports =====================
+def binary_report(y_true, prob, threshold=0.5, labels=("0", "1")):
+    """Metrics for a positive-class probability vector."""
+    y_true = np.asarray(y_true, dtype=np.int64)
+    prob = np.asarray(prob, dtype=np.float64)
+    y_pred = (prob >= threshold).astype(np.int64)
+    cm = confusion_matrix(y_true, y_pred, 2)
+    precision, recall, f1, support = _rates(cm)
+    clipped = np.clip(prob, 1e-15, 1 - 1e-15)
+
+    return {
+        "rows": int(len(y_true)),
+        "threshold": threshold,
+        "accuracy": _rounded(float(np.trace(cm) / max(len(y_true), 1))),
+        "roc_auc": _rounded(roc_auc(y_true, prob)),
+        "precision": _rounded(float(precision[1])),
+        "recall": _rounded(float(recall[1])),
+        "f1": _rounded(float(f1[1])),
+        "brier": _rounded(float(np.mean((prob - y_true) ** 2))),
+        "log_loss": _rounded(float(-np.mean(
+            y_true * np.log(clipped) + (1 - y_true) * np.log(1 - clipped)
+        ))),
+        "confusion_matrix": {"labels": list(labels), "counts": cm.tolist()},
+        "calibration": calibration(y_true, prob),
+        "support": {label: int(n) for label, n in zip(labels, support)},
+    }
+
+
+def multiclass_report(y_true, probs, labels):
+    """Metrics for a (rows, classes) probability matrix.
+
+    ROC-AUC is one-vs-rest per class and macro-averaged; calibration is of
+    the top-label confidence.
+    """
+    y_true = np.asarray(y_true, dtype=np.int64)
+    probs = np.asarray(probs, dtype=np.float64)
+    n_classes = probs.shape[1]
+    y_pred = probs.argmax(axis=1)
+    cm = confusion_matrix(y_true, y_pred, n_classes)
+    precision, recall, f1, support = _rates(cm)
+
+    per_class_auc = [roc_auc(y_true == k, probs[:, k]) for k in range(n_classes)]
+    scored = [auc for auc in per_class_auc if auc is not None]
+    confidence = probs[np.arange(len(y_true)), y_pred]
+
+    return {
+        "rows": int(len(y_true)),
+        "accuracy": _rounded(float(np.trace(cm) / max(len(y_true), 1))),
+        "roc_auc": _rounded(float(np.mean(scored))) if scored else None,
+        "macro_precision": _rounded(float(precision.mean())),
+        "macro_recall": _rounded(float(recall.mean())),
+        "macro_f1": _rounded(float(f1.mean())),
+        "confusion_matrix": {"labels": list(labels), "counts": cm.tolist()},
+        "calibration": calibration(y_pred == y_true, confidence),
+        "per_class": {
+            label: {"precision": _rounded(float(precision[k])),
+                    "recall": _rounded(float(recall[k])),
+                    "f1": _rounded(float(f1[k])),
+                    "roc_auc": _rounded(per_class_auc[k]),
+                    "support": int(support[k])}
+            for k, label in enumerate(labels)
+        },
+    }
+
+
+def gate(report, min_accuracy=None, min_auc=None, max_ece=None):
+    """Names of the promotion thresholds a report misses."""
+    failed = []
+    if min_accuracy is not None and (report["accuracy"] or 0) < min_accuracy:
+        failed.append(f"accuracy {report['accuracy']} < {min_accuracy}")
+    if min_auc is not None and (report["roc_auc"] is None or report["roc_auc"] < min_auc):
+        failed.append(f"roc_auc {report['roc_auc']} < {min_auc}")
+    if max_ece is not None and report["calibration"]["ece"] > max_ece:
+        failed.append(f"ece {report['calibration']['ece']} > {max_ece}")
+    return failed
@@ -0,0 +1,48 @@
+# gunicorn.conf.py
+#
+# Production server settings. Run from this directory:
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# See README.md ("Production serving") for tuning and reload notes. Kept
+# identical in backend/ and aarogya_ai/backend/ (check_shared.py).
+
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.environ.get("THREADS", "4"))
+worker_class = "gthread"
+
+# Import wsgi.py (and load the models) once in the master; workers are
+# forked afterwards and share those pages copy-on-write
+preload_app = True
+
+timeout = int(os.environ.get("TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+# Recycle workers after N requests (0 = never) to cap slow leaks
+max_requests = int(os.environ.get("MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get("ACCESS_LOG") or None
+
+
+def pre_fork(server, worker):
+    # Move everything allocated so far out of the GC's reach, so collections
+    # in the workers do not touch (and so copy) the shared model pages
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # Models that cannot be loaded in the master (TensorFlow is not
+    # fork-safe) are loaded here, in each worker before it takes requests,
+    # when wsgi.py defines warm_worker()
+    import wsgi
+
+    warm = getattr(wsgi, "warm_worker", None)
+    if warm is not None:
+        warm()
@@ -0,0 +1,161 @@
+# model_format.py
+#
+# Array file format for the logistic risk models, served without pickle or
+# sklearn.
+#
+#   bytes 0-7    b"AROGLIN\0"
+#   bytes 8-11   header length, uint32 little endian
+#   header       UTF-8 JSON: format version, schema name and hash, the
+#                encoding schema, feature names, class labels. The hash is
+#                null for legacy pickles trained before feature_schema.py
+#                (LabelEncoder codes), whose category codes nothing vouches for
+#   padding      to a 64-byte boundary
+#   weights      float64 little endian: n_features coefficients, then the
+#                intercept
+#
+# Loading parses a few hundred bytes of JSON and memory-maps the weights:
+# nothing is unpickled, sklearn is never imported, and the file does not
+# depend on the sklearn version that trained the model. load_scorer() still
+# reads legacy .pkl artifacts, importing joblib and sklearn only for those.
+#
+#   python model_format.py                                  # export every models/*.pkl
+#   python model_format.py diabetes models/diabetes_model.pkl
+
+import hashlib
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+from compiled_model import CompiledLogistic, compile_model, is_compilable
+
+# ===================== Configuration =====================
+MAGIC = b"AROGLIN\0"
+FORMAT_VERSION = 1
+ALIGN = 64
+EXTENSION = ".lin"
+
+
+def schema_hash(encoder):
+    blob = json.dumps(encoder.schema, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()[:12]
+
+
+def trained_schema_hash(trained, encoder, path):
+    """Check the schema hash a model was trained with (None = legacy) against `encoder`."""
+    if trained is None:
+        print(f"{path}: legacy model trained without the feature schema; its category "
+              f"codes are not checked against {encoder.name}. Retrain with train_models.py")
+    elif trained != schema_hash(encoder):
+        raise ValueError(f"{path} was trained for schema {encoder.name}@{trained}, "
+                         f"not {encoder.name}@{schema_hash(encoder)}")
+    return trained
+
+
+# ===================== Export =====================
+def export_linear(model, path, encoder):
+    """Write a fitted binary logistic model as an array file."""
+    if not is_compilable(model):
+        raise ValueError(f"{type(model).__name__} is not a binary logistic model")
+    encoder.check_model(model)
+    # Only models train_models.py fitted on the schema's codes carry its hash
+    trained = trained_schema_hash(getattr(model, "schema_hash_", None), encoder, path)
+
+    header = json.dumps({
+        "format_version": FORMAT_VERSION,
+        "kind": "logistic",
+        "schema": encoder.name,
+        "schema_hash": trained,
+        "encoding": encoder.schema,
+        "feature_names": encoder.columns,
+        "classes": [str(c) for c in model.classes_],
+        "trained_with": type(model).__name__,
+    }, sort_keys=True, default=str).encode()
+    prefix = len(MAGIC) + 4 + len(header)
+    padding = b" " * (-prefix % ALIGN)
+
+    weights = np.append(np.asarray(model.coef_[0], dtype="<f8"), float(model.intercept_[0]))
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header) + len(padding)))
+        f.write(header + padding)
+        f.write(weights.astype("<f8").tobytes())
+    os.replace(tmp, path)
+    return path
+
+
+# ===================== Load =====================
+def read_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a model array file")
+        (length,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(length))
+    if header.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported format version {header.get('format_version')}")
+    header["offset"] = len(MAGIC) + 4 + length
+    return header
+
+
+def load_linear(path, encoder, version=None):
+    """Memory-map an array file as a CompiledLogistic scorer.
+
+    Refuses files whose encoding schema differs from `encoder`'s, since the
+    weights would then line up with the wrong codes. Legacy files (no hash)
+    load with a warning.
+    """
+    header = read_header(path)
+    if header["schema"] != encoder.name:
+        raise ValueError(f"{path} was exported for schema {header['schema']}, not {encoder.name}")
+    trained_schema_hash(header["schema_hash"], encoder, path)
+    encoder.check_columns(header["feature_names"])
+
+    n = len(header["feature_names"])
+    weights = np.memmap(path, dtype="<f8", mode="r", offset=header["offset"], shape=(n + 1,))
+    return CompiledLogistic.from_weights(weights[:n], float(weights[n]),
+                                         header["feature_names"], version)
+
+
+def load_scorer(path, encoder, version=None):
+    """Any risk model artifact as a scorer: array files memory-mapped, pickles via joblib."""
+    if path.endswith(EXTENSION):
+        return load_linear(path, encoder, version)
+
+    # Fallback for models that have no array file: unpickling imports sklearn
+    from joblib import load
+
+    model = load(path)
+    print(f"{encoder.name} model expects:", model.n_features_in_)
+
+    # Refuse to serve a model trained on different columns or codes than we encode
+    encoder.check_model(model)
+    trained_schema_hash(getattr(model, "schema_hash_", None), encoder, path)
+
+    # Pull the weights out once so requests skip sklearn's validation stack
+    return compile_model(model, version)
+
+
+# ===================== Export CLI =====================
+if __name__ == "__main__":
+    from joblib import load
+
+    from feature_schema import ENCODERS
+    from train_models import MODELS
+
+    if len(sys.argv) == 3:
+        jobs = [(sys.argv[1], sys.argv[2])]
+    elif len(sys.argv) == 1:
+        jobs = [(name, f"models/{model_name}.pkl") for name, (_, model_name) in MODELS.items()]
+    else:
+        sys.exit("usage: python model_format.py [SCHEMA MODEL.pkl]")
+
+    for name, pkl_path in jobs:
+        if not os.path.exists(pkl_path):
+            print(f"{name}: {pkl_path} not found, skipped")
+            continue
+        out = os.path.splitext(pkl_path)[0] + EXTENSION
+        export_linear(load(pkl_path), out, ENCODERS[name])
+        print(f"{name}: {pkl_path} -> {out} ({os.path.getsize(out)} bytes)")
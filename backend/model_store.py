@@ -0,0 +1,308 @@
+# model_store.py
+#
+# Versioned, content-addressed store for the risk models.
+#
+#   models/store/<name>/<version>.lin   immutable artifacts; the version is
+#                                       the file's content hash
+#                                       (prediction_cache.file_version).
+#                                       Array files (model_format.py), or
+#                                       .pkl for models that cannot be
+#                                       exported as one
+#   models/store/manifest.json          the active, previous and candidate
+#                                       version of every model
+#
+# train_models.py publishes every model it trains. A running server polls
+# the manifest every MODEL_STORE_POLL_S seconds. When a model's active
+# version changes, the server loads and warms up the new artifact in the
+# background and then swaps it into the registry in one step. Requests
+# already in flight finish on the version they started with.
+#
+#   python model_store.py list
+#   python model_store.py publish diabetes models/diabetes_model.pkl [--candidate]
+#   python model_store.py activate diabetes <version>
+#   python model_store.py candidate diabetes <version>|none
+#   python model_store.py rollback diabetes
+#
+# The candidate version can be pinned per request (X-Model-Version) or
+# shadow-scored next to the active one (X-Shadow: 1, MODEL_SHADOW_RATE).
+# ShadowStats keeps the comparison.
+
+import fcntl
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+from prediction_cache import file_version
+
+# ===================== Configuration =====================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_STORE_DIR = os.environ.get("MODEL_STORE_DIR", os.path.join(BASE_DIR, "models", "store"))
+MODEL_STORE_POLL_S = float(os.environ.get("MODEL_STORE_POLL_S", "5"))     # 0 = never
+MODEL_SHADOW_RATE = float(os.environ.get("MODEL_SHADOW_RATE", "0"))       # share of misses
+
+SHADOW_THRESHOLD = 0.5
+
+
+class ModelStore:
+    def __init__(self, root=MODEL_STORE_DIR, poll_s=MODEL_STORE_POLL_S):
+        self.root = root
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self.poll_s = poll_s
+        self._manifest = {"models": {}}
+        self._signature = None
+        self._callback = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.refresh()
+
+    # ---------- Reading ----------
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def refresh(self):
+        """Re-read the manifest if it changed on disk; True when it did."""
+        signature = self._stat_signature()
+        if signature == self._signature:
+            return False
+        manifest = self._read() if signature else {"models": {}}
+        with self._lock:
+            self._manifest = manifest
+            self._signature = signature
+        return True
+
+    def _read(self):
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def entry(self, name):
+        return self._manifest["models"].get(name, {})
+
+    def active(self, name):
+        return self.entry(name).get("active")
+
+    def candidate(self, name):
+        return self.entry(name).get("candidate")
+
+    def versions(self, name):
+        return self.entry(name).get("versions", {})
+
+    def resolve(self, name, version):
+        """Map "active" / "candidate" / "previous" / a version id to a stored version, or None."""
+        if version in ("active", "candidate", "previous"):
+            return self.entry(name).get(version)
+        return version if version in self.versions(name) else None
+
+    def active_path(self, name, base):
+        """The active artifact, else base.lin, else base.pkl (never-published models)."""
+        version = self.active(name)
+        if version:
+            return self.artifact_path(name, version)
+        return base + ".lin" if os.path.exists(base + ".lin") else base + ".pkl"
+
+    def artifact_path(self, name, version):
+        filename = self.versions(name).get(version, {}).get("file", f"{version}.pkl")
+        return os.path.join(self.root, name, filename)
+
+    def manifest(self):
+        with self._lock:
+            return json.loads(json.dumps(self._manifest))
+
+    # ---------- Writing ----------
+    @contextmanager
+    def _locked_manifest(self):
+        # Training runs publish from parallel processes, so every
+        # read-modify-write of the manifest holds an exclusive file lock
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, "manifest.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            manifest = self._read() if os.path.exists(self.manifest_path) else {"models": {}}
+            yield manifest
+            tmp = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.manifest_path)
+        self.refresh()
+
+    def publish(self, name, path, activate=True, info=None):
+        """Copy `path` into the store and record it; returns its version."""
+        version = file_version(path)
+        filename = version + os.path.splitext(path)[1]
+        target = os.path.join(self.root, name, filename)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp = f"{target}.{os.getpid()}.tmp"
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, target)
+
+        with self._locked_manifest() as manifest:
+            entry = manifest["models"].setdefault(name, {"versions": {}})
+            entry["versions"].setdefault(version, {
+                "published_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "source": os.path.abspath(path),
+                "file": filename,
+                **(info or {}),
+            })
+            if activate:
+                self._activate(entry, version)
+            elif entry.get("active") != version:
+                entry["candidate"] = version
+        return version
+
+    @staticmethod
+    def _activate(entry, version):
+        if entry.get("active") != version:
+            entry["previous"] = entry.get("active")
+            entry["active"] = version
+        if entry.get("candidate") == version:
+            entry["candidate"] = None
+
+    def activate(self, name, version):
+        with self._locked_manifest() as manifest:
+            entry = manifest["models"].get(name, {})
+            if version not in entry.get("versions", {}):
+                raise ValueError(f"{name} has no stored version {version!r}")
+            self._activate(entry, version)
+
+    def set_candidate(self, name, version):
+        with self._locked_manifest() as manifest:
+            entry = manifest["models"].get(name, {})
+            if version is not None and version not in entry.get("versions", {}):
+                raise ValueError(f"{name} has no stored version {version!r}")
+            entry["candidate"] = version
+
+    def rollback(self, name):
+        with self._locked_manifest() as manifest:
+            entry = manifest["models"].get(name, {})
+            if not entry.get("previous"):
+                raise ValueError(f"{name} has no previous version to roll back to")
+            self._activate(entry, entry["previous"])
+
+    # ---------- Watching ----------
+    def watch(self, callback):
+        """Call `callback()` from a background thread whenever the manifest changes."""
+        self._callback = callback
+
+    def ensure_watching(self):
+        # Started lazily and again after fork, like the micro-batchers
+        if self._pid == os.getpid() or self._callback is None or self.poll_s <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._poll, name="model-store", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _poll(self):
+        # Compared with what this thread last applied, not with refresh()'s
+        # answer, so changes made through this same object are applied too
+        applied = self._signature
+        while True:
+            time.sleep(self.poll_s)
+            try:
+                self.refresh()
+                if self._signature != applied:
+                    applied = self._signature
+                    self._callback()
+            except Exception as e:
+                # A half-written or broken manifest must not kill the watcher
+                print(f"model store: {e!r}")
+
+
+# ===================== Shadow scoring =====================
+class ShadowStats:
+    """Paired active vs candidate results, per model, for the current candidate."""
+
+    def __init__(self, threshold=SHADOW_THRESHOLD):
+        self.threshold = threshold
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, name, version):
+        s = self._stats.get(name)
+        if s is None or s["candidate"] != version:
+            s = self._stats[name] = {
+                "candidate": version, "requests": 0, "rows": 0, "errors": 0,
+                "disagreements": 0, "abs_diff_sum": 0.0, "max_abs_diff": 0.0,
+                "active_s": 0.0, "candidate_s": 0.0,
+            }
+        return s
+
+    def record(self, name, version, active, candidate, active_s, candidate_s):
+        active = np.asarray(active, dtype=np.float64)
+        candidate = np.asarray(candidate, dtype=np.float64)
+        diff = np.abs(active - candidate)
+        flips = int(np.count_nonzero((active >= self.threshold) != (candidate >= self.threshold)))
+        with self._lock:
+            s = self._entry(name, version)
+            s["requests"] += 1
+            s["rows"] += len(active)
+            s["disagreements"] += flips
+            s["abs_diff_sum"] += float(diff.sum())
+            s["max_abs_diff"] = max(s["max_abs_diff"], float(diff.max(initial=0.0)))
+            s["active_s"] += active_s
+            s["candidate_s"] += candidate_s
+
+    def error(self, name, version):
+        with self._lock:
+            self._entry(name, version)["errors"] += 1
+
+    def stats(self):
+        with self._lock:
+            out = {}
+            for name, s in self._stats.items():
+                rows, requests = s["rows"], s["requests"]
+                out[name] = {
+                    "candidate": s["candidate"],
+                    "requests": requests,
+                    "rows": rows,
+                    "errors": s["errors"],
+                    "agreement": round(1 - s["disagreements"] / rows, 6) if rows else None,
+                    "mean_abs_diff": round(s["abs_diff_sum"] / rows, 6) if rows else None,
+                    "max_abs_diff": round(s["max_abs_diff"], 6),
+                    "active_ms": round(s["active_s"] * 1000 / requests, 4) if requests else None,
+                    "candidate_ms": round(s["candidate_s"] * 1000 / requests, 4) if requests else None,
+                }
+            return out
+
+
+# ===================== CLI =====================
+def print_manifest(store):
+    print(f"{'model':<12}{'active':<14}{'candidate':<14}{'previous':<14}versions")
+    for name, entry in sorted(store.manifest()["models"].items()):
+        print(f"{name:<12}{entry.get('active') or '-':<14}{entry.get('candidate') or '-':<14}"
+              f"{entry.get('previous') or '-':<14}{len(entry.get('versions', {}))}")
+
+
+if __name__ == "__main__":
+    usage = ("usage: python model_store.py list | publish NAME PATH [--candidate] | "
+             "activate NAME VERSION | candidate NAME VERSION|none | rollback NAME")
+    args = sys.argv[1:]
+    store = ModelStore(poll_s=0)
+    try:
+        if args[:1] == ["list"]:
+            pass
+        elif args[:1] == ["publish"] and len(args) in (3, 4):
+            candidate = args[3:] == ["--candidate"]
+            print(store.publish(args[1], args[2], activate=not candidate))
+        elif args[:1] == ["activate"] and len(args) == 3:
+            store.activate(args[1], args[2])
+        elif args[:1] == ["candidate"] and len(args) == 3:
+            store.set_candidate(args[1], None if args[2] == "none" else args[2])
+        elif args[:1] == ["rollback"] and len(args) == 2:
+            store.rollback(args[1])
+        else:
+            sys.exit(usage)
+    except ValueError as e:
+        sys.exit(str(e))
+    print_manifest(store)
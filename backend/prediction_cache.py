@@ -0,0 +1,133 @@
+# prediction_cache.py
+#
+# Response cache for the tabular risk routes. Keys hash the model name, the
+# model version (content hash of its artifact) and the encoded feature
+# vector, so answers that encode to the same features share one entry, and a
+# reloaded model can never be served a stale result. Values are the already
+# serialized JSON body, so a hit skips both scoring and jsonify.
+#
+# An optional shared tier (Redis, PREDICTION_CACHE_REDIS_URL) lets workers
+# and hosts reuse each other's results; the in-process LRU sits in front.
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# ===================== Configuration =====================
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", "3600"))
+PREDICTION_CACHE_REDIS_URL = os.environ.get("PREDICTION_CACHE_REDIS_URL", "")
+
+
+def file_version(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+class RedisTier:
+    def __init__(self, url, ttl):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError(
+                "PREDICTION_CACHE_REDIS_URL is set but the redis package is not installed"
+            )
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value):
+        self.client.set(key, value, ex=int(self.ttl) if self.ttl else None)
+
+
+class PredictionCache:
+    def __init__(self, max_size=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL,
+                 redis_url=PREDICTION_CACHE_REDIS_URL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = max_size > 0
+        self.shared = RedisTier(redis_url, ttl) if redis_url else None
+        self._entries = OrderedDict()   # key -> (expires_at, model name, body)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def key(self, name, version, features):
+        digest = hashlib.blake2b(features.tobytes(), digest_size=16).hexdigest()
+        return f"pred:{name}:{version}:{digest}"
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                del self._entries[key]
+
+        if self.shared is not None:
+            body = self.shared.get(key)
+            if body is not None:
+                self._store(key, body)
+                with self._lock:
+                    self.shared_hits += 1
+                return body
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, body):
+        if not self.enabled:
+            return
+        self._store(key, body)
+        if self.shared is not None:
+            self.shared.set(key, body)
+
+    def _store(self, key, body):
+        name = key.split(":", 2)[1]
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, name, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, name):
+        """Drop every in-process entry for one model (e.g. after a reload)."""
+        with self._lock:
+            stale = [k for k, entry in self._entries.items() if entry[1] == name]
+            for k in stale:
+                del self._entries[k]
+            self.invalidations += len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "shared": self.shared is not None,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
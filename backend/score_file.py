@@ -0,0 +1,196 @@
+# score_file.py
+#
+# Scores a CSV or Parquet file of patients with one risk model, streaming.
+#
+#   python score_file.py diabetes patients.csv scored.csv
+#   python score_file.py heart patients.parquet scored.parquet --workers 4
+#
+# The columns are the request fields of /predict/<model> (gender, age,
+# height_cm, ...), so a spreadsheet exported from the questionnaire scores
+# as is. The input is read SCORE_CHUNK_ROWS rows at a time. Each chunk is
+# encoded with the routes' mapping (FeatureEncoder.encode_request_frame) and
+# scored with one vectorized predict_proba. The output is the input columns
+# plus risk_percentage and error, appended chunk by chunk, so memory does not
+# grow with the file. With --workers > 1, chunks are scored in worker
+# processes, with at most two chunks per worker in flight.
+#
+# The same code backs POST /predict/<model>/file in app.py, which streams
+# the scored CSV back as a chunked response.
+#
+# Parquet needs pyarrow.
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from feature_schema import ENCODERS
+from model_format import load_scorer
+from model_store import ModelStore
+from prediction_cache import file_version
+
+# ===================== Configuration =====================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCORE_CHUNK_ROWS = int(os.environ.get("SCORE_CHUNK_ROWS", "50000"))
+SCORE_WORKERS = int(os.environ.get("SCORE_WORKERS", str(os.cpu_count() or 1)))
+
+# Artifact names, as in app.py
+MODEL_FILES = {
+    "heart": "heart_model",
+    "diabetes": "diabetes_model",
+    "lung": "lung_model",
+}
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+
+
+# ===================== Input / output =====================
+def is_parquet(path):
+    return path.lower().endswith(PARQUET_EXTENSIONS)
+
+
+def pyarrow_parquet():
+    try:
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet files need the pyarrow package")
+    return pyarrow.parquet
+
+
+def read_chunks(source, parquet=False, chunk_rows=SCORE_CHUNK_ROWS):
+    """Yield DataFrames of at most chunk_rows rows from a path or file object."""
+    if parquet:
+        for batch in pyarrow_parquet().ParquetFile(source).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+        return
+    # Cells stay strings, as they would arrive in a JSON request; empty
+    # cells are "" rather than NaN
+    yield from pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+
+
+class CsvWriter:
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+        self.header = True
+
+    def write(self, frame):
+        frame.to_csv(self.file, index=False, header=self.header)
+        self.header = False
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+
+    def write(self, frame):
+        import pyarrow
+
+        table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+        if self.writer is None:
+            self.writer = pyarrow_parquet().ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+# ===================== Scoring =====================
+def score_chunk(scorer, encoder, chunk):
+    """The chunk plus risk_percentage and error columns."""
+    X, index, errors = encoder.encode_request_frame(chunk)
+    risk = np.full(len(chunk), np.nan)
+    if index:
+        risk[index] = np.round(scorer.predict_proba(X) * 100, 2)
+    error = np.full(len(chunk), "", dtype=object)
+    for e in errors:
+        error[e["index"]] = e["error"]
+    return chunk.assign(risk_percentage=risk, error=error)
+
+
+def load_active_scorer(name):
+    store = ModelStore(poll_s=0)
+    path = store.active_path(name, os.path.join(BASE_DIR, "models", MODEL_FILES[name]))
+    return load_scorer(path, ENCODERS[name], version=file_version(path))
+
+
+# Per worker process: loaded once by the pool initializer
+_worker = {}
+
+
+def init_worker(name):
+    _worker["scorer"] = load_active_scorer(name)
+    _worker["encoder"] = ENCODERS[name]
+
+
+def score_in_worker(chunk):
+    return score_chunk(_worker["scorer"], _worker["encoder"], chunk)
+
+
+def scored_chunks(name, chunks, workers=1):
+    """Yield scored chunks in input order."""
+    if workers <= 1:
+        init_worker(name)
+        for chunk in chunks:
+            yield score_in_worker(chunk)
+        return
+
+    # Bounded read-ahead: at most 2 chunks per worker are in memory at once
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(name,)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(score_in_worker, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def csv_stream(scorer, encoder, chunks):
+    """CSV text, one scored chunk at a time (for the HTTP route)."""
+    header = True
+    for chunk in chunks:
+        yield score_chunk(scorer, encoder, chunk).to_csv(index=False, header=header)
+        header = False
+
+
+def score_file(name, src, dst, workers=SCORE_WORKERS, chunk_rows=SCORE_CHUNK_ROWS):
+    started = time.perf_counter()
+    writer = ParquetWriter(dst) if is_parquet(dst) else CsvWriter(dst)
+    rows = failed = 0
+    try:
+        chunks = read_chunks(src, is_parquet(src), chunk_rows)
+        for frame in scored_chunks(name, chunks, workers):
+            writer.write(frame)
+            rows += len(frame)
+            failed += int((frame["error"] != "").sum())
+    finally:
+        writer.close()
+    return {"rows": rows, "errors": failed, "seconds": round(time.perf_counter() - started, 3)}
+
+
+# ===================== CLI =====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a CSV / Parquet file of patients.")
+    parser.add_argument("model", choices=list(MODEL_FILES))
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--workers", type=int, default=SCORE_WORKERS)
+    parser.add_argument("--chunk-rows", type=int, default=SCORE_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    try:
+        summary = score_file(args.model, args.input, args.output, args.workers, args.chunk_rows)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    print(f"{args.model}: {summary['rows']} rows scored ({summary['errors']} with errors) "
+          f"in {summary['seconds']:.2f}s -> {args.output}")
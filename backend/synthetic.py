@@ -0,0 +1,205 @@
+# synthetic.py
+#
+# Synthetic request payloads for load and soak tests (see soak.py).
+#
+#   PatientSampler   patients drawn from the training data, as the request
+#                    fields the /predict/* routes read
+#   XraySampler      224x224 grayscale chest-film-like PNGs for the X-ray
+#                    routes
+#
+#   python synthetic.py patients 1000 > patients.jsonl
+#   python synthetic.py xrays 20 films/
+#
+# A patient is one row of data/diabetes.csv (gender, age, hypertension,
+# heart_disease, smoking_history, BMI, HbA1c, glucose) joined with a random
+# row of data/lung.csv of the same gender (symptoms, alcohol), so each file's
+# joint distribution is kept. Height is drawn per gender and the weight is
+# derived from the row's BMI. The heart-only fields (general_health,
+# exercise, fruit / vegetable consumption) have no training file here and are
+# drawn from the fixed distributions below. As in real traffic, "No Info"
+# smoking histories are sent without the field.
+#
+# Kept identical in backend/ and aarogya_ai/backend/ (check_shared.py).
+
+import io
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+XRAY_SIZE = 224
+
+# ===================== Field mappings =====================
+YES_NO = {0: "No", 1: "Yes"}
+SMOKING = {"never": "Never", "current": "Current", "former": "Former",
+           "ever": "Former", "not current": "Former", "No Info": None}
+# lung.csv codes answers as 1 (No) / 2 (Yes)
+LUNG_FIELDS = {
+    "YELLOW_FINGERS": "yellow_fingers",
+    "ANXIETY": "anxiety",
+    "PEER_PRESSURE": "peer_pressure",
+    "CHRONIC DISEASE": "chronic_disease",
+    "FATIGUE ": "fatigue",
+    "ALLERGY ": "allergy",
+    "WHEEZING": "wheezing",
+    "COUGHING": "coughing",
+    "SHORTNESS OF BREATH": "shortness_of_breath",
+    "SWALLOWING DIFFICULTY": "swallowing_difficulty",
+    "CHEST PAIN": "chest_pain",
+}
+LUNG_ALCOHOL = {1: "Never", 2: "Frequently"}
+
+# Height in cm, (mean, sd) per gender
+HEIGHT = {"Male": (175.0, 7.5), "Female": (162.0, 7.0), "Other": (168.0, 9.0)}
+# Heart-only fields: (labels, probabilities)
+GENERAL_HEALTH = (["Poor", "Fair", "Good", "Very Good", "Excellent"],
+                  [0.04, 0.12, 0.31, 0.35, 0.18])
+EXERCISE = (["Yes", "No"], [0.78, 0.22])
+# Servings per month, log-normal
+FRUIT = (3.2, 0.8)
+GREEN_VEG = (2.8, 0.8)
+
+# A request made invalid on purpose (to exercise the 400 path) breaks one of these
+INVALID_VALUES = [("age", "unknown"), ("height_cm", -1), ("weight_kg", "heavy"),
+                  ("hba1c_level", "n/a")]
+
+
+# ===================== Patients =====================
+class PatientSampler:
+    def __init__(self, seed=0, invalid_rate=0.0, data_dir=DATA_DIR):
+        self.rng = np.random.default_rng(seed)
+        self.invalid_rate = invalid_rate
+
+        diabetes = pd.read_csv(os.path.join(data_dir, "diabetes.csv"))
+        self.diabetes = diabetes.to_dict("records")
+
+        lung = pd.read_csv(os.path.join(data_dir, "lung.csv"))
+        lung_rows = lung.to_dict("records")
+        self.lung = {
+            "Male": [r for r in lung_rows if r["GENDER"] == "M"],
+            "Female": [r for r in lung_rows if r["GENDER"] == "F"],
+        }
+        self.lung["Other"] = lung_rows
+
+    def sample(self):
+        """One patient with every field the risk and screening routes read."""
+        rng = self.rng
+        row = self.diabetes[rng.integers(len(self.diabetes))]
+        gender = row["gender"]
+        lung = self.lung[gender][rng.integers(len(self.lung[gender]))]
+
+        mean, sd = HEIGHT.get(gender, HEIGHT["Other"])
+        height = float(np.clip(rng.normal(mean, sd), 120, 210))
+        weight = row["bmi"] * (height / 100) ** 2
+
+        patient = {
+            "gender": gender,
+            "age": float(row["age"]),
+            "height_cm": round(height, 1),
+            "weight_kg": round(weight, 1),
+            "hypertension": YES_NO[row["hypertension"]],
+            "heart_disease": YES_NO[row["heart_disease"]],
+            "diabetes": YES_NO[row["diabetes"]],
+            "hba1c_level": float(row["HbA1c_level"]),
+            "blood_glucose_level": float(row["blood_glucose_level"]),
+            "alcohol_consumption": LUNG_ALCOHOL[lung["ALCOHOL CONSUMING"]],
+            "general_health": str(rng.choice(GENERAL_HEALTH[0], p=GENERAL_HEALTH[1])),
+            "exercise": str(rng.choice(EXERCISE[0], p=EXERCISE[1])),
+            "fruit_consumption": round(float(rng.lognormal(*FRUIT)), 1),
+            "green_veg_consumption": round(float(rng.lognormal(*GREEN_VEG)), 1),
+        }
+        smoking = SMOKING[row["smoking_history"]]
+        if smoking is not None:
+            patient["smoking_history"] = smoking
+        for column, field in LUNG_FIELDS.items():
+            patient[field] = YES_NO[lung[column] - 1]
+
+        if self.invalid_rate and rng.random() < self.invalid_rate:
+            field, value = INVALID_VALUES[rng.integers(len(INVALID_VALUES))]
+            patient[field] = value
+        return patient
+
+    def batch(self, n):
+        return [self.sample() for _ in range(n)]
+
+
+# ===================== X-ray films =====================
+class XraySampler:
+    """PNG films: two dark lung fields, a bright spine and ribs, noise.
+
+    `repeat` is the share of uploads that resend an earlier film (as when a
+    study is re-submitted), which the X-ray cache answers; the rest are new
+    images. Films are built from a small pool of base images, each upload
+    stamped with its index so new ones never collide.
+    """
+
+    def __init__(self, seed=0, repeat=0.0, pool=16, size=XRAY_SIZE):
+        self.rng = np.random.default_rng(seed)
+        self.repeat = repeat
+        self.size = size
+        self.bases = [self._film() for _ in range(pool)]
+        self.sent = 0
+
+    def _film(self):
+        rng, n = self.rng, self.size
+        y, x = np.mgrid[0:n, 0:n] / n
+        img = np.full((n, n), 200.0)
+        for cx in (0.3 + rng.normal(0, 0.02), 0.7 + rng.normal(0, 0.02)):
+            rx, ry = rng.uniform(0.13, 0.18), rng.uniform(0.28, 0.36)
+            inside = ((x - cx) / rx) ** 2 + ((y - 0.5) / ry) ** 2 < 1
+            img[inside] = 60 + rng.uniform(-15, 15)
+        img += 25 * np.sin(y * rng.uniform(40, 55)) * (np.abs(x - 0.5) > 0.05)
+        img[:, int(n * 0.47):int(n * 0.53)] = 235
+        img += rng.normal(0, 12, (n, n))
+        return np.clip(img, 0, 255).astype(np.uint8)
+
+    def image(self):
+        """(PNG bytes, filename) for the next upload."""
+        from PIL import Image
+
+        if self.sent and self.rng.random() < self.repeat:
+            index = int(self.rng.integers(self.sent))
+        else:
+            index = self.sent
+            self.sent += 1
+        pixels = self.bases[index % len(self.bases)].copy()
+        pixels[0, :8] = np.frombuffer(index.to_bytes(8, "little"), np.uint8)
+        buf = io.BytesIO()
+        Image.fromarray(pixels, "L").save(buf, format="PNG", compress_level=1)
+        return buf.getvalue(), f"film-{index}.png"
+
+
+def multipart(files, boundary="synthboundary3a9c"):
+    """(body, content type) uploading `files` [(bytes, filename)] as "file" parts."""
+    parts = [
+        (f"--{boundary}\r\n"
+         f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+         "Content-Type: image/png\r\n\r\n").encode() + data + b"\r\n"
+        for data, filename in files
+    ]
+    return b"".join(parts) + f"--{boundary}--\r\n".encode(), \
+        f"multipart/form-data; boundary={boundary}"
+
+
+# ===================== CLI =====================
+if __name__ == "__main__":
+    usage = "usage: python synthetic.py patients N | xrays N DIR"
+    args = sys.argv[1:]
+    if args[:1] == ["patients"] and len(args) == 2:
+        sampler = PatientSampler()
+        for _ in range(int(args[1])):
+            print(json.dumps(sampler.sample()))
+    elif args[:1] == ["xrays"] and len(args) == 3:
+        os.makedirs(args[2], exist_ok=True)
+        films = XraySampler()
+        for _ in range(int(args[1])):
+            data, filename = films.image()
+            with open(os.path.join(args[2], filename), "wb") as f:
+                f.write(data)
+    else:
+        sys.exit(usage)
@@ -1,25 +1,90 @@
 # train_models.py
+#
+# Trains the risk models from data/*.csv, one worker process per model.
+#
+#   python train_models.py                   # every model
+#   python train_models.py diabetes lung     # a subset
+#   TRAIN_MODE=sgd python train_models.py    # out of core
+#
+# Datasets come from dataset_cache.py. The first run parses each CSV in
+# chunks with explicit dtypes and caches the encoded matrix. Later runs
+# memory-map that matrix and never parse the CSV again.
+#
+# TRAIN_MODE=full (default) fits the same LogisticRegression as before.
+#
+# TRAIN_MODE=sgd is for datasets that do not fit in memory. It works through
+# the memory-mapped matrix one chunk at a time. A first pass fits the scaler
+# and counts the classes. Then SGDClassifier.partial_fit makes
+# TRAIN_SGD_EPOCHS passes.
+# The scaler is folded into the weights before saving, so the saved model
+# scores raw features, like the full-mode one.
+#
+# Each model prints its read / fit time, peak RSS and hold-out accuracy.
+#
+# Logistic models are also exported as array files (model_format.py), which
+# the API loads without pickle or sklearn. Every trained model is published
+# to the versioned model store (model_store.py). Running servers pick it up
+# without a restart.
+# TRAIN_PUBLISH=candidate publishes it for pinning and shadow scoring only;
+# TRAIN_PUBLISH=off skips the store.
 
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import LabelEncoder
-import joblib
+import json
 import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from compiled_model import is_compilable
+from dataset_cache import DATASET_CHUNK_ROWS, load_dataset
+from feature_schema import ENCODERS
+from model_format import EXTENSION, export_linear, schema_hash
+from model_store import ModelStore
+
+# ===================== Configuration =====================
+TRAIN_MODE = os.environ.get("TRAIN_MODE", "full")              # "full" or "sgd"
+TRAIN_WORKERS = int(os.environ.get("TRAIN_WORKERS", "3"))
+TRAIN_CHUNK_ROWS = int(os.environ.get("TRAIN_CHUNK_ROWS", DATASET_CHUNK_ROWS))
+TRAIN_SGD_EPOCHS = int(os.environ.get("TRAIN_SGD_EPOCHS", "5"))
+TRAIN_REPORT = os.environ.get("TRAIN_REPORT", "")              # JSON report path
+TRAIN_PUBLISH = os.environ.get("TRAIN_PUBLISH", "active")      # active, candidate or off
+
+MODELS = {
+    # schema name: (training CSV, model file name)
+    "heart": ("data/heart.csv", "heart_model"),
+    "diabetes": ("data/diabetes.csv", "diabetes_model"),
+    "lung": ("data/lung.csv", "lung_model"),
+}
+
+# sgd mode holds out every TEST_EVERY-th row, the same 20% as test_size=0.2
+TEST_EVERY = 5
 
 # Create models directory if not exists
 os.makedirs("models", exist_ok=True)
 
-def train_model(csv_path, target_column, model_name):
-    df = pd.read_csv(csv_path)
 
-    # Encode categorical columns
-    for col in df.columns:
-        if df[col].dtype == "object":
-            df[col] = LabelEncoder().fit_transform(df[col])
+# ===================== Helpers =====================
+def peak_rss_mb():
+    # VmHWM is reset on exec, so a spawned worker reports only its own peak
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
 
-    X = df.drop(target_column, axis=1)
-    y = df[target_column]
+
+# ===================== Full mode =====================
+def train_full(dataset, timings):
+    X, y = dataset.frame(), dataset.target()
 
     # Split train/test
     X_train, X_test, y_train, y_test = train_test_split(
@@ -27,14 +92,142 @@ def train_model(csv_path, target_column, model_name):
     )
 
     # Logistic Regression model
+    started = time.perf_counter()
     model = LogisticRegression(max_iter=1000, class_weight="balanced")
     model.fit(X_train, y_train)
+    timings["fit_s"] += time.perf_counter() - started
+
+    accuracy = float((model.predict(X_test) == y_test.to_numpy()).mean())
+    return model, len(X), accuracy
+
+
+# ===================== SGD mode =====================
+def holdout_mask(start, n):
+    return np.arange(start, start + n) % TEST_EVERY == 0
+
+
+def train_sgd(dataset, timings):
+    # Pass 1: feature means / variances and class counts over the train rows
+    scaler = StandardScaler().set_output(transform="pandas")
+    counts = {}
+    for start, X, y in dataset.chunks(TRAIN_CHUNK_ROWS):
+        train = ~holdout_mask(start, len(X))
+        scaler.partial_fit(X[train])
+        for label, count in y[train].value_counts().items():
+            counts[label] = counts.get(label, 0) + int(count)
+
+    # Same weights class_weight="balanced" would compute from the full data
+    classes = np.array(sorted(counts))
+    n_train = sum(counts.values())
+    class_weight = {c: n_train / (len(classes) * counts[c]) for c in classes}
+
+    model = SGDClassifier(loss="log_loss", alpha=1e-4, class_weight=class_weight,
+                          random_state=42)
+    for _ in range(TRAIN_SGD_EPOCHS):
+        for start, X, y in dataset.chunks(TRAIN_CHUNK_ROWS):
+            train = ~holdout_mask(start, len(X))
+            started = time.perf_counter()
+            model.partial_fit(scaler.transform(X[train]), y[train], classes=classes)
+            timings["fit_s"] += time.perf_counter() - started
 
-    # Save model
-    joblib.dump(model, f"models/{model_name}.pkl")
+    # w . (x - mean) / scale + b  ==  (w / scale) . x + (b - (w / scale) . mean)
+    model.coef_ = model.coef_ / scaler.scale_
+    model.intercept_ = model.intercept_ - model.coef_ @ scaler.mean_
+
+    # Final pass: hold-out accuracy with the folded, raw-feature weights
+    correct = tested = 0
+    for start, X, y in dataset.chunks(TRAIN_CHUNK_ROWS):
+        test = holdout_mask(start, len(X))
+        correct += int((model.predict(X[test]) == y[test].to_numpy()).sum())
+        tested += int(test.sum())
+    return model, dataset.rows, correct / tested if tested else 0.0
+
+
+TRAINERS = {
+    "full": train_full,
+    "sgd": train_sgd,
+}
+
+
+# ===================== Worker =====================
+def train_model(schema_name, mode):
+    csv_path, model_name = MODELS[schema_name]
+    if not os.path.exists(csv_path):
+        print(f"{model_name} skipped: {csv_path} not found")
+        return None
+
+    started = time.perf_counter()
+    base_mb = peak_rss_mb()
+    timings = {"read_s": 0.0, "fit_s": 0.0}
+
+    # Encoded with the same schema the API serves with, cached after first use
+    dataset = load_dataset(schema_name, csv_path)
+    timings["read_s"] = time.perf_counter() - started
+    model, rows, accuracy = TRAINERS[mode](dataset, timings)
+
+    # Save model, stamped with the schema its codes come from
+    model.schema_hash_ = schema_hash(ENCODERS[schema_name])
+    model_path = f"models/{model_name}.pkl"
+    joblib.dump(model, model_path)
+    if is_compilable(model):
+        model_path = export_linear(model, f"models/{model_name}{EXTENSION}", ENCODERS[schema_name])
     print(f"{model_name} trained successfully!")
 
+    version = None
+    if TRAIN_PUBLISH != "off":
+        version = ModelStore(poll_s=0).publish(
+            schema_name, model_path, activate=TRAIN_PUBLISH == "active",
+            info={"mode": mode, "rows": rows, "holdout_accuracy": round(accuracy, 4)},
+        )
+
+    return {
+        "model": model_name,
+        "version": version,
+        "mode": mode,
+        "rows": rows,
+        "read_s": round(timings["read_s"], 3),
+        "fit_s": round(timings["fit_s"], 3),
+        "total_s": round(time.perf_counter() - started, 3),
+        "base_rss_mb": round(base_mb, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "accuracy": round(accuracy, 4),
+    }
+
+
+def print_report(reports, wall):
+    print(f"\n{'model':<16}{'mode':<6}{'rows':>10}{'read s':>9}{'fit s':>9}"
+          f"{'total s':>9}{'peak MB':>9}{'accuracy':>10}  version")
+    for r in reports:
+        print(f"{r['model']:<16}{r['mode']:<6}{r['rows']:>10}{r['read_s']:>9.2f}"
+              f"{r['fit_s']:>9.2f}{r['total_s']:>9.2f}{r['peak_rss_mb']:>9.0f}"
+              f"{r['accuracy']:>10.4f}  {r['version'] or '-'}")
+    busy = sum(r["total_s"] for r in reports)
+    print(f"\nwall {wall:.2f}s, per-model total {busy:.2f}s")
+
+
 # ===================== Train models =====================
-train_model("data/heart.csv", "Heart_Disease", "heart_model")
-train_model("data/diabetes.csv", "diabetes", "diabetes_model")
-train_model("data/lung.csv", "LUNG_CANCER", "lung_model")
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(MODELS)
+    unknown = [n for n in names if n not in MODELS]
+    if unknown or TRAIN_MODE not in TRAINERS or TRAIN_PUBLISH not in ("active", "candidate", "off"):
+        sys.exit(f"usage: TRAIN_MODE={'|'.join(TRAINERS)} TRAIN_PUBLISH=active|candidate|off "
+                 f"python train_models.py [{' '.join(MODELS)}]")
+
+    workers = max(1, min(TRAIN_WORKERS, len(names)))
+    # Split the cores between workers instead of letting every worker's BLAS
+    # start one thread per core
+    blas_threads = str(max(1, (os.cpu_count() or 1) // workers))
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, blas_threads)
+
+    started = time.perf_counter()
+    # One fresh process per model, so each peak RSS belongs to that model alone
+    with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=1) as pool:
+        results = list(pool.map(train_model, names, [TRAIN_MODE] * len(names)))
+    reports = [r for r in results if r is not None]
+
+    if reports:
+        print_report(reports, time.perf_counter() - started)
+    if TRAIN_REPORT:
+        with open(TRAIN_REPORT, "w") as f:
+            json.dump(reports, f, indent=2)
@@ -0,0 +1,176 @@
+# wire.py
+#
+# Body formats for the prediction routes, chosen per request:
+#
+#   application/json                     the default. Encoded and parsed with
+#                                        orjson when it is installed
+#                                        (JSON_FAST=0 keeps Flask's encoder)
+#   application/msgpack                  the same objects as the JSON bodies,
+#                                        as MessagePack
+#   application/vnd.apache.arrow.stream  columnar batches for the batch
+#                                        routes: one row per patient in, one
+#                                        row per patient out
+#
+# Clients say what they send with Content-Type and what they want back with
+# Accept. msgpack and pyarrow are optional: a body in a format whose package
+# is missing gets 415, and an Accept that only lists such a format falls
+# back to JSON.
+#
+#   python bench_wire.py      # serialization cost per record, per format
+
+import importlib
+import os
+
+from flask import current_app, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.exceptions import BadRequest
+
+# ===================== Configuration =====================
+JSON_FAST = os.environ.get("JSON_FAST", "1") == "1"
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack", "application/vnd.msgpack")
+ARROW_TYPES = (ARROW,)
+
+
+class UnsupportedFormat(Exception):
+    status = 415
+
+
+_modules = {}
+
+
+def optional(module):
+    """Import an optional serializer once; None when it is not installed."""
+    if module not in _modules:
+        try:
+            _modules[module] = importlib.import_module(module)
+        except ImportError:
+            _modules[module] = None
+    return _modules[module]
+
+
+def required(module, mimetype):
+    lib = optional(module)
+    if lib is None:
+        raise UnsupportedFormat(f"{mimetype} bodies need the {module} package")
+    return lib
+
+
+# ===================== Fast JSON =====================
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask's JSON provider on orjson: same sorted, compact output, less CPU.
+
+    Unlike the json module, NaN and infinities are written as null, and
+    non-ASCII text is sent as UTF-8 rather than \\u escapes.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        import orjson
+
+        self._orjson = orjson
+        self._options = orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs):
+        return self._orjson.dumps(obj, default=self.default, option=self._options).decode()
+
+    def loads(self, s, **kwargs):
+        return self._orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(obj)
+        body = self._orjson.dumps(
+            obj, default=self.default, option=self._options | self._orjson.OPT_APPEND_NEWLINE
+        )
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def install(app):
+    """Use orjson for every jsonify / request.json, and answer 415 in JSON."""
+    if JSON_FAST and optional("orjson") is not None:
+        app.json = OrjsonProvider(app)
+
+    @app.errorhandler(UnsupportedFormat)
+    def unsupported_format(e):
+        return jsonify({"error": str(e)}), e.status
+
+
+# ===================== Negotiation =====================
+def response_format(arrow=False):
+    """JSON, MSGPACK or (for batch routes) ARROW, from the Accept header."""
+    accept = request.headers.get("Accept", "")
+    # Most clients send no Accept or */*: skip parsing it
+    if "msgpack" not in accept and "arrow" not in accept:
+        return JSON
+    offered = [JSON]
+    if optional("msgpack") is not None:
+        offered += MSGPACK_TYPES
+    if arrow and optional("pyarrow") is not None:
+        offered += ARROW_TYPES
+    best = request.accept_mimetypes.best_match(offered, default=JSON)
+    return MSGPACK if best in MSGPACK_TYPES else best
+
+
+def request_body(silent=False):
+    """The request body decoded by Content-Type (JSON or MessagePack)."""
+    if request.mimetype in MSGPACK_TYPES:
+        msgpack = required("msgpack", request.mimetype)
+        try:
+            return msgpack.unpackb(request.get_data(cache=False))
+        except (ValueError, TypeError) as e:
+            if silent:
+                return None
+            raise BadRequest(f"invalid MessagePack body: {e}")
+    return request.get_json(silent=silent)
+
+
+def is_arrow_request():
+    return request.mimetype in ARROW_TYPES
+
+
+# ===================== Responses =====================
+def respond(obj, fmt=None):
+    """`obj` as JSON or MessagePack, whichever the client asked for."""
+    if (fmt or response_format()) == MSGPACK:
+        body = optional("msgpack").packb(obj)
+        return current_app.response_class(body, mimetype=MSGPACK)
+    return current_app.json.response(obj)
+
+
+def respond_json_bytes(body, fmt=None):
+    """A stored JSON body (e.g. from the prediction cache), transcoded if needed."""
+    if (fmt or response_format()) == MSGPACK:
+        return respond(current_app.json.loads(body), MSGPACK)
+    return current_app.response_class(body, mimetype=JSON)
+
+
+# ===================== Arrow =====================
+def read_arrow():
+    """The Arrow IPC stream in the request body as a DataFrame."""
+    pa = required("pyarrow", request.mimetype)
+    import pyarrow.ipc
+
+    try:
+        table = pyarrow.ipc.open_stream(request.get_data(cache=False)).read_all()
+    except pa.ArrowException as e:
+        raise BadRequest(f"invalid Arrow stream: {e}")
+    return table.to_pandas()
+
+
+def arrow_response(columns, metadata=None):
+    """An Arrow IPC stream of `columns` ({name: values}; NaN and None are null)."""
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    table = pa.table({name: pa.array(values, from_pandas=True) for name, values in columns.items()})
+    if metadata:
+        table = table.replace_schema_metadata({k: str(v) for k, v in metadata.items()})
+    sink = pa.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return current_app.response_class(sink.getvalue().to_pybytes(), mimetype=ARROW)
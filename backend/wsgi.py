@@ -0,0 +1,10 @@
+# wsgi.py
+#
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+
+from app import app, registry
+from model_registry import MODEL_PRELOAD
+
+# Load every risk model in the gunicorn master before workers are forked,
+# unless MODEL_PRELOAD narrows the list
+registry.preload(MODEL_PRELOAD or registry.names())